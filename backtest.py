@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Rejeu hors ligne (backtest) d'une base de prédiction sur l'historique du
+canal source, avant de la charger avec /pre.
+
+La logique du bot (process_source_message → find_next_prediction,
+process_verification_step, check_prediction_timeout) est exécutée telle
+quelle, avec une horloge simulée et une file d'envoi qui n'envoie rien.
+
+Formats de l'historique:
+- JSONL : un objet par ligne {"id": 123, "text": "...", "date": "..."}
+  ("message" accepté à la place de "text"; un même id répété = édition)
+- texte : un message par ligne non vide
+
+Usage:
+    python backtest.py --db candidat.txt --source historique.jsonl
+    python backtest.py --db prediction_db.json --source export.txt --slots 1
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import main
+from config import (
+    PREDICTION_TIMEOUT, TRIGGER_DISTANCE, MAX_CONCURRENT_PREDICTIONS,
+    SOURCE_CHANNEL_ID, PREDICTION_CHANNEL_ID
+)
+
+
+class FakeClock:
+    """Horloge simulée: suit les dates de l'historique, sinon avance d'un pas fixe."""
+
+    def __init__(self, start=None, step_seconds=30):
+        self.current = start or datetime(2000, 1, 1)
+        self.step = timedelta(seconds=step_seconds)
+
+    def now(self):
+        return self.current
+
+    def advance(self, date=None):
+        if date is not None and date > self.current:
+            self.current = date
+        else:
+            self.current += self.step
+
+    async def pause(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+
+class _FakeMessage:
+    __slots__ = ('id', 'message', 'text', 'date')
+
+    def __init__(self, message_id, text, date):
+        self.id = message_id
+        self.message = text
+        self.text = text
+        self.date = date
+
+
+class _FakeEvent:
+    __slots__ = ('message', 'chat_id')
+
+    def __init__(self, message):
+        self.message = message
+        self.chat_id = SOURCE_CHANNEL_ID
+
+
+class NullOutbound:
+    """Remplace la file d'envoi: rien ne part, chaque envoi reçoit un id fictif."""
+
+    def __init__(self):
+        self.next_id = 1
+        self.stats = {'sent': 0, 'edited': 0, 'files': 0}
+
+    def _done(self, value):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        return future
+
+    def send(self, chat_id, text, priority=None, **kwargs):
+        self.stats['sent'] += 1
+        message = _FakeMessage(self.next_id, text, None)
+        self.next_id += 1
+        return self._done(message)
+
+    def send_file(self, chat_id, file, priority=None, **kwargs):
+        self.stats['files'] += 1
+        return self._done(None)
+
+    def edit(self, chat_id, message_id, text, priority=None, **kwargs):
+        self.stats['edited'] += 1
+        return self._done(None)
+
+
+# ============================================================
+# LECTURE DES FICHIERS
+# ============================================================
+
+def _parse_date(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def load_source_messages(path):
+    """Liste de (message_id, texte, date) dans l'ordre du fichier."""
+    messages = []
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+        f.seek(0)
+        is_jsonl = first.lstrip().startswith('{')
+        for index, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if is_jsonl:
+                record = json.loads(line)
+                text = record.get('text', record.get('message', ''))
+                if not isinstance(text, str):
+                    # Export Telegram Desktop: texte découpé en entités
+                    text = ''.join(t if isinstance(t, str) else t.get('text', '') for t in text)
+                messages.append((record.get('id', index), text, _parse_date(record.get('date'))))
+            else:
+                messages.append((index, line, None))
+    return messages
+
+
+def load_candidate_db(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if path.endswith('.json'):
+        return {int(k): v for k, v in json.loads(content).items()}, []
+    return main.parse_prediction_text(content)
+
+
+# ============================================================
+# REJEU
+# ============================================================
+
+def reset_bot(db, slots, trigger_distance, timeout):
+    """Remplace les locataires du bot par un seul, neuf, avec la base candidate."""
+    main.tenants.clear()
+    main.tenants_by_source.clear()
+    tenant = main.register_tenant(main.Tenant(
+        main.DEFAULT_TENANT, SOURCE_CHANNEL_ID, PREDICTION_CHANNEL_ID,
+        trigger_distance=trigger_distance, timeout=timeout, max_slots=slots,
+    ))
+    # Pas d'archive de l'historique en rejeu
+    tenant.history.archive_path = None
+    tenant.db = dict(db)
+    tenant.mark_db_changed()
+    return tenant
+
+
+async def replay(tenant, messages, clock):
+    games = set()
+    for message_id, text, date in messages:
+        clock.advance(date)
+        # Pas de date sur l'événement: la latence d'envoi n'a pas de sens en rejeu
+        await main.process_source_message(tenant, _FakeEvent(_FakeMessage(message_id, text, None)))
+        games.add(tenant.state['last_source_number'])
+    games.discard(0)
+    return len(games)
+
+
+def run_backtest(db, messages, slots=MAX_CONCURRENT_PREDICTIONS,
+                 trigger_distance=TRIGGER_DISTANCE, timeout=PREDICTION_TIMEOUT):
+    """Rejoue messages avec la base db. Modifie l'état global de main."""
+    clock = FakeClock()
+    main.now = clock.now
+    main.pause = clock.pause
+    main.outbound = NullOutbound()
+    tenant = reset_bot(db, slots, trigger_distance, timeout)
+
+    started = time.perf_counter()
+    games = asyncio.run(replay(tenant, messages, clock))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'messages': len(messages),
+        'games': games,
+        'seconds': elapsed,
+        'stats': json.loads(json.dumps(tenant.stats)),
+        'predictions': main.outbound.stats['sent'],
+        'pending': tenant.verification.numbers(),
+        'ingest': dict(tenant.ingest.counters),
+    }
+
+
+def format_report(report):
+    rate = report['messages'] / report['seconds'] if report['seconds'] else 0.0
+    lines = [
+        f"🧪 Rejeu: {report['messages']} messages, {report['games']} jeux "
+        f"en {report['seconds']:.2f}s ({rate:.0f} messages/s)",
+        f"🚀 Prédictions lancées: {report['predictions']}",
+        "",
+        main.format_bilan(report['stats']),
+    ]
+    if report['pending']:
+        lines.append("")
+        lines.append("⏳ Encore en vérification: " + ", ".join(f"#{n}" for n in report['pending']))
+    return "\n".join(lines)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest d'une base de prédiction")
+    parser.add_argument('--db', required=True, help="base candidate (.txt format /pre ou .json)")
+    parser.add_argument('--source', required=True, help="historique du canal source (.jsonl ou .txt)")
+    parser.add_argument('--slots', type=int, default=MAX_CONCURRENT_PREDICTIONS)
+    parser.add_argument('--trigger', type=int, default=TRIGGER_DISTANCE)
+    parser.add_argument('--timeout', type=int, default=PREDICTION_TIMEOUT)
+    parser.add_argument('--json', action='store_true', help="rapport au format JSON")
+    parser.add_argument('--verbose', action='store_true', help="garder les logs du bot")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    db, errors = load_candidate_db(args.db)
+    if not db:
+        print("❌ Aucune prédiction valide dans la base candidate")
+        return 1
+    messages = load_source_messages(args.source)
+
+    report = run_backtest(db, messages, args.slots, args.trigger, args.timeout)
+    report['db_size'] = len(db)
+    report['db_errors'] = len(errors)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"📋 Base candidate: {len(db)} numéros ({len(errors)} ligne(s) ignorée(s))")
+        print(format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
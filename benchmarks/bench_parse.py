@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark du parsing des messages source : ancienne version (5 re.search
+non compilés + findall) contre le scanner unique avec cache.
+
+Usage: python benchmarks/bench_parse.py [nombre_de_jeux]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main  # noqa: E402
+from benchmarks.corpus import source_stream  # noqa: E402
+
+
+# ---- Ancienne implémentation (référence "avant") ----
+
+def legacy_extract_game_number(message):
+    match = re.search(r"#N\s*(\d+)", message, re.IGNORECASE)
+    if match:
+        return int(match.group(1))
+    for pattern in [r"^#(\d+)", r"N\s*(\d+)", r"Numéro\s*(\d+)", r"Game\s*(\d+)"]:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def legacy_extract_suits(message_text):
+    matches = re.findall(r"\(([^)]+)\)", message_text)
+    if not matches:
+        return []
+    normalized = matches[0].replace('❤️', '♥️').replace('❤', '♥️')
+    return [s for s in ['♥️', '♠️', '♦️', '♣️'] if s in normalized]
+
+
+def legacy_parse(message_text):
+    game_number = legacy_extract_game_number(message_text)
+    if game_number is None:
+        return None
+    return (
+        game_number,
+        message_text.strip().startswith('⏰'),
+        '✅' in message_text or '🔰' in message_text,
+        legacy_extract_suits(message_text),
+    )
+
+
+def build_corpus(games, seed=42):
+    return source_stream(games, seed=seed)
+
+
+def check_equivalence(corpus):
+    for _, text in corpus:
+        old = legacy_parse(text)
+        new = main.scan_source_message(text)
+        if old is None:
+            assert new.game_number is None, text
+            continue
+        assert (new.game_number, new.is_editing, new.is_finalized, list(new.suits)) == old, text
+
+
+def bench(games=2000, repeat=5):
+    corpus = build_corpus(games)
+    check_equivalence(corpus)
+    n = len(corpus)
+
+    def run_legacy():
+        for _, text in corpus:
+            legacy_parse(text)
+
+    def run_scan():
+        for _, text in corpus:
+            main.scan_source_message(text)
+
+    def run_cached():
+        main._parse_cache.clear()
+        for msg_id, text in corpus:
+            main.parse_source_message(msg_id, text)
+
+    results = {}
+    for name, fn in [('avant', run_legacy), ('scanner', run_scan), ('scanner+cache', run_cached)]:
+        best = min(timeit.repeat(fn, number=1, repeat=repeat))
+        results[name] = best / n * 1e6
+    return n, results
+
+
+if __name__ == '__main__':
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n, results = bench(games)
+    print(f"{n} messages ({games} jeux, éditions + re-livraisons)")
+    base = results['avant']
+    for name, us in results.items():
+        print(f"  {name:<14} {us:7.2f} µs/message  (x{base / us:.2f})")
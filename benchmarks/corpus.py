@@ -0,0 +1,85 @@
+"""
+Corpus synthétiques imitant le canal source et les fichiers /pre.
+Tous les générateurs sont déterministes (graine fixe) pour comparer des commits.
+"""
+import random
+
+from storage import suit_code
+
+CARDS = ['A', 'K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2']
+SUITS = ['♠️', '♥️', '♦️', '♣️', '❤️']
+DB_SUITS = ['❤️', '♦️', '♣️', '♠️']
+DB_LINE_FORMATS = ['{n} [{s}]', '{n}({s})', '{n} {s}', '{n} [{s}] ']
+
+
+def _hand(rng, size, suits=SUITS):
+    return ''.join(rng.choice(CARDS) + rng.choice(suits) for _ in range(size))
+
+
+def make_game_messages(game, rng, edits=4, avoid=()):
+    """
+    Séquence (message_id, texte) d'un jeu : éditions ⏰ puis finalisation.
+    Le premier groupe ne contient aucun des costumes de avoid (jeu perdant
+    pour une prédiction de ce costume).
+    """
+    codes = {suit_code(suit) for suit in avoid}
+    suits = [suit for suit in SUITS if suit_code(suit) not in codes] if codes else SUITS
+    first, second = _hand(rng, 2, suits), _hand(rng, 2)
+    texts = []
+    for _ in range(edits):
+        texts.append(f"⏰#N{game}. {rng.randint(0, 9)}({first}) - ▶️ {rng.randint(0, 9)}({second})")
+        texts.append(texts[-1])  # re-livraison identique
+    final = (
+        f"#N{game}. ✅{rng.randint(0, 9)}({first}{_hand(rng, 1, suits)}) - "
+        f"{rng.randint(0, 9)}({second}) #T{rng.randint(5, 30)}"
+    )
+    texts.append(final)
+    texts.append(final)
+    return [(game, t) for t in texts]
+
+
+def source_stream(games, edits=4, seed=42):
+    """Flux complet (message_id, texte) pour les jeux 1..games."""
+    rng = random.Random(seed)
+    stream = []
+    for game in range(1, games + 1):
+        stream.extend(make_game_messages(game, rng, edits))
+    return stream
+
+
+def source_days(days, games, edits=4, seed=42):
+    """
+    Plusieurs journées de jeux 1..games (le canal renumérote chaque jour),
+    en (message_id, texte) avec des identifiants uniques comme sur Telegram.
+    """
+    stream = []
+    for day in range(days):
+        for game, text in source_stream(games, edits, seed + day):
+            stream.append((day * games + game, text))
+    return stream
+
+
+def final_messages(games, seed=42):
+    """Un message finalisé par jeu (textes seuls)."""
+    rng = random.Random(seed)
+    return [make_game_messages(game, rng, edits=0)[-1][1] for game in range(1, games + 1)]
+
+
+def prediction_db(games, every=3, seed=7):
+    """Base {numéro: costume} avec une entrée tous les ~every jeux."""
+    rng = random.Random(seed)
+    return {n: rng.choice(DB_SUITS) for n in range(every, games + 1, every) if rng.random() < 0.9}
+
+
+def prediction_text(lines, seed=7):
+    """Texte au format /pre (quelques lignes invalides incluses)."""
+    rng = random.Random(seed)
+    out = []
+    number = 0
+    for i in range(lines):
+        number += rng.randint(1, 6)
+        if i % 500 == 499:
+            out.append(f"ligne invalide {i}")
+            continue
+        out.append(rng.choice(DB_LINE_FORMATS).format(n=number, s=rng.choice(DB_SUITS)))
+    return "\n".join(out)
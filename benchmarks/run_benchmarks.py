@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Suite de microbenchmarks des chemins chauds (parsing et décision).
+
+Chaque mesure garde le meilleur de plusieurs répétitions et donne le coût par
+opération. Les résultats sont écrits en JSON (un fichier par commit) pour
+comparer deux versions sur la même machine.
+
+Usage:
+    python benchmarks/run_benchmarks.py                  # suite complète
+    python benchmarks/run_benchmarks.py --quick          # tailles réduites
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/abc123.json
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import platform
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import backtest  # noqa: E402
+from benchmarks import corpus  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Écart toléré avant de signaler une régression lors d'une comparaison
+REGRESSION_THRESHOLD = 0.10
+
+
+def _measure(fn, ops, repeat):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    return {'ops': ops, 'seconds': best, 'per_op_us': best / ops * 1e6, 'ops_per_s': ops / best}
+
+
+# ============================================================
+# BENCHMARKS
+# ============================================================
+
+def bench_parse_prediction_text(lines, repeat):
+    text = corpus.prediction_text(lines)
+    return _measure(lambda: main.parse_prediction_text(text), lines, repeat)
+
+
+def bench_extract_game_number(count, repeat):
+    messages = corpus.final_messages(count)
+
+    def run():
+        for text in messages:
+            main.extract_game_number(text)
+    return _measure(run, count, repeat)
+
+
+def bench_extract_suits(count, repeat):
+    messages = corpus.final_messages(count)
+
+    def run():
+        for text in messages:
+            main.extract_suits_from_first_group(text)
+    return _measure(run, count, repeat)
+
+
+def bench_scan_source_message(count, repeat):
+    messages = corpus.final_messages(count)
+
+    def run():
+        for text in messages:
+            main.scan_source_message(text)
+    return _measure(run, count, repeat)
+
+
+def bench_find_next_prediction(games, repeat):
+    tenant = backtest.reset_bot(
+        corpus.prediction_db(games), 1, main.TRIGGER_DISTANCE, main.PREDICTION_TIMEOUT
+    )
+
+    def run():
+        for source in range(1, games + 1):
+            main.find_next_prediction(tenant, source)
+    return _measure(run, games, repeat)
+
+
+def bench_find_next_prediction_binary(games, repeat):
+    """Même parcours sur la base binaire (DB_FORMAT = 'binary')."""
+    tenant = backtest.reset_bot(
+        corpus.prediction_db(games), 1, main.TRIGGER_DISTANCE, main.PREDICTION_TIMEOUT
+    )
+    tenant.db = main.CompactDb.from_dict(tenant.db)
+    tenant.mark_db_changed()
+
+    def run():
+        for source in range(1, games + 1):
+            main.find_next_prediction(tenant, source)
+    return _measure(run, games, repeat)
+
+
+def bench_format_prediction(count, repeat):
+    statuses = ['pending'] + main.WIN_LABELS + ['❌', '⏹️']
+
+    def run():
+        for i in range(count):
+            main.format_prediction(i, '♠️', statuses[i % len(statuses)])
+    return _measure(run, count, repeat)
+
+
+def bench_process_source_message(games, repeat):
+    """Aller-retour complet: ingestion → vérification → lancement (client factice)."""
+    db = corpus.prediction_db(games)
+    stream = [(msg_id, text, None) for msg_id, text in corpus.source_stream(games)]
+    best = None
+    for _ in range(repeat):
+        report = backtest.run_backtest(db, stream)
+        best = report['seconds'] if best is None else min(best, report['seconds'])
+    ops = len(stream)
+    return {'ops': ops, 'seconds': best, 'per_op_us': best / ops * 1e6, 'ops_per_s': ops / best}
+
+
+def bench_backtest_day_wrap(games, repeat):
+    """Deux journées (jeux 1..games puis de nouveau 1..games), avec le passage de série."""
+    db = corpus.prediction_db(games)
+    messages = [(msg_id, text, None) for msg_id, text in corpus.source_days(2, games)]
+    best = None
+    for _ in range(repeat):
+        report = backtest.run_backtest(db, messages)
+        best = report['seconds'] if best is None else min(best, report['seconds'])
+    ops = len(messages)
+    return {'ops': ops, 'seconds': best, 'per_op_us': best / ops * 1e6, 'ops_per_s': ops / best}
+
+
+def suite(quick):
+    pre_sizes = [10_000, 100_000] if quick else [10_000, 100_000, 1_000_000]
+    count = 10_000 if quick else 50_000
+    games = 2_000 if quick else 10_000
+    repeat = 3 if quick else 5
+
+    benches = []
+    for size in pre_sizes:
+        benches.append((f'parse_prediction_text[{size}]', bench_parse_prediction_text, size,
+                        repeat if size < 1_000_000 else 3))
+    benches += [
+        ('extract_game_number', bench_extract_game_number, count, repeat),
+        ('extract_suits_from_first_group', bench_extract_suits, count, repeat),
+        ('scan_source_message', bench_scan_source_message, count, repeat),
+        ('find_next_prediction', bench_find_next_prediction, games * 10, repeat),
+        ('find_next_prediction[binary]', bench_find_next_prediction_binary, games * 10, repeat),
+        ('format_prediction', bench_format_prediction, count, repeat),
+        ('process_source_message', bench_process_source_message, games, repeat),
+        ('backtest[2 jours]', bench_backtest_day_wrap, games, repeat),
+    ]
+    return benches
+
+
+# ============================================================
+# RÉSULTATS
+# ============================================================
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'inconnu'
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nComparaison avec {baseline.get('revision')} ({baseline_path})")
+    regressions = 0
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"  {name:<36} {result['per_op_us']:10.3f} µs   (nouveau)")
+            continue
+        ratio = result['per_op_us'] / old['per_op_us']
+        flag = ''
+        if ratio > 1 + REGRESSION_THRESHOLD:
+            flag = '  ⚠️ régression'
+            regressions += 1
+        print(f"  {name:<36} {old['per_op_us']:10.3f} → {result['per_op_us']:10.3f} µs  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks du bot")
+    parser.add_argument('--quick', action='store_true', help="tailles réduites")
+    parser.add_argument('--only', help="ne lancer que les benchmarks contenant ce texte")
+    parser.add_argument('--output', help="fichier JSON (défaut: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="résultats JSON de référence")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    revision = _git_revision()
+    current = {
+        'revision': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'quick': args.quick,
+        'results': {},
+    }
+
+    for name, fn, size, repeat in suite(args.quick):
+        if args.only and args.only not in name:
+            continue
+        result = fn(size, repeat)
+        current['results'][name] = result
+        print(f"  {name:<36} {result['per_op_us']:10.3f} µs/op  {result['ops_per_s']:14,.0f} op/s")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Résultats: {output}")
+
+    if args.compare:
+        return 1 if compare(current, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -28,6 +28,16 @@ PREDICTION_CHANNEL_ID = -1003430118891
 # ID Telegram de l'administrateur (obtenez-le via @userinfobot)
 ADMIN_ID = 1190237801
 
+# Paires de canaux supplémentaires servies par le même bot (même connexion).
+# La paire ci-dessus est le locataire "main" ; chaque entrée a sa propre base
+# (prediction_db.<nom>.json), son état, ses statistiques et son arrêt.
+# trigger_distance, timeout et max_slots sont optionnels (valeurs ci-dessous).
+# Ex: TENANTS = [
+#     {'name': 'table2', 'source': -1001111111111, 'target': -1002222222222,
+#      'trigger_distance': 3, 'timeout': 12},
+# ]
+TENANTS = []
+
 # ============================================================
 # SERVEUR WEB (pour Render.com)
 # ============================================================
@@ -35,6 +45,17 @@ ADMIN_ID = 1190237801
 # Port d'écoute du serveur de santé (health check)
 PORT = int(os.getenv('PORT', 10000))
 
+# ============================================================
+# SESSION TELEGRAM
+# ============================================================
+
+# Fichier de session réutilisé d'un démarrage à l'autre : clé d'autorisation,
+# centre de données et entités résolues (canaux, admin). Évite de refaire
+# l'autorisation du bot à chaque redémarrage (risque de FloodWait).
+# La variable d'environnement TELEGRAM_SESSION (session en chaîne) prend
+# priorité si définie. Supprimez le fichier après un changement de BOT_TOKEN.
+SESSION_FILE = os.getenv('TELEGRAM_SESSION_FILE', 'bot.session')
+
 # ============================================================
 # PARAMÈTRES DE PRÉDICTION
 # ============================================================
@@ -52,3 +73,129 @@ TRIGGER_DISTANCE = 2
 # Intervalle entre les blagues pendant un arrêt temporaire (en secondes)
 # 300 = 5 minutes
 JOKE_INTERVAL_SECONDS = 300
+
+# Nombre maximum de prédictions vérifiées en parallèle
+# 1 = comportement historique (une seule prédiction à la fois)
+MAX_CONCURRENT_PREDICTIONS = 3
+
+# ============================================================
+# PERSISTANCE DE LA BASE
+# ============================================================
+
+# Nombre d'opérations dans le journal (prediction_db.log) avant de
+# réécrire le snapshot complet (prediction_db.json)
+DB_COMPACT_THRESHOLD = 1000
+
+# Compaction périodique du journal (en secondes)
+DB_COMPACT_INTERVAL_SECONDS = 600
+
+# Format du snapshot de la base :
+# - 'json'   : prediction_db.json (format historique, lisible)
+# - 'binary' : prediction_db.bin, numéros int32 triés + codes costume uint8
+#   (5 octets par numéro), ouvert par mmap au démarrage sans conversion.
+#   Le JSON existant est repris au premier démarrage. Moins de mémoire et un
+#   démarrage plus rapide, mais chaque recherche coûte environ deux fois plus
+#   qu'un dict (benchmark find_next_prediction[binary]).
+DB_FORMAT = 'json'
+
+# Sauvegarde de l'état d'exécution (bot_state.json) pour reprendre après
+# un redémarrage : écrit seulement si l'état a changé (en secondes)
+STATE_FLUSH_INTERVAL_SECONDS = 5
+
+# ============================================================
+# RATTRAPAGE APRÈS COUPURE
+# ============================================================
+
+# Quand un nouveau message source saute des identifiants (redémarrage,
+# mises à jour perdues), les messages manqués sont relus par identifiant et
+# rejoués dans l'ordre avant lui: ils concluent les vérifications en cours
+# mais ne lancent pas de prédiction (leurs cibles sont déjà jouées).
+# Nombre maximum de messages relus par trou (les plus récents) ; 0 = désactivé
+CATCHUP_MAX_MESSAGES = 500
+
+# ============================================================
+# FILE D'ENVOI (limites Telegram)
+# ============================================================
+
+# Messages par seconde et rafale autorisée par chat
+OUTBOUND_RATE_PER_CHAT = 1.0
+OUTBOUND_BURST_PER_CHAT = 3
+
+# Messages par seconde tous chats confondus
+OUTBOUND_GLOBAL_RATE = 25.0
+
+# Nouvelles tentatives après une erreur réseau (FloodWait: illimité)
+OUTBOUND_MAX_RETRIES = 5
+
+# Temps laissé à la file pour se vider à l'arrêt (en secondes)
+OUTBOUND_DRAIN_SECONDS = 5
+
+# ============================================================
+# CHARGEMENT /pre PAR FICHIER
+# ============================================================
+
+# Taille des blocs téléchargés (multiple de 4096, max 512 Ko)
+PRE_CHUNK_SIZE = 128 * 1024
+
+# Au-delà de cette taille, le fichier est analysé dans un processus séparé
+PRE_PROCESS_POOL_THRESHOLD = 8 * 1024 * 1024
+
+# Intervalle minimum entre deux mises à jour de la progression (en secondes)
+PRE_PROGRESS_INTERVAL_SECONDS = 2
+
+# ============================================================
+# PROFILAGE (/profile)
+# ============================================================
+
+# Intervalle d'échantillonnage du profileur (en secondes)
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# Durée maximale d'un profilage (en secondes)
+PROFILE_MAX_SECONDS = 600
+
+# ============================================================
+# RÉPARTITION SUR PLUSIEURS PROCESSUS
+# ============================================================
+
+# Nombre de processus workers entre lesquels les paires de canaux sont
+# réparties (0 = tout dans le processus principal). Le processus principal
+# garde la connexion Telegram et la file d'envoi ; chaque worker gère la base,
+# l'état et les vérifications de ses paires.
+SHARD_WORKERS = 0
+
+# ============================================================
+# AFFICHAGE /showdb
+# ============================================================
+
+# Numéros par page (une page = un message, boutons ◀️ ▶️ pour naviguer)
+SHOWDB_PAGE_SIZE = 100
+
+# ============================================================
+# PAUSES PROGRAMMÉES
+# ============================================================
+
+# Arrêts temporaires automatiques, chaque jour de start à end (HH:MM) dans le
+# fuseau indiqué (noms pytz). Une fenêtre peut passer minuit (ex: 22:00–02:00).
+# 'tenants' est optionnel: noms des paires concernées (toutes par défaut).
+# Ex: PAUSE_WINDOWS = [
+#     {'start': '02:00', 'end': '06:00', 'timezone': 'Africa/Porto-Novo'},
+# ]
+PAUSE_WINDOWS = []
+
+# ============================================================
+# HISTORIQUE DES PRÉDICTIONS (/history)
+# ============================================================
+
+# Prédictions gardées en mémoire ; les plus anciennes sont ajoutées à
+# predictions_history.jsonl
+HISTORY_CAPACITY = 1000
+
+# ============================================================
+# BILAN GLISSANT (/bilan 50, /bilan 1h)
+# ============================================================
+
+# Fenêtres sur les N derniers résultats
+BILAN_LAST_COUNTS = (50, 200)
+
+# Fenêtres sur les dernières heures
+BILAN_LAST_HOURS = (1, 24)
@@ -0,0 +1,279 @@
+"""
+Client Telegram simulé, en mémoire, pour faire tourner le bot sans réseau
+(loadtest.py). Il implémente le sous-ensemble de TelegramClient utilisé par
+main.py : envoi, édition et fichiers, lecture par identifiants,
+téléchargement, handlers d'événements. La latence du réseau et les FloodWait
+de Telegram sont simulés.
+
+Côté « serveur », publish / publish_edit / press jouent les autres
+utilisateurs (canal source, admin) et déclenchent les handlers enregistrés,
+chacun dans sa propre tâche comme Telethon.
+"""
+import time
+import random
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+
+from telethon import events, errors
+
+
+class FakeFile:
+    __slots__ = ('size', 'name')
+
+    def __init__(self, size, name):
+        self.size = size
+        self.name = name
+
+
+class FakeMessage:
+    __slots__ = ('id', 'chat_id', 'sender_id', 'message', 'date', 'media', 'file', 'buttons')
+
+    def __init__(self, message_id, chat_id, text, sender_id=None, media=None, name=None, buttons=None):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.message = text
+        self.date = datetime.now(timezone.utc)
+        # Contenu d'un fichier joint (bytes)
+        self.media = media
+        self.file = FakeFile(len(media), name) if media is not None else None
+        self.buttons = buttons
+
+    @property
+    def text(self):
+        return self.message
+
+
+class FakeMessageEvent:
+    """NewMessage / MessageEdited."""
+
+    __slots__ = ('client', 'message', 'chat_id', 'sender_id')
+
+    def __init__(self, client, message):
+        self.client = client
+        self.message = message
+        self.chat_id = message.chat_id
+        self.sender_id = message.sender_id
+
+    async def respond(self, text, **kwargs):
+        return await self.client.send_message(self.chat_id, text, **kwargs)
+
+
+class FakeCallbackEvent:
+    """CallbackQuery (bouton inline)."""
+
+    __slots__ = ('data', 'chat_id', 'sender_id', 'message_id')
+
+    def __init__(self, data, chat_id, sender_id, message_id):
+        self.data = data
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.message_id = message_id
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+
+class FakeSession:
+    def save(self):
+        return ''
+
+
+def _as_set(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return set(value)
+    return {value}
+
+
+class FakeTelegramClient:
+    def __init__(self, latency=0.0, jitter=0.0, flood_rate=None, flood_seconds=1, seed=0):
+        # Délai de chaque requête (secondes): moyenne et écart-type
+        self.latency = latency
+        self.jitter = jitter
+        # Requêtes par seconde et par chat au-delà desquelles la requête
+        # échoue en FloodWait de flood_seconds (None = jamais)
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.rng = random.Random(seed)
+
+        self.session = FakeSession()
+        self.connected = False
+        # chat → {message_id: FakeMessage}
+        self.chats = {}
+        self.next_ids = {}
+        self.handlers = []
+        self.tasks = set()
+        self.windows = {}
+
+        self.requests = {
+            'send': 0, 'edit': 0, 'file': 0, 'get': 0, 'download': 0,
+            'flood_waits': 0, 'not_modified': 0,
+        }
+        # Requêtes du bot abouties: (time.monotonic(), 'send'|'edit'|'file', chat, message_id, texte)
+        self.trace = []
+        # Temps de traitement des handlers: type d'événement → [secondes]
+        self.handler_seconds = {'new': [], 'edit': [], 'callback': []}
+
+    # ---- Connexion ----
+
+    async def start(self, bot_token=None, **kwargs):
+        self.connected = True
+        return self
+
+    async def connect(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def get_input_entity(self, peer):
+        return peer
+
+    # ---- Handlers ----
+
+    def on(self, builder):
+        def decorator(callback):
+            self.add_event_handler(callback, builder)
+            return callback
+        return decorator
+
+    def add_event_handler(self, callback, builder):
+        self.handlers.append((builder, callback))
+
+    def _matches(self, builder, kind, chat_id, sender_id, data):
+        if isinstance(builder, events.CallbackQuery):
+            return kind == 'callback' and (builder.match is None or builder.match(data))
+        if isinstance(builder, events.MessageEdited):
+            if kind != 'edit':
+                return False
+        elif isinstance(builder, events.NewMessage):
+            if kind != 'new':
+                return False
+        else:
+            return False
+        chats = _as_set(builder.chats)
+        if chats is not None and chat_id not in chats:
+            return False
+        users = _as_set(builder.from_users)
+        return users is None or sender_id in users
+
+    def _dispatch(self, kind, event, data=None):
+        for builder, callback in self.handlers:
+            if self._matches(builder, kind, event.chat_id, event.sender_id, data):
+                task = asyncio.get_running_loop().create_task(self._run_handler(kind, callback, event))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def _run_handler(self, kind, callback, event):
+        started = time.perf_counter()
+        try:
+            await callback(event)
+        finally:
+            self.handler_seconds[kind].append(time.perf_counter() - started)
+
+    async def idle(self):
+        """Attend la fin de tous les handlers en cours."""
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+
+    # ---- Côté serveur (autres utilisateurs) ----
+
+    def publish(self, chat_id, text, sender_id=None, media=None, name=None):
+        message = self._store(chat_id, text, sender_id, media, name)
+        self._dispatch('new', FakeMessageEvent(self, message))
+        return message
+
+    def publish_edit(self, chat_id, message_id, text):
+        message = self.chats[chat_id][message_id]
+        message.message = text
+        self._dispatch('edit', FakeMessageEvent(self, message))
+        return message
+
+    def press(self, chat_id, message_id, data, sender_id):
+        self._dispatch('callback', FakeCallbackEvent(data, chat_id, sender_id, message_id))
+
+    # ---- API utilisée par le bot ----
+
+    async def send_message(self, entity, message, buttons=None, **kwargs):
+        await self._request(entity, 'send')
+        sent = self._store(entity, message, buttons=buttons)
+        self.trace.append((time.monotonic(), 'send', entity, sent.id, message))
+        return sent
+
+    async def edit_message(self, entity, message, text=None, buttons=None, **kwargs):
+        await self._request(entity, 'edit')
+        message_id = getattr(message, 'id', message)
+        stored = self.chats.get(entity, {}).get(message_id)
+        if stored is None:
+            raise errors.MessageIdInvalidError(request=None)
+        if stored.message == text and buttons is None:
+            self.requests['not_modified'] += 1
+            raise errors.MessageNotModifiedError(request=None)
+        stored.message = text
+        if buttons is not None:
+            stored.buttons = buttons
+        self.trace.append((time.monotonic(), 'edit', entity, message_id, text))
+        return stored
+
+    async def send_file(self, entity, file, caption=None, **kwargs):
+        await self._request(entity, 'file')
+        media = file.getvalue() if hasattr(file, 'getvalue') else b''
+        sent = self._store(entity, caption or '', media=media, name=getattr(file, 'name', None))
+        self.trace.append((time.monotonic(), 'file', entity, sent.id, caption or ''))
+        return sent
+
+    async def get_messages(self, entity, ids=None, **kwargs):
+        await self._request(entity, 'get')
+        stored = self.chats.get(entity, {})
+        if isinstance(ids, int):
+            return stored.get(ids)
+        return [stored.get(i) for i in ids or ()]
+
+    async def iter_download(self, media, chunk_size=128 * 1024, **kwargs):
+        self.requests['download'] += 1
+        for start in range(0, len(media), chunk_size):
+            await self._delay()
+            yield media[start:start + chunk_size]
+
+    async def download_media(self, message, file=None, **kwargs):
+        media = getattr(message, 'media', message)
+        data = b''.join([chunk async for chunk in self.iter_download(media)])
+        if file is bytes:
+            return data
+        path = file or 'download.bin'
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    # ---- Interne ----
+
+    def _store(self, chat_id, text, sender_id=None, media=None, name=None, buttons=None):
+        message_id = self.next_ids.get(chat_id, 1)
+        self.next_ids[chat_id] = message_id + 1
+        message = FakeMessage(message_id, chat_id, text, sender_id, media, name, buttons)
+        self.chats.setdefault(chat_id, {})[message_id] = message
+        return message
+
+    async def _delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.rng.gauss(self.latency, self.jitter)))
+
+    async def _request(self, chat_id, kind):
+        self.requests[kind] += 1
+        await self._delay()
+        if self.flood_rate is None:
+            return
+        now = time.monotonic()
+        window = self.windows.setdefault(chat_id, deque())
+        while window and window[0] <= now - 1.0:
+            window.popleft()
+        if len(window) >= self.flood_rate:
+            self.requests['flood_waits'] += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+        window.append(now)
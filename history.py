@@ -0,0 +1,105 @@
+"""
+Historique des prédictions: anneau de capacité fixe en mémoire.
+Les enregistrements évincés sont ajoutés par lots à une archive JSONL, écrite
+par le thread d'écriture de storage (jamais sur la boucle asyncio).
+"""
+import json
+
+from storage import submit_to_writer, append_lines, SUITS, suit_code
+
+PENDING, WIN, LOSS, EXPIRED = range(4)
+OUTCOMES = ('pending', 'win', 'loss', 'expired')
+
+# Enregistrements évincés accumulés avant une écriture dans l'archive
+SPILL_BATCH = 100
+
+
+class PredictionRecord:
+    __slots__ = ('number', 'suit', 'trigger', 'sent_at', 'resolved_at', 'outcome', 'check')
+
+    def __init__(self, number, suit, trigger, sent_at):
+        self.number = number
+        self.suit = suit_code(suit)
+        self.trigger = trigger
+        # Horodatages en secondes epoch (float)
+        self.sent_at = sent_at
+        self.resolved_at = None
+        self.outcome = PENDING
+        # Vérification (0-3) qui a conclu la prédiction
+        self.check = 0
+
+    @property
+    def suit_text(self):
+        return SUITS[self.suit]
+
+    def to_json(self):
+        return json.dumps({
+            'n': self.number, 's': SUITS[self.suit], 't': self.trigger,
+            'sent': self.sent_at, 'done': self.resolved_at,
+            'outcome': OUTCOMES[self.outcome], 'check': self.check,
+        }, ensure_ascii=False)
+
+
+class PredictionHistory:
+    def __init__(self, capacity, archive_path=None):
+        self.capacity = capacity
+        # archive_path None: les enregistrements évincés sont oubliés (rejeu)
+        self.archive_path = archive_path
+        self.records = [None] * capacity
+        self.head = 0
+        self.size = 0
+        # Prédictions sans résultat encore dans l'anneau: numéro → enregistrement
+        self.open = {}
+        self.spilled = []
+
+    def __len__(self):
+        return self.size
+
+    def add(self, number, suit, trigger, sent_at):
+        evicted = self.records[self.head]
+        if evicted is not None:
+            if self.open.get(evicted.number) is evicted:
+                del self.open[evicted.number]
+            self._spill(evicted)
+
+        record = PredictionRecord(number, suit, trigger, sent_at)
+        self.records[self.head] = record
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.open[number] = record
+        return record
+
+    def resolve(self, number, outcome, check, resolved_at):
+        record = self.open.pop(number, None)
+        if record is not None:
+            record.outcome = outcome
+            record.check = check
+            record.resolved_at = resolved_at
+        return record
+
+    def newest(self, count):
+        """Les count derniers enregistrements, du plus récent au plus ancien."""
+        count = min(count, self.size)
+        return [self.records[(self.head - 1 - i) % self.capacity] for i in range(count)]
+
+    def archive_all(self):
+        """Vide l'anneau dans l'archive (arrêt du bot)."""
+        for record in reversed(self.newest(self.size)):
+            self._spill(record)
+        self.flush()
+        self.records = [None] * self.capacity
+        self.head = 0
+        self.size = 0
+        self.open.clear()
+
+    def flush(self):
+        if self.spilled and self.archive_path is not None:
+            submit_to_writer(append_lines, self.archive_path, self.spilled)
+        self.spilled = []
+
+    def _spill(self, record):
+        if self.archive_path is None:
+            return
+        self.spilled.append(record.to_json() + '\n')
+        if len(self.spilled) >= SPILL_BATCH:
+            self.flush()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Test de charge de bout en bout sur le client Telegram simulé (fakeclient).
+
+Le bot démarre comme en production (start_bot: handlers, file d'envoi avec
+ses limites) mais parle à FakeTelegramClient. Un générateur publie des jeux
+dans le canal source au rythme demandé: message ⏰, rafale d'éditions avec
+re-livraisons identiques, puis finalisation. Des commandes admin sont
+intercalées. Une part des numéros de la base est rendue perdante (aucun des
+quatre jeux vérifiés ne contient le costume), une autre expire (un des jeux
+vérifiés n'est jamais publié): les prédictions perdues et expirées sont
+vérifiées autant que les gagnées.
+
+Le rapport donne le débit, les percentiles de latence (traitement des
+handlers, envoi des prédictions, édition des résultats) et la justesse des
+messages de prédiction finaux, recalculée à partir des jeux publiés.
+
+Usage:
+    python loadtest.py                                   # 100 jeux, 10 jeux/s
+    python loadtest.py --games 1000 --rate 20 --edits 8 --latency-ms 40
+    python loadtest.py --flood-rate 2 --json
+    python loadtest.py --lose-share 0.5 --expire-share 0.2
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import main
+import backtest
+from benchmarks import corpus
+from fakeclient import FakeTelegramClient
+from outbound import OutboundDispatcher
+from storage import SOURCE_SUITS, suit_code
+from config import (
+    ADMIN_ID, SOURCE_CHANNEL_ID, PREDICTION_CHANNEL_ID, TRIGGER_DISTANCE, PREDICTION_TIMEOUT,
+    MAX_CONCURRENT_PREDICTIONS, OUTBOUND_RATE_PER_CHAT, OUTBOUND_BURST_PER_CHAT,
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_MAX_RETRIES
+)
+
+ADMIN_COMMANDS = ('/status', '/bilan', '/history 20', '/showdb')
+EXPECTED_KEYS = {'❌': 'losses', '⏹️': 'expired'}
+
+
+def percentile(values, q):
+    """Percentile q (0-100) par rang le plus proche, None si values est vide."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+# ============================================================
+# GÉNÉRATEUR DE CHARGE
+# ============================================================
+
+def plan_games(db, args, rng):
+    """
+    Costumes à écarter du premier groupe par jeu (lose_share des numéros de
+    la base perdent leurs quatre vérifications) et jeux non publiés
+    (expire_share des numéros perdent un de leurs jeux vérifiés).
+    """
+    avoid = {}
+    skipped = set()
+    for number, suit in db.items():
+        draw = rng.random()
+        if draw < args.lose_share:
+            for check in range(4):
+                avoid.setdefault(number + check, set()).add(suit)
+        elif draw < args.lose_share + args.expire_share:
+            skipped.add(number + rng.randrange(4))
+    # Le premier et le dernier jeu restent publiés
+    skipped.discard(1)
+    skipped.discard(args.games)
+    return avoid, skipped
+
+
+async def play_games(client, args, rng, published, avoid=None, skipped=()):
+    """Publie les jeux 1..games; published[game] = (date ⏰, date finale, texte final)."""
+    interval = 1.0 / args.rate
+    avoid = avoid or {}
+    for game in range(1, args.games + 1):
+        if game in skipped:
+            continue
+        messages = corpus.make_game_messages(game, rng, args.edits, avoid.get(game, ()))
+        texts = [text for _, text in messages]
+        step = interval / len(texts)
+
+        started = time.monotonic()
+        finalized = started if texts[0] == texts[-1] else None
+        message = client.publish(SOURCE_CHANNEL_ID, texts[0])
+        for text in texts[1:]:
+            await asyncio.sleep(step)
+            if finalized is None and text == texts[-1]:
+                finalized = time.monotonic()
+            client.publish_edit(SOURCE_CHANNEL_ID, message.id, text)
+        published[game] = (started, finalized, texts[-1])
+
+        if args.admin_every and game % args.admin_every == 0:
+            command = ADMIN_COMMANDS[(game // args.admin_every) % len(ADMIN_COMMANDS)]
+            client.publish(ADMIN_ID, command, sender_id=ADMIN_ID)
+        await asyncio.sleep(step)
+
+
+# ============================================================
+# JUSTESSE DES PRÉDICTIONS
+# ============================================================
+
+def expected_outcome(number, suit, published, timeout):
+    """
+    (statut, jeu décisif) attendu, ou None si le flux s'arrête avant la fin.
+    Un jeu vérifié jamais publié laisse la prédiction en attente jusqu'à
+    l'expiration, au premier jeu publié après numéro + timeout.
+    """
+    wanted = SOURCE_SUITS[suit_code(suit)]
+    last_game = max(published)
+    for check in range(4):
+        game_number = number + check
+        if game_number > last_game:
+            return None
+        game = published.get(game_number)
+        if game is None:
+            break
+        if wanted in main.extract_suits_from_first_group(game[2]):
+            return main.WIN_LABELS[check], game_number
+    else:
+        return "❌", number + 3
+
+    deciding = next((g for g in range(number + timeout + 1, last_game + 1) if g in published), None)
+    if deciding is None:
+        return None
+    return "⏹️", deciding
+
+
+def check_predictions(client, db, published, trigger_distance, timeout):
+    messages = client.chats.get(PREDICTION_CHANNEL_ID, {})
+    sent_at = {}
+    edited_at = {}
+    for at, kind, chat, message_id, _ in client.trace:
+        if chat != PREDICTION_CHANNEL_ID:
+            continue
+        if kind == 'send':
+            sent_at[message_id] = at
+        elif kind == 'edit':
+            edited_at[message_id] = at
+
+    result = {
+        'posted': len(messages), 'correct': 0, 'wrong': 0, 'incomplete': 0,
+        'expected': {'wins': 0, 'losses': 0, 'expired': 0}, 'mismatches': [],
+    }
+    post_latency, result_latency = [], []
+    for message_id, message in sorted(messages.items()):
+        number = int(message.message.split('Prédiction #', 1)[1].split('\n', 1)[0])
+        suit = db[number]
+
+        trigger = published.get(max(1, number - trigger_distance))
+        if trigger is not None:
+            post_latency.append(sent_at[message_id] - trigger[0])
+
+        expected = expected_outcome(number, suit, published, timeout)
+        if expected is None:
+            result['incomplete'] += 1
+            continue
+        status, deciding_game = expected
+        result['expected'][EXPECTED_KEYS.get(status, 'wins')] += 1
+        if message.message == main.format_prediction(number, suit, status):
+            result['correct'] += 1
+            if message_id in edited_at:
+                # L'expiration part dès le premier message (⏰) du jeu décisif
+                decided_at = published[deciding_game][0 if status == "⏹️" else 1]
+                result_latency.append(edited_at[message_id] - decided_at)
+        else:
+            result['wrong'] += 1
+            if len(result['mismatches']) < 10:
+                final = message.message.rsplit('Statut : ', 1)[-1]
+                result['mismatches'].append(f"#{number} {suit}: attendu {status}, obtenu {final}")
+    return result, post_latency, result_latency
+
+
+# ============================================================
+# EXÉCUTION
+# ============================================================
+
+async def run_loadtest(args):
+    rng = random.Random(args.seed)
+    client = FakeTelegramClient(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        flood_rate=args.flood_rate, seed=args.seed,
+    )
+    # start_bot construit lui-même son client: il reçoit le client simulé
+    main.TelegramClient = lambda *a, **kw: client
+    main.outbound = OutboundDispatcher(
+        rate_per_chat=args.outbound_rate,
+        burst_per_chat=OUTBOUND_BURST_PER_CHAT,
+        global_rate=OUTBOUND_GLOBAL_RATE,
+        max_retries=OUTBOUND_MAX_RETRIES,
+    )
+
+    db = corpus.prediction_db(args.games, every=args.every, seed=args.seed)
+    tenant = backtest.reset_bot(db, args.slots, args.trigger, args.timeout)
+    if not await main.start_bot():
+        raise RuntimeError("démarrage du bot impossible")
+
+    avoid, skipped = plan_games(db, args, rng)
+    published = {}
+    started = time.perf_counter()
+    await play_games(client, args, rng, published, avoid, skipped)
+    generated = time.perf_counter() - started
+
+    await client.idle()
+    await main.outbound.drain(args.drain_seconds)
+    await client.idle()
+    elapsed = time.perf_counter() - started
+    await main.outbound.stop()
+    await client.disconnect()
+
+    correctness, post_latency, result_latency = check_predictions(
+        client, db, published, args.trigger, args.timeout
+    )
+    events = tenant.ingest.counters['received']
+    return {
+        'games': args.games,
+        'source_events': events,
+        'generation_seconds': generated,
+        'seconds': elapsed,
+        'events_per_s': events / elapsed if elapsed else 0.0,
+        'handler_ms': {
+            kind: summarize([s * 1000 for s in values])
+            for kind, values in client.handler_seconds.items() if values
+        },
+        'prediction_post_ms': summarize([s * 1000 for s in post_latency]),
+        'result_edit_ms': summarize([s * 1000 for s in result_latency]),
+        'telegram_requests': dict(client.requests),
+        'outbound': dict(main.outbound.stats),
+        'ingest': dict(tenant.ingest.counters),
+        'stats': json.loads(json.dumps(tenant.stats)),
+        'predictions': correctness,
+    }
+
+
+def _format_row(label, summary):
+    if not summary['count']:
+        return f"   {label:<20} —"
+    return (
+        f"   {label:<20} {summary['p50']:>8.1f} {summary['p90']:>8.1f} "
+        f"{summary['p99']:>8.1f} {summary['max']:>8.1f}   (n={summary['count']})"
+    )
+
+
+def format_report(report):
+    predictions = report['predictions']
+    expected = predictions['expected']
+    requests = report['telegram_requests']
+    lines = [
+        f"🧪 Charge: {report['games']} jeux, {report['source_events']} événements source "
+        f"en {report['seconds']:.1f}s ({report['events_per_s']:.0f} évén./s, "
+        f"génération {report['generation_seconds']:.1f}s)",
+        "",
+        f"⏱️ Latences (ms)         {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}",
+    ]
+    for kind, summary in report['handler_ms'].items():
+        lines.append(_format_row(f"handler {kind}", summary))
+    lines.append(_format_row("envoi prédiction", report['prediction_post_ms']))
+    lines.append(_format_row("édition résultat", report['result_edit_ms']))
+    lines += [
+        "",
+        f"📨 Requêtes Telegram: {requests['send']} envois, {requests['edit']} éditions, "
+        f"{requests['flood_waits']} FloodWait, {requests['not_modified']} inchangées",
+        f"📥 Flux source: {report['ingest']['forwarded']} traités / {report['ingest']['received']} reçus",
+        f"🎯 Justesse: {predictions['correct']}/{predictions['posted']} prédictions correctes, "
+        f"{predictions['wrong']} fausses, {predictions['incomplete']} incomplètes (fin du flux)",
+        f"   attendues: {expected['wins']} gagnées, {expected['losses']} perdues, "
+        f"{expected['expired']} expirées",
+    ]
+    for mismatch in predictions['mismatches']:
+        lines.append(f"   ❌ {mismatch}")
+    return "\n".join(lines)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge avec un client Telegram simulé")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=10.0, help="jeux par seconde")
+    parser.add_argument('--edits', type=int, default=4, help="éditions ⏰ par jeu (chacune re-livrée)")
+    parser.add_argument('--every', type=int, default=3, help="une entrée de base tous les ~N jeux")
+    parser.add_argument('--lose-share', type=float, default=0.2,
+                        help="part des numéros de la base dont les 4 jeux vérifiés sont perdants")
+    parser.add_argument('--expire-share', type=float, default=0.1,
+                        help="part des numéros de la base dont un jeu vérifié n'est jamais publié")
+    parser.add_argument('--admin-every', type=int, default=25,
+                        help="une commande admin tous les N jeux (0 = aucune)")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="latence moyenne des requêtes")
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--flood-rate', type=int, default=None,
+                        help="requêtes/s par chat avant FloodWait simulé")
+    parser.add_argument('--outbound-rate', type=float, default=OUTBOUND_RATE_PER_CHAT,
+                        help="envois/s par chat de la file d'envoi")
+    parser.add_argument('--slots', type=int, default=MAX_CONCURRENT_PREDICTIONS)
+    parser.add_argument('--trigger', type=int, default=TRIGGER_DISTANCE)
+    parser.add_argument('--timeout', type=int, default=PREDICTION_TIMEOUT)
+    parser.add_argument('--drain-seconds', type=float, default=120.0,
+                        help="attente maximale de la file d'envoi en fin de test")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help="rapport au format JSON")
+    parser.add_argument('--verbose', action='store_true', help="garder les logs du bot")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    # Bases, état et historique du bot s'écrivent dans un dossier temporaire
+    os.chdir(tempfile.mkdtemp(prefix='loadtest_'))
+    report = asyncio.run(run_loadtest(args))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 1 if report['predictions']['wrong'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
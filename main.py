@@ -2,7 +2,7 @@
 """
 Bot Telegram de Prediction - v10.0
 Prédictions basées sur une base chargée par l'administrateur via /pre
-Pas de système de pause automatique — arrêt manuel via /stop
+Arrêts temporaires quotidiens programmés (PAUSE_WINDOWS) ou manuels via /stop
 """
 import os
 import sys
@@ -10,16 +10,50 @@ import asyncio
 import logging
 import re
 import random
+import codecs
+import tempfile
+import io
 import json
+import time
+import threading
+import signal
+import functools
+import itertools
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
 from aiohttp import web
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, Button
 from telethon.sessions import StringSession
+import pytz
 
 from config import (
     API_ID, API_HASH, BOT_TOKEN,
     SOURCE_CHANNEL_ID, PREDICTION_CHANNEL_ID, ADMIN_ID,
-    PORT, PREDICTION_TIMEOUT, TRIGGER_DISTANCE, JOKE_INTERVAL_SECONDS
+    PORT, PREDICTION_TIMEOUT, TRIGGER_DISTANCE, JOKE_INTERVAL_SECONDS,
+    MAX_CONCURRENT_PREDICTIONS, DB_COMPACT_THRESHOLD, DB_COMPACT_INTERVAL_SECONDS,
+    STATE_FLUSH_INTERVAL_SECONDS, OUTBOUND_RATE_PER_CHAT, OUTBOUND_BURST_PER_CHAT,
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_MAX_RETRIES, OUTBOUND_DRAIN_SECONDS,
+    PRE_CHUNK_SIZE, PRE_PROCESS_POOL_THRESHOLD, PRE_PROGRESS_INTERVAL_SECONDS,
+    PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_SECONDS, TENANTS, SHARD_WORKERS,
+    SHOWDB_PAGE_SIZE, PAUSE_WINDOWS, HISTORY_CAPACITY, BILAN_LAST_COUNTS, BILAN_LAST_HOURS,
+    DB_FORMAT, SESSION_FILE, CATCHUP_MAX_MESSAGES
+)
+from storage import (
+    PredictionStore, CompactDb, SUITS, SOURCE_SUITS, suit_code, apply_ops, atomic_write,
+    run_in_writer
+)
+from metrics import Registry, FAST_BUCKETS
+from profiler import SamplingProfiler
+from sharding import ShardCoordinator
+from scheduler import Scheduler
+from history import PredictionHistory, WIN, LOSS, EXPIRED
+from rolling import RollingStats
+from outbound import (
+    OutboundDispatcher, PRIORITY_PREDICTION, PRIORITY_ADMIN, PRIORITY_JOKE
 )
 
 logging.basicConfig(
@@ -29,66 +63,641 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def now():
+    """Horloge du bot (remplacée par une horloge simulée lors du rejeu)."""
+    return datetime.now()
+
+
+async def pause(seconds):
+    await asyncio.sleep(seconds)
+
+
 # ============================================================
 # VARIABLES GLOBALES
 # ============================================================
 
 bot_client = None
 
-# Base de données de prédiction: { numero: suit }
-prediction_db = {}
+# Tous les envois/éditions passent par cette file (voir outbound.py)
+outbound = OutboundDispatcher(
+    rate_per_chat=OUTBOUND_RATE_PER_CHAT,
+    burst_per_chat=OUTBOUND_BURST_PER_CHAT,
+    global_rate=OUTBOUND_GLOBAL_RATE,
+    max_retries=OUTBOUND_MAX_RETRIES,
+)
+
+# Mode réparti (SHARD_WORKERS > 0): coordinateur des processus workers
+shards = None
+
+# Arrêts, blagues et pauses programmées: minuteurs de la boucle, sur l'horloge du bot
+scheduler = Scheduler(clock=lambda: now())
 
-DB_FILE = 'prediction_db.json'
+
+async def save_prediction_db(tenant):
+    """Réécriture complète (atomique, hors boucle asyncio)."""
+    try:
+        await tenant.store.write_snapshot(tenant.db)
+        tenant.log.info(f"💾 Base sauvegardée: {len(tenant.db)} numéros → {tenant.db_file}")
+    except Exception as e:
+        tenant.log.error(f"❌ Erreur sauvegarde DB: {e}")
 
 
-def save_prediction_db():
+async def record_db_changes(tenant, ops):
+    """Journalise des modifications déjà appliquées à tenant.db."""
     try:
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump({str(k): v for k, v in prediction_db.items()}, f, ensure_ascii=False, indent=2)
-        logger.info(f"💾 Base sauvegardée: {len(prediction_db)} numéros → {DB_FILE}")
+        await tenant.store.append(ops, tenant.db)
     except Exception as e:
-        logger.error(f"❌ Erreur sauvegarde DB: {e}")
+        tenant.log.error(f"❌ Erreur journal DB: {e}")
+
 
+async def compact_prediction_db_periodically():
+    while True:
+        await asyncio.sleep(DB_COMPACT_INTERVAL_SECONDS)
+        for tenant in list(tenants.values()):
+            try:
+                await tenant.store.compact(tenant.db)
+            except Exception as e:
+                tenant.log.error(f"❌ Erreur compaction DB: {e}")
 
-def load_prediction_db():
-    global prediction_db
-    if not os.path.exists(DB_FILE):
-        logger.info(f"📭 Aucun fichier de base trouvé ({DB_FILE}), démarrage avec DB vide")
+
+def load_prediction_db(tenant):
+    if not tenant.store.exists():
+        tenant.log.info(f"📭 Aucun fichier de base trouvé ({tenant.db_file}), démarrage avec DB vide")
         return
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            raw = json.load(f)
-        prediction_db = {int(k): v for k, v in raw.items()}
-        logger.info(f"✅ Base chargée depuis {DB_FILE}: {len(prediction_db)} numéros")
+        tenant.db = tenant.store.load()
+        tenant.mark_db_changed()
+        tenant.log.info(f"✅ Base chargée depuis {tenant.db_file}: {len(tenant.db)} numéros")
+    except Exception as e:
+        tenant.log.error(f"❌ Erreur chargement DB: {e}")
+
+
+# Une base installée n'est plus jamais modifiée: chaque changement construit
+# une nouvelle version (hors boucle) puis la met en place en une affectation.
+# Les lectures voient l'ancienne ou la nouvelle base, jamais un état partiel.
+
+def new_db_version(db, entries=None):
+    """Base neuve contenant entries, du même type que db."""
+    if isinstance(db, CompactDb):
+        return CompactDb.from_dict(entries or {})
+    return dict(entries or {})
+
+
+def build_db_version(db, ops):
+    """Copie de db avec les opérations du journal appliquées (db n'est pas touchée)."""
+    return new_db_version(db, apply_ops(dict(db.items()), ops))
+
+
+def install_db_version(tenant, db):
+    tenant.db = db
+    tenant.mark_db_changed()
+
+
+class PredictionIndex:
+    """Index trié des numéros de la base d'un locataire (reconstruit si elle change)."""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.keys = []
+        self.version = -1
+
+    def _sync(self):
+        if self.version != self.tenant.db_version:
+            db = self.tenant.db
+            # Base binaire: numéros déjà triés, lus sans copie
+            self.keys = db.numbers if isinstance(db, CompactDb) else sorted(db)
+            self.version = self.tenant.db_version
+        return self.keys
+
+    def __iter__(self):
+        return iter(self._sync())
+
+    def first(self, k):
+        return self._sync()[:k]
+
+    def next_after(self, number, k):
+        """Les k numéros strictement supérieurs à number."""
+        keys = self._sync()
+        start = bisect_right(keys, number)
+        return keys[start:start + k]
+
+    def range(self, low, high):
+        """Les numéros compris dans [low, high]."""
+        keys = self._sync()
+        return keys[bisect_left(keys, low):bisect_right(keys, high)]
+
+    def bounds(self):
+        keys = self._sync()
+        return (keys[0], keys[-1]) if keys else (None, None)
+
+    def position(self, number):
+        """Rang du premier numéro >= number."""
+        return bisect_left(self._sync(), number)
+
+    def slice(self, start, stop):
+        return self._sync()[start:stop]
+
+
+class DbPages:
+    """Pages /showdb d'une base: rendues à la demande, gardées jusqu'au prochain changement."""
+
+    def __init__(self, tenant, page_size):
+        self.tenant = tenant
+        self.page_size = page_size
+        self.pages = {}
+        self.version = -1
+
+    def count(self):
+        return max(1, -(-len(self.tenant.db) // self.page_size))
+
+    def page_of(self, number):
+        return min(self.tenant.index.position(number) // self.page_size, self.count() - 1)
+
+    def render(self, page):
+        if self.version != self.tenant.db_version:
+            self.pages.clear()
+            self.version = self.tenant.db_version
+
+        text = self.pages.get(page)
+        if text is None:
+            db = self.tenant.db
+            start = page * self.page_size
+            lines = [f"{n} [{db[n]}]" for n in self.tenant.index.slice(start, start + self.page_size)]
+            text = (
+                f"📊 **Base ({len(db)} numéros)** — page {page + 1}/{self.count()}\n\n"
+                + "\n".join(lines)
+            )
+            self.pages[page] = text
+        return text
+
+
+class VerificationEngine:
+    """
+    Prédictions en cours de vérification, indexées par numéro prédit.
+    Chaque slot garde le même état qu'une vérification unique ; by_expected
+    associe le prochain numéro attendu aux slots qui l'attendent.
+    """
+
+    def __init__(self, max_slots):
+        self.max_slots = max_slots
+        self.slots = {}
+        self.by_expected = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, predicted_number):
+        return predicted_number in self.slots
+
+    def is_full(self):
+        return len(self.slots) >= self.max_slots
+
+    def busy(self, predicted_number):
+        return predicted_number in self.slots
+
+    def numbers(self):
+        return sorted(self.slots)
+
+    def open(self, predicted_number, predicted_suit, message_id, channel_id, base_game):
+        slot = {
+            'predicted_number': predicted_number,
+            'predicted_suit': predicted_suit,
+            'current_check': 0,
+            'message_id': message_id,
+            'channel_id': channel_id,
+            'status': 'pending',
+            'base_game': base_game,
+            'timestamp': now()
+        }
+        self.slots[predicted_number] = slot
+        self._link(slot)
+        return slot
+
+    def expecting(self, game_number):
+        numbers = self.by_expected.get(game_number)
+        if not numbers:
+            return []
+        return [self.slots[n] for n in sorted(numbers)]
+
+    def advance(self, slot):
+        self._unlink(slot)
+        slot['current_check'] += 1
+        self._link(slot)
+        return slot['predicted_number'] + slot['current_check']
+
+    def close(self, predicted_number):
+        slot = self.slots.pop(predicted_number, None)
+        if slot is not None:
+            self._unlink(slot)
+        return slot
+
+    def expired(self, current_game, timeout):
+        return [
+            slot for n, slot in sorted(self.slots.items())
+            if current_game > n + timeout
+        ]
+
+    def restore(self, slot):
+        self.slots[slot['predicted_number']] = slot
+        self._link(slot)
+        return slot
+
+    def clear(self):
+        self.slots.clear()
+        self.by_expected.clear()
+
+    def _link(self, slot):
+        expected = slot['predicted_number'] + slot['current_check']
+        self.by_expected.setdefault(expected, set()).add(slot['predicted_number'])
+
+    def _unlink(self, slot):
+        expected = slot['predicted_number'] + slot['current_check']
+        numbers = self.by_expected.get(expected)
+        if numbers is not None:
+            numbers.discard(slot['predicted_number'])
+            if not numbers:
+                del self.by_expected[expected]
+
+
+def new_stats():
+    return {
+        'total': 0, 'wins': 0, 'losses': 0,
+        'win_details': {'✅0️⃣': 0, '✅1️⃣': 0, '✅2️⃣': 0, '✅3️⃣': 0},
+        'expired': 0,
+        # Cibles de la DB non prédites car tous les slots étaient occupés
+        'skipped': 0,
+    }
+
+
+# ============================================================
+# LOCATAIRES (PAIRES DE CANAUX)
+# ============================================================
+
+DEFAULT_TENANT = 'main'
+
+TENANT_NAME_RE = re.compile(r'^[\w-]+$')
+
+
+class _TenantLogAdapter(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        return f"[{self.extra['tenant']}] {msg}", kwargs
+
+
+class Tenant:
+    """
+    Une paire canal source → canal prédictions servie par le bot, avec sa
+    propre base, son état d'exécution, ses vérifications et ses statistiques.
+    Tous les locataires partagent le client Telegram et la file d'envoi.
+    """
+
+    def __init__(self, name, source_channel_id, prediction_channel_id,
+                 trigger_distance=TRIGGER_DISTANCE, timeout=PREDICTION_TIMEOUT,
+                 max_slots=MAX_CONCURRENT_PREDICTIONS):
+        self.name = name
+        self.source_channel_id = source_channel_id
+        self.prediction_channel_id = prediction_channel_id
+        self.trigger_distance = trigger_distance
+        self.timeout = timeout
+
+        # Le locataire principal garde les noms de fichiers historiques
+        suffix = '' if name == DEFAULT_TENANT else f'.{name}'
+        binary = DB_FORMAT == 'binary'
+        json_file = f'prediction_db{suffix}.json'
+        self.db_file = f'prediction_db{suffix}.bin' if binary else json_file
+        self.state_file = f'bot_state{suffix}.json'
+        self.store = PredictionStore(
+            self.db_file, f'prediction_db{suffix}.log', DB_COMPACT_THRESHOLD,
+            binary=binary, migrate_from=json_file if binary else None
+        )
+
+        # Base de données de prédiction: { numero: suit } (dict, ou CompactDb en binaire)
+        self.db = CompactDb() if binary else {}
+        # Incrémenté à chaque modification de db
+        self.db_version = 0
+        self.index = PredictionIndex(self)
+        self.pages = DbPages(self, SHOWDB_PAGE_SIZE)
+        self.history = PredictionHistory(HISTORY_CAPACITY, f'predictions_history{suffix}.jsonl')
+
+        self.state = {
+            'last_source_number': 0,
+            # Plus grand identifiant de message source traité (rattrapage)
+            'last_message_id': 0,
+            'last_prediction_number': None,
+            # Cibles refusées faute de slot libre (comptées si jamais prédites)
+            'blocked_targets': set(),
+            'is_stopped': False,
+            'stop_end': None,
+            # Blagues déjà envoyées depuis la dernière remise à zéro du tirage
+            'used_jokes': [],
+            # Mode /pre en attente de données ('replace', 'add', 'merge', 'del') ou False
+            'waiting_for_predictions': False,
+            # Modification simulée par /pre add|merge|del, appliquée par /confirm
+            'pending_change': None,
+        }
+        self.verification = VerificationEngine(max_slots)
+        self.stats = new_stats()
+        self.rolling = RollingStats(BILAN_LAST_COUNTS, BILAN_LAST_HOURS)
+        self.ingest = SourceIngest()
+        self.outcomes = GameOutcomes()
+        # Événements live mis en attente pendant un rattrapage, sinon None
+        self.catch_up = None
+        self.last_state_payload = None
+        # En mode réparti, la base vit dans un worker qui en remonte la taille
+        self.remote_db_size = None
+        self.log = _TenantLogAdapter(logger, {'tenant': name})
+
+    def mark_db_changed(self):
+        self.db_version += 1
+
+    def db_size(self):
+        return len(self.db) if self.remote_db_size is None else self.remote_db_size
+
+    def label(self):
+        """Préfixe des messages admin, seulement s'il y a plusieurs locataires."""
+        # config.TENANTS plutôt que tenants: un worker ne connaît que les siens
+        return f"[{self.name}] " if TENANTS else ""
+
+
+# Locataires par nom, et table de routage des événements: chat source → locataire
+tenants = {}
+tenants_by_source = {}
+
+# Locataire visé par les commandes admin (/use pour changer)
+admin_context = {'tenant': DEFAULT_TENANT}
+
+
+def register_tenant(tenant):
+    if not TENANT_NAME_RE.match(tenant.name):
+        raise ValueError(f"Nom de locataire invalide: {tenant.name!r}")
+    if tenant.name in tenants:
+        raise ValueError(f"Locataire en double: {tenant.name}")
+    if tenant.source_channel_id in tenants_by_source:
+        other = tenants_by_source[tenant.source_channel_id].name
+        raise ValueError(f"Canal source {tenant.source_channel_id} déjà utilisé par {other}")
+    tenants[tenant.name] = tenant
+    tenants_by_source[tenant.source_channel_id] = tenant
+    return tenant
+
+
+def tenant_specs():
+    """Le locataire principal puis ceux de config.TENANTS."""
+    return [{'name': DEFAULT_TENANT, 'source': SOURCE_CHANNEL_ID, 'target': PREDICTION_CHANNEL_ID}] + [
+        dict(spec) for spec in TENANTS
+    ]
+
+
+def setup_tenants(specs=None):
+    tenants.clear()
+    tenants_by_source.clear()
+    for spec in specs if specs is not None else tenant_specs():
+        register_tenant(Tenant(
+            spec['name'], spec['source'], spec['target'],
+            trigger_distance=spec.get('trigger_distance', TRIGGER_DISTANCE),
+            timeout=spec.get('timeout', PREDICTION_TIMEOUT),
+            max_slots=spec.get('max_slots', MAX_CONCURRENT_PREDICTIONS),
+        ))
+    admin_context['tenant'] = next(iter(tenants))
+    return tenants
+
+
+def admin_tenant():
+    tenant = tenants.get(admin_context['tenant'])
+    if tenant is None:
+        tenant = next(iter(tenants.values()))
+        admin_context['tenant'] = tenant.name
+    return tenant
+
+
+# ============================================================
+# MÉTRIQUES (/metrics)
+# ============================================================
+
+metrics = Registry()
+
+PREDICTION_POST_SECONDS = metrics.histogram(
+    'bot_prediction_post_latency_seconds',
+    "Délai entre la date du message source et l'envoi de la prédiction",
+    labelnames=('tenant',)
+)
+PREDICTION_EDIT_SECONDS = metrics.histogram(
+    'bot_prediction_edit_latency_seconds',
+    "Délai entre la décision d'un résultat et l'édition du message",
+    labelnames=('tenant', 'status')
+)
+HANDLER_SECONDS = metrics.histogram(
+    'bot_handler_duration_seconds',
+    "Temps de traitement par handler Telegram",
+    labelnames=('handler',), buckets=FAST_BUCKETS
+)
+
+
+def _per_tenant(value):
+    """Callback de métrique: une série par locataire."""
+    return lambda: {(t.name,): value(t) for t in tenants.values()}
+
+
+metrics.counter_func(
+    'bot_outbound_events_total',
+    "Opérations de la file d'envoi (sent/edited/files = succès, errors = abandons)",
+    lambda: {(k,): v for k, v in outbound.stats.items()},
+    labelnames=('event',)
+)
+metrics.counter_func(
+    'bot_source_events_total',
+    "Événements du canal source par devenir (transmis, doublons, fusionnés...)",
+    lambda: {
+        (t.name, k): v for t in tenants.values() for k, v in t.ingest.counters.items()
+    },
+    labelnames=('tenant', 'outcome')
+)
+metrics.counter_func(
+    'bot_predictions_resolved_total',
+    "Prédictions terminées par résultat",
+    lambda: {
+        key: n for t in tenants.values() for key, n in (
+            *(((t.name, label), n) for label, n in t.stats['win_details'].items()),
+            ((t.name, '❌'), t.stats['losses']),
+            ((t.name, '⏹️'), t.stats['expired']),
+        )
+    },
+    labelnames=('tenant', 'status')
+)
+metrics.gauge_func('bot_prediction_db_size', "Numéros dans la base de prédiction",
+                   _per_tenant(lambda t: t.db_size()), labelnames=('tenant',))
+metrics.gauge_func('bot_verification_slots_used', "Prédictions en cours de vérification",
+                   _per_tenant(lambda t: len(t.verification)), labelnames=('tenant',))
+metrics.gauge_func('bot_verification_slots_max', "Nombre maximum de vérifications parallèles",
+                   _per_tenant(lambda t: t.verification.max_slots), labelnames=('tenant',))
+metrics.gauge_func('bot_last_source_number', "Dernier numéro de jeu reçu du canal source",
+                   _per_tenant(lambda t: t.state['last_source_number']), labelnames=('tenant',))
+metrics.gauge_func('bot_stopped', "1 si un arrêt temporaire est en cours",
+                   _per_tenant(lambda t: int(t.state['is_stopped'])), labelnames=('tenant',))
+metrics.gauge_func('bot_outbound_queue_length', "Envois en attente dans la file",
+                   lambda: outbound.queued())
+
+
+# ============================================================
+# DURÉE DU DÉMARRAGE
+# ============================================================
+
+# Référence des durées de démarrage: chargement du module
+PROCESS_STARTED = time.perf_counter()
+
+# Phase → durée (secondes), dans l'ordre d'exécution. 'first_update' est le
+# délai entre le lancement et le premier événement Telegram traité.
+startup_phases = {}
+
+
+def record_startup_phase(name, started):
+    startup_phases[name] = time.perf_counter() - started
+    logger.info(f"⏱️ Démarrage — {name}: {startup_phases[name]:.3f}s")
+
+
+def format_startup_phases():
+    return " | ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_phases.items())
+
+
+metrics.gauge_func('bot_startup_phase_seconds', "Durée de chaque phase du dernier démarrage",
+                   lambda: {(name,): s for name, s in startup_phases.items()},
+                   labelnames=('phase',))
+
+
+async def run_timed(handler, coro):
+    started = time.perf_counter()
+    if 'first_update' not in startup_phases:
+        record_startup_phase('first_update', PROCESS_STARTED)
+    try:
+        return await coro
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - started, handler=handler)
+
+
+def observe_edit_latency(tenant, future, status):
+    started = time.perf_counter()
+
+    def done(f):
+        if not f.cancelled() and f.exception() is None:
+            PREDICTION_EDIT_SECONDS.observe(
+                time.perf_counter() - started, tenant=tenant.name, status=status
+            )
+    future.add_done_callback(done)
+
+
+# ============================================================
+# ÉTAT D'EXÉCUTION (SNAPSHOT POUR REDÉMARRAGE À CHAUD)
+# ============================================================
+
+def snapshot_runtime_state(tenant):
+    """État compact: compteurs, arrêt temporaire, prédictions en vérification."""
+    bot_state = tenant.state
+    verification = tenant.verification
+    stop_end = bot_state['stop_end']
+    slots = []
+    for n in verification.numbers():
+        slot = dict(verification.slots[n])
+        slot.pop('post', None)
+        slot['timestamp'] = slot['timestamp'].isoformat() if slot['timestamp'] else None
+        slots.append(slot)
+    return {
+        'version': 1,
+        'bot': {
+            'last_source_number': bot_state['last_source_number'],
+            'last_message_id': bot_state['last_message_id'],
+            'last_prediction_number': bot_state['last_prediction_number'],
+            'is_stopped': bot_state['is_stopped'],
+            'stop_end': stop_end.isoformat() if stop_end else None,
+        },
+        'slots': slots,
+        'stats': tenant.stats,
+        'rolling': tenant.rolling.snapshot(),
+    }
+
+
+async def flush_runtime_state(tenant, force=False):
+    """Écrit le snapshot si l'état a changé depuis la dernière écriture."""
+    payload = json.dumps(snapshot_runtime_state(tenant), ensure_ascii=False, separators=(',', ':'))
+    if payload == tenant.last_state_payload and not force:
+        return False
+    try:
+        await run_in_writer(atomic_write, tenant.state_file, payload.encode('utf-8'))
+        tenant.last_state_payload = payload
+        return True
+    except Exception as e:
+        tenant.log.error(f"❌ Erreur sauvegarde état: {e}")
+        return False
+
+
+async def flush_runtime_state_periodically():
+    while True:
+        await asyncio.sleep(STATE_FLUSH_INTERVAL_SECONDS)
+        for tenant in list(tenants.values()):
+            await flush_runtime_state(tenant)
+
+
+def apply_runtime_state(tenant, state):
+    """Recharge un snapshot (fichier au démarrage, ou état remonté par un worker)."""
+    bot_state = tenant.state
+    verification = tenant.verification
+    stats_bilan = tenant.stats
+
+    saved = state.get('bot', {})
+    bot_state['last_source_number'] = saved.get('last_source_number', 0)
+    # Le coordinateur suit aussi les identifiants en direct: l'état d'un worker
+    # peut être en retard
+    bot_state['last_message_id'] = max(bot_state['last_message_id'], saved.get('last_message_id', 0))
+    bot_state['last_prediction_number'] = saved.get('last_prediction_number')
+    bot_state['is_stopped'] = saved.get('is_stopped', False)
+    stop_end = saved.get('stop_end')
+    bot_state['stop_end'] = datetime.fromisoformat(stop_end) if stop_end else None
+
+    verification.clear()
+    for slot in state.get('slots', []):
+        if slot.get('timestamp'):
+            slot['timestamp'] = datetime.fromisoformat(slot['timestamp'])
+        slot['status'] = 'pending'
+        verification.restore(slot)
+
+    stats = state.get('stats', {})
+    for key in ('total', 'wins', 'losses', 'expired', 'skipped'):
+        stats_bilan[key] = stats.get(key, 0)
+    stats_bilan['win_details'].update(stats.get('win_details', {}))
+    tenant.rolling.restore(state.get('rolling', {}), now().timestamp())
+
+
+def restore_runtime_state(tenant):
+    if not os.path.exists(tenant.state_file):
+        return False
+    try:
+        with open(tenant.state_file, 'r', encoding='utf-8') as f:
+            payload = f.read()
+        apply_runtime_state(tenant, json.loads(payload))
+
+        tenant.last_state_payload = payload
+        tenant.log.info(
+            f"♻️ État restauré: source #{tenant.state['last_source_number']}, "
+            f"{len(tenant.verification)} prédiction(s) en vérification, "
+            f"{tenant.stats['total']} résultat(s)"
+        )
+        return True
     except Exception as e:
-        logger.error(f"❌ Erreur chargement DB: {e}")
-
-
-bot_state = {
-    'last_source_number': 0,
-    'last_prediction_number': None,
-    'predictions_history': [],
-    'is_stopped': False,
-    'stop_end': None,
-    'joke_task': None,
-    'waiting_for_predictions': False,
-}
-
-verification_state = {
-    'predicted_number': None,
-    'predicted_suit': None,
-    'current_check': 0,
-    'message_id': None,
-    'channel_id': None,
-    'status': None,
-    'base_game': None,
-    'timestamp': None
-}
-
-stats_bilan = {
-    'total': 0, 'wins': 0, 'losses': 0,
-    'win_details': {'✅0️⃣': 0, '✅1️⃣': 0, '✅2️⃣': 0, '✅3️⃣': 0},
-}
+        tenant.log.error(f"❌ Erreur restauration état: {e}")
+        return False
+
+
+def shard_status(tenant):
+    """État remonté par un worker au coordinateur (/health, /metrics, /tenants)."""
+    status = snapshot_runtime_state(tenant)
+    status['db_size'] = len(tenant.db)
+    status['ingest'] = dict(tenant.ingest.counters)
+    return status
+
+
+def apply_shard_status(tenant, status):
+    apply_runtime_state(tenant, status)
+    tenant.remote_db_size = status['db_size']
+    tenant.ingest.counters.update(status['ingest'])
+
 
 # ============================================================
 # SYSTÈME DE BLAGUES
@@ -113,72 +722,299 @@ JOKES_LIST = DEFAULT_JOKES.copy()
 # PARSING DE LA BASE DE PRÉDICTION
 # ============================================================
 
-def parse_prediction_text(text):
-    db = {}
-    errors = []
-    suit_map = {
-        '❤️': '❤️', '❤': '❤️',
-        '♦️': '♦️', '♦': '♦️',
-        '♣️': '♣️', '♣': '♣️',
-        '♠️': '♠️', '♠': '♠️',
-    }
+PREDICTION_LINE_RE = re.compile(r'^(\d+)\s*[\[\(]?\s*([❤♦♣♠️]+)\s*[\]\)]?')
+
+# Le premier caractère du costume suffit à le reconnaître
+SUIT_BY_FIRST_CHAR = {'❤': '❤️', '♦': '♦️', '♣': '♣️', '♠': '♠️'}
 
-    for line in text.splitlines():
+
+class PredictionTextParser:
+    """Parseur incrémental du format /pre: le texte peut arriver par morceaux."""
+
+    def __init__(self):
+        self.db = {}
+        self.errors = []
+        self.lines = 0
+        self._partial = ''
+
+    def feed(self, text):
+        if self._partial:
+            text = self._partial + text
+            self._partial = ''
+        lines = text.splitlines(True)
+        if lines and not lines[-1].endswith(('\n', '\r')):
+            self._partial = lines.pop()
+        for line in lines:
+            self._parse_line(line)
+
+    def close(self):
+        if self._partial:
+            self._parse_line(self._partial)
+            self._partial = ''
+        return self.db, self.errors
+
+    def _parse_line(self, line):
+        self.lines += 1
         line = line.strip()
         if not line:
-            continue
+            return
 
-        match = re.match(r'^(\d+)\s*[\[\(]?\s*([❤♦♣♠️]+)\s*[\]\)]?', line)
+        match = PREDICTION_LINE_RE.match(line)
         if not match:
-            continue
+            return
 
-        num_str = match.group(1)
         suit_raw = match.group(2).strip()
+        suit = SUIT_BY_FIRST_CHAR.get(suit_raw[0])
+        if suit is None:
+            self.errors.append(f"Costume inconnu: '{suit_raw}' (ligne: {line[:30]})")
+            return
 
-        suit = None
-        for key, val in suit_map.items():
-            if suit_raw.startswith(key):
-                suit = val
-                break
+        self.db[int(match.group(1))] = suit
 
-        if suit is None:
-            errors.append(f"Costume inconnu: '{suit_raw}' (ligne: {line[:30]})")
-            continue
 
-        db[int(num_str)] = suit
+class NumberListParser:
+    """Numéros à retirer (/pre del), même interface que PredictionTextParser."""
+
+    def __init__(self):
+        self.db = {}
+        self._partial = ''
+
+    def feed(self, text):
+        text = self._partial + text
+        # Un numéro coupé en fin de morceau est complété par le suivant
+        complete = text.rstrip('0123456789')
+        self._partial = text[len(complete):]
+        self.db.update(parse_number_list(complete))
 
-    return db, errors
+    def close(self):
+        self.db.update(parse_number_list(self._partial))
+        self._partial = ''
+        return self.db, []
+
+
+def parse_number_list(text):
+    """Numéros à retirer (/pre del): tous les entiers du texte."""
+    return {int(n): None for n in re.findall(r'\d+', text)}
+
+
+def new_pre_parser(mode):
+    return NumberListParser() if mode == 'del' else PredictionTextParser()
+
+
+def parse_prediction_text(text):
+    parser = PredictionTextParser()
+    parser.feed(text)
+    return parser.close()
+
+
+def parse_prediction_file(path, mode='replace', chunk_size=1024 * 1024):
+    """Parse un fichier /pre par blocs (utilisé dans un processus séparé)."""
+    parser = new_pre_parser(mode)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b'', final=True))
+    return parser.close()
 
 
 # ============================================================
 # FONCTIONS UTILITAIRES
 # ============================================================
 
-def extract_game_number(message):
-    match = re.search(r"#N\s*(\d+)", message, re.IGNORECASE)
-    if match:
-        return int(match.group(1))
-
-    for pattern in [r"^#(\d+)", r"N\s*(\d+)", r"Numéro\s*(\d+)", r"Game\s*(\d+)"]:
-        match = re.search(pattern, message, re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-    return None
+# Numéro de jeu : une seule expression ancrée, les alternatives sont
+# essayées par ordre de priorité (#N > #début > N > Numéro > Game) et la
+# première qui aboutit fournit le numéro, en un seul appel à match().
+GAME_NUMBER_RE = re.compile(
+    r"(?:(?=.*?#N\s*(\d+))|(?=#(\d+))|(?=.*?N\s*(\d+))"
+    r"|(?=.*?Numéro\s*(\d+))|(?=.*?Game\s*(\d+)))",
+    re.IGNORECASE | re.DOTALL
+)
 
+# Cache de parsing: (message_id, texte) → ParsedMessage
+# Le texte fait partie de la clé (dict haché sur son contenu) : une édition
+# qui ne change rien ne reparse pas, une vraie modification si.
+PARSE_CACHE_SIZE = 512
+_parse_cache = OrderedDict()
 
-def extract_suits_from_first_group(message_text):
-    matches = re.findall(r"\(([^)]+)\)", message_text)
-    if not matches:
-        return []
 
-    first_group = matches[0]
-    normalized = first_group.replace('❤️', '♥️').replace('❤', '♥️')
+class ParsedMessage(NamedTuple):
+    game_number: Optional[int]
+    is_editing: bool
+    is_finalized: bool
+    suits: Tuple[str, ...]
+
 
+_EMPTY_PARSE = ParsedMessage(None, False, False, ())
+
+
+def _first_group(message_text):
+    start = message_text.find('(')
+    while start != -1:
+        end = message_text.find(')', start + 1)
+        if end == -1:
+            return None
+        if end > start + 1:
+            return message_text[start + 1:end]
+        start = message_text.find('(', end + 1)
+    return None
+
+
+def _suits_in_group(group):
+    # Équivaut à normaliser ❤️/❤ en ♥️ puis tester chaque couleur
+    if not group:
+        return ()
     suits = []
-    for suit in ['♥️', '♠️', '♦️', '♣️']:
-        if suit in normalized:
-            suits.append(suit)
-    return suits
+    if '♥️' in group or '❤' in group:
+        suits.append('♥️')
+    if '♠️' in group:
+        suits.append('♠️')
+    if '♦️' in group:
+        suits.append('♦️')
+    if '♣️' in group:
+        suits.append('♣️')
+    return tuple(suits)
+
+
+def scan_source_message(message_text):
+    """Analyse complète d'un message source en un seul passage."""
+    match = GAME_NUMBER_RE.match(message_text)
+    if match is None:
+        return _EMPTY_PARSE
+    return ParsedMessage(
+        int(match.group(match.lastindex)),
+        message_text.lstrip().startswith('⏰'),
+        '✅' in message_text or '🔰' in message_text,
+        _suits_in_group(_first_group(message_text)),
+    )
+
+
+def parse_source_message(message_id, message_text):
+    """Comme scan_source_message, avec cache par (message_id, texte)."""
+    key = (message_id, message_text)
+    parsed = _parse_cache.get(key)
+    if parsed is not None:
+        _parse_cache.move_to_end(key)
+        return parsed
+
+    parsed = scan_source_message(message_text)
+    _parse_cache[key] = parsed
+    if len(_parse_cache) > PARSE_CACHE_SIZE:
+        _parse_cache.popitem(last=False)
+    return parsed
+
+
+# Phases d'un message source, dans l'ordre où elles peuvent avancer
+PHASE_EDITING = 0   # ⏰ partie en cours
+PHASE_OPEN = 1      # ni ⏰ ni ✅/🔰
+PHASE_FINAL = 2     # ✅/🔰 résultat définitif
+
+
+class SourceIngest:
+    """
+    Étage d'entrée des messages source (nouveaux + éditions).
+    Écarte les re-livraisons identiques (LRU borné) et les éditions qui ne font
+    pas avancer la phase du message: seuls un nouveau jeu ou un passage vers
+    une phase plus avancée sont transmis à la logique de prédiction.
+    """
+
+    def __init__(self, seen_size=2048, tracked_size=512):
+        self.seen_size = seen_size
+        self.tracked_size = tracked_size
+        self.seen = OrderedDict()
+        self.phases = OrderedDict()
+        self.counters = {
+            'received': 0, 'duplicates': 0, 'collapsed': 0,
+            'no_game': 0, 'forwarded': 0,
+        }
+
+    def accept(self, message_id, message_text):
+        """ParsedMessage à traiter, ou None si l'événement est supprimé."""
+        counters = self.counters
+        counters['received'] += 1
+
+        key = (message_id, message_text)
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            counters['duplicates'] += 1
+            return None
+        self.seen[key] = True
+        if len(self.seen) > self.seen_size:
+            self.seen.popitem(last=False)
+
+        parsed = parse_source_message(message_id, message_text)
+        if parsed.game_number is None:
+            counters['no_game'] += 1
+            return None
+
+        if parsed.is_finalized:
+            phase = PHASE_FINAL
+        elif parsed.is_editing:
+            phase = PHASE_EDITING
+        else:
+            phase = PHASE_OPEN
+
+        previous = self.phases.get(message_id)
+        if previous is not None and previous[0] == parsed.game_number and phase <= previous[1]:
+            counters['collapsed'] += 1
+            return None
+
+        self.phases[message_id] = (parsed.game_number, phase)
+        self.phases.move_to_end(message_id)
+        if len(self.phases) > self.tracked_size:
+            self.phases.popitem(last=False)
+
+        counters['forwarded'] += 1
+        return parsed
+
+    def summary(self):
+        c = self.counters
+        return (
+            f"{c['received']} reçus, {c['forwarded']} traités, "
+            f"{c['duplicates']} doublons, {c['collapsed']} éditions fusionnées"
+        )
+
+
+class GameOutcomes:
+    """
+    Costumes du premier groupe des derniers jeux reçus avec un résultat,
+    par numéro de jeu. Taille fixe: les numéros les plus anciennement
+    enregistrés sont oubliés. Une vérification qui attend un jeu arrivé en
+    avance (ou dans le désordre) le lit ici au lieu d'attendre l'expiration.
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.games = OrderedDict()
+
+    def __len__(self):
+        return len(self.games)
+
+    def put(self, game_number, suits):
+        self.games[game_number] = suits
+        self.games.move_to_end(game_number)
+        if len(self.games) > self.size:
+            self.games.popitem(last=False)
+
+    def get(self, game_number):
+        return self.games.get(game_number)
+
+    def clear(self):
+        self.games.clear()
+
+
+def extract_game_number(message):
+    match = GAME_NUMBER_RE.match(message)
+    if match is None:
+        return None
+    return int(match.group(match.lastindex))
+
+
+def extract_suits_from_first_group(message_text):
+    return list(_suits_in_group(_first_group(message_text)))
 
 
 def is_message_editing(message_text):
@@ -189,25 +1025,15 @@ def is_message_finalized(message_text):
     return '✅' in message_text or '🔰' in message_text
 
 
-def reset_verification_state():
-    global verification_state
-    verification_state = {
-        'predicted_number': None,
-        'predicted_suit': None,
-        'current_check': 0,
-        'message_id': None,
-        'channel_id': None,
-        'status': None,
-        'base_game': None,
-        'timestamp': None
-    }
-
-
-def find_next_prediction(source_number):
-    for offset in range(1, TRIGGER_DISTANCE + 1):
+def find_next_prediction(tenant, source_number, after=None):
+    db = tenant.db
+    for offset in range(1, tenant.trigger_distance + 1):
         candidate = source_number + offset
-        if candidate in prediction_db:
-            return candidate, prediction_db[candidate]
+        if after is not None and candidate <= after:
+            continue
+        suit = db.get(candidate)
+        if suit is not None:
+            return candidate, suit
     return None, None
 
 
@@ -238,18 +1064,85 @@ def format_prediction(number, suit, status=None):
         return base + status
 
 
+def format_bilan(stats):
+    win_rate = (stats['wins'] / stats['total']) * 100 if stats['total'] else 0.0
+    wd = stats['win_details']
+    return (
+        f"📊 **BILAN**\n\n"
+        f"🎯 Total: {stats['total']}\n"
+        f"✅ Victoires: {stats['wins']} ({win_rate:.1f}%)\n"
+        f"❌ Défaites: {stats['losses']}\n\n"
+        f"**Détails victoires:**\n"
+        f"• ✅0️⃣ (N)   : {wd.get('✅0️⃣', 0)}\n"
+        f"• ✅1️⃣ (N+1) : {wd.get('✅1️⃣', 0)}\n"
+        f"• ✅2️⃣ (N+2) : {wd.get('✅2️⃣', 0)}\n"
+        f"• ✅3️⃣ (N+3) : {wd.get('✅3️⃣', 0)}\n\n"
+        f"⏹️ Expirées: {stats.get('expired', 0)}\n"
+        f"⏭️ Ignorées (slots occupés): {stats.get('skipped', 0)}"
+    )
+
+
+def format_streaks(rolling):
+    if rolling.streak > 0:
+        current = f"{rolling.streak} victoire(s)"
+    elif rolling.streak < 0:
+        current = f"{-rolling.streak} défaite(s)"
+    else:
+        current = "—"
+    return (
+        f"🔥 Série en cours: {current}\n"
+        f"🏆 Records: {rolling.best_win_streak} ✅ d'affilée / "
+        f"{rolling.worst_loss_streak} ❌ d'affilée"
+    )
+
+
+def window_title(name):
+    return f"dernières {name}" if name.endswith('h') else f"{name} dernières prédictions"
+
+
+def format_window(name, totals):
+    win_rate = (totals.wins / totals.total) * 100 if totals.total else 0.0
+    checks = totals.by_check
+    lines = [
+        f"📊 **BILAN — {window_title(name)}**\n",
+        f"🎯 Total: {totals.total}",
+        f"✅ Victoires: {totals.wins} ({win_rate:.1f}%)",
+        f"❌ Défaites: {totals.losses}",
+        f"⏹️ Expirées: {totals.expired}\n",
+        f"**Détails victoires:** ✅0️⃣ {checks[0]} | ✅1️⃣ {checks[1]} | "
+        f"✅2️⃣ {checks[2]} | ✅3️⃣ {checks[3]}\n",
+        "**Par costume:**",
+    ]
+    for code, suit in enumerate(SUITS):
+        if totals.suit_total[code]:
+            rate = totals.suit_wins[code] * 100 / totals.suit_total[code]
+            lines.append(f"• {suit} {totals.suit_wins[code]}/{totals.suit_total[code]} ({rate:.0f}%)")
+    if not any(totals.suit_total):
+        lines.append("• —")
+    return "\n".join(lines)
+
+
 # ============================================================
 # SERVEUR WEB
 # ============================================================
 
 async def handle_health(request):
-    status = "STOPPED" if bot_state['is_stopped'] else "RUNNING"
-    last = bot_state['last_source_number']
-    pred = verification_state['predicted_number'] or 'Libre'
-    db_size = len(prediction_db)
+    lines = []
+    for tenant in tenants.values():
+        status = "STOPPED" if tenant.state['is_stopped'] else "RUNNING"
+        last = tenant.state['last_source_number']
+        pred = ', '.join(f"#{n}" for n in tenant.verification.numbers()) or 'Libre'
+        db_size = tenant.db_size()
+        lines.append(
+            f"{tenant.label()}Bot {status} | Source: #{last} | Pred: {pred} | DB: {db_size} numéros"
+        )
+    return web.Response(text="\n".join(lines), status=200)
+
+
+async def handle_metrics(request):
     return web.Response(
-        text=f"Bot {status} | Source: #{last} | Pred: #{pred} | DB: {db_size} numéros",
-        status=200
+        text=metrics.render(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
     )
 
 
@@ -257,6 +1150,7 @@ async def start_web_server():
     app = web.Application()
     app.router.add_get('/', handle_health)
     app.router.add_get('/health', handle_health)
+    app.router.add_get('/metrics', handle_metrics)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', PORT)
@@ -269,55 +1163,69 @@ async def start_web_server():
 # SYSTÈME D'ARRÊT TEMPORAIRE + BLAGUES
 # ============================================================
 
-async def send_jokes_during_stop():
-    used_jokes = []
+async def send_joke(tenant):
+    used_jokes = tenant.state['used_jokes']
+    available = [j for j in JOKES_LIST if j not in used_jokes]
+    if not available:
+        used_jokes.clear()
+        available = JOKES_LIST
+    if not available:
+        return
 
-    while bot_state['is_stopped']:
-        if bot_state['stop_end'] and datetime.now() >= bot_state['stop_end']:
-            logger.info("⏰ Fin de l'arrêt temporaire programmée")
-            await stop_temporary_stop()
-            break
+    joke = random.choice(available)
+    used_jokes.append(joke)
 
-        available = [j for j in JOKES_LIST if j not in used_jokes]
-        if not available:
-            used_jokes = []
-            available = JOKES_LIST
+    try:
+        await outbound.send(
+            tenant.prediction_channel_id,
+            f"😄 **Blague du moment**\n\n{joke}",
+            priority=PRIORITY_JOKE
+        )
+        tenant.log.info("😄 Blague envoyée")
+    except Exception as e:
+        tenant.log.error(f"❌ Erreur envoi blague: {e}")
 
-        if not available:
-            await asyncio.sleep(JOKE_INTERVAL_SECONDS)
-            continue
 
-        joke = random.choice(available)
-        used_jokes.append(joke)
+async def end_temporary_stop(tenant):
+    tenant.log.info("⏰ Fin programmée de l'arrêt temporaire")
+    await stop_temporary_stop(tenant)
 
-        try:
-            await bot_client.send_message(
-                PREDICTION_CHANNEL_ID,
-                f"😄 **Blague du moment**\n\n{joke}"
-            )
-            logger.info("😄 Blague envoyée")
-        except Exception as e:
-            logger.error(f"❌ Erreur envoi blague: {e}")
 
-        # Attendre l'intervalle en petits morceaux pour pouvoir s'arrêter
-        elapsed = 0
-        while elapsed < JOKE_INTERVAL_SECONDS and bot_state['is_stopped']:
-            await asyncio.sleep(10)
-            elapsed += 10
+def schedule_stop(tenant):
+    """Blagues et fin de l'arrêt en cours, sur minuteurs."""
+    scheduler.every(('jokes', tenant.name), JOKE_INTERVAL_SECONDS, send_joke, tenant)
+    if tenant.state['stop_end']:
+        scheduler.at(('stop_end', tenant.name), tenant.state['stop_end'], end_temporary_stop, tenant)
+    else:
+        scheduler.cancel(('stop_end', tenant.name))
+
 
+async def start_temporary_stop(tenant, minutes, until=None, reason=None):
+    """Arrêt de minutes (0 = indéfini), ou jusqu'à until (pause programmée)."""
+    bot_state = tenant.state
+    if until is None and minutes > 0:
+        until = now() + timedelta(minutes=minutes)
 
-async def start_temporary_stop(minutes):
     if bot_state['is_stopped']:
-        await bot_client.send_message(ADMIN_ID, "⚠️ Arrêt temporaire déjà en cours!")
+        if reason is None:
+            outbound.send(ADMIN_ID, f"{tenant.label()}⚠️ Arrêt temporaire déjà en cours!")
+            return False
+        # Pause programmée pendant un arrêt limité: on le prolonge si besoin
+        if bot_state['stop_end'] and bot_state['stop_end'] < until:
+            bot_state['stop_end'] = until
+            schedule_stop(tenant)
+            tenant.log.info(f"🛑 Arrêt prolongé jusqu'à {until:%H:%M} ({reason})")
         return False
 
     bot_state['is_stopped'] = True
-    bot_state['stop_end'] = datetime.now() + timedelta(minutes=minutes) if minutes > 0 else None
+    bot_state['stop_end'] = until
 
-    if verification_state['predicted_number'] is not None:
-        reset_verification_state()
+    tenant.verification.clear()
 
-    duree_txt = f"{minutes} minutes" if minutes > 0 else "indéfinie"
+    if reason is not None:
+        duree_txt = f"jusqu'à {until:%H:%M} ({reason})"
+    else:
+        duree_txt = f"{minutes} minutes" if minutes > 0 else "indéfinie"
     msg = (
         f"🛑 **ARRÊT TEMPORAIRE ACTIVÉ**\n\n"
         f"⏱️ Durée : {duree_txt}\n"
@@ -326,28 +1234,23 @@ async def start_temporary_stop(minutes):
         f"Utilisez /resume pour reprendre"
     )
 
-    await bot_client.send_message(PREDICTION_CHANNEL_ID, msg)
-    await bot_client.send_message(ADMIN_ID, f"🛑 Arrêt temporaire démarré ({duree_txt})")
+    outbound.send(tenant.prediction_channel_id, msg)
+    outbound.send(ADMIN_ID, f"{tenant.label()}🛑 Arrêt temporaire démarré ({duree_txt})")
 
-    bot_state['joke_task'] = asyncio.create_task(send_jokes_during_stop())
-    logger.info(f"🛑 Arrêt temporaire démarré: {duree_txt}")
+    schedule_stop(tenant)
+    tenant.log.info(f"🛑 Arrêt temporaire démarré: {duree_txt}")
     return True
 
 
-async def stop_temporary_stop():
+async def stop_temporary_stop(tenant):
+    bot_state = tenant.state
     if not bot_state['is_stopped']:
         return False
 
     bot_state['is_stopped'] = False
     bot_state['stop_end'] = None
-
-    if bot_state['joke_task']:
-        bot_state['joke_task'].cancel()
-        try:
-            await bot_state['joke_task']
-        except asyncio.CancelledError:
-            pass
-        bot_state['joke_task'] = None
+    scheduler.cancel(('jokes', tenant.name))
+    scheduler.cancel(('stop_end', tenant.name))
 
     msg = (
         "✅ **ARRÊT TERMINÉ**\n\n"
@@ -355,643 +1258,1559 @@ async def stop_temporary_stop():
         "🎰 Bonne chance à tous! 🍀"
     )
 
-    await bot_client.send_message(PREDICTION_CHANNEL_ID, msg)
-    await bot_client.send_message(ADMIN_ID, "✅ Arrêt terminé — Prédictions relancées")
-    logger.info("✅ Arrêt temporaire terminé")
+    outbound.send(tenant.prediction_channel_id, msg)
+    outbound.send(ADMIN_ID, f"{tenant.label()}✅ Arrêt terminé — Prédictions relancées")
+    tenant.log.info("✅ Arrêt temporaire terminé")
     return True
 
 
 # ============================================================
-# SYSTÈME DE PRÉDICTION
+# PAUSES PROGRAMMÉES (FENÊTRES QUOTIDIENNES)
 # ============================================================
 
-async def send_prediction(target_game, predicted_suit, base_game):
-    if bot_state['is_stopped']:
-        logger.info("🛑 Prédiction bloquée: arrêt temporaire en cours")
-        return False
+def parse_pause_windows(windows):
+    """Valide config.PAUSE_WINDOWS: heures HH:MM, fuseau pytz, locataires connus."""
+    parsed = []
+    for window in windows:
+        try:
+            start = datetime.strptime(window['start'], '%H:%M').time()
+            end = datetime.strptime(window['end'], '%H:%M').time()
+            zone = pytz.timezone(window.get('timezone', 'UTC'))
+        except (KeyError, ValueError, pytz.UnknownTimeZoneError) as e:
+            raise ValueError(f"Pause invalide {window!r}: {e}")
+        if start == end:
+            raise ValueError(f"Pause vide {window!r}")
+        names = window.get('tenants')
+        for name in names or ():
+            if name not in tenant_names():
+                raise ValueError(f"Pause {window!r}: locataire inconnu {name}")
+        parsed.append({
+            'start': start, 'end': end, 'zone': zone, 'tenants': names,
+            'label': f"pause {window['start']}–{window['end']} {zone.zone}",
+        })
+    return parsed
 
-    if verification_state['predicted_number'] is not None:
-        logger.error(
-            f"⛔ BLOQUÉ: Prédiction #{verification_state['predicted_number']} "
-            f"en cours de vérification!"
-        )
-        return False
 
-    try:
-        prediction_text = format_prediction(target_game, predicted_suit, "pending")
-        sent_msg = await bot_client.send_message(PREDICTION_CHANNEL_ID, prediction_text)
+def tenant_names():
+    return [spec['name'] for spec in tenant_specs()]
 
-        verification_state.update({
-            'predicted_number': target_game,
-            'predicted_suit': predicted_suit,
-            'current_check': 0,
-            'message_id': sent_msg.id,
-            'channel_id': PREDICTION_CHANNEL_ID,
-            'status': 'pending',
-            'base_game': base_game,
-            'timestamp': datetime.now()
-        })
 
-        bot_state['last_prediction_number'] = target_game
-        bot_state['predictions_history'].append({
-            'number': target_game,
-            'suit': predicted_suit,
-            'trigger': base_game,
-            'timestamp': datetime.now().strftime('%H:%M:%S')
-        })
+def next_pause_window(window, moment):
+    """(début, fin) de la fenêtre en cours ou de la prochaine après moment, en heure locale."""
+    zone = window['zone']
+    # now() est naïf en heure locale: astimezone() l'interprète comme tel
+    day = moment.astimezone(zone).date()
+    for offset in (-1, 0, 1):
+        date = day + timedelta(days=offset)
+        start = zone.localize(datetime.combine(date, window['start']))
+        end_date = date if window['end'] > window['start'] else date + timedelta(days=1)
+        end = zone.localize(datetime.combine(end_date, window['end']))
+        start, end = (t.astimezone().replace(tzinfo=None) for t in (start, end))
+        if end > moment:
+            return start, end
+    raise AssertionError("fenêtre introuvable")
 
-        logger.info(
-            f"🚀 PRÉDICTION #{target_game} ({predicted_suit}) lancée "
-            f"[déclencheur #{base_game}]"
-        )
-        return True
 
-    except Exception as e:
-        logger.error(f"❌ Erreur envoi prédiction: {e}")
-        return False
+def schedule_pause_window(tenant, index, window, after=None):
+    start, end = next_pause_window(window, after or now())
+    scheduler.at(('pause', tenant.name, index), start, begin_pause_window, tenant, index, window, end)
 
 
-async def update_prediction_status(status):
-    global stats_bilan
+async def begin_pause_window(tenant, index, window, end):
+    await start_temporary_stop(tenant, 0, until=end, reason=window['label'])
+    schedule_pause_window(tenant, index, window, after=end)
 
-    if verification_state['predicted_number'] is None:
-        return False
 
-    try:
-        predicted_num = verification_state['predicted_number']
-        predicted_suit = verification_state['predicted_suit']
-
-        updated_text = format_prediction(predicted_num, predicted_suit, status)
-        await bot_client.edit_message(
-            verification_state['channel_id'],
-            verification_state['message_id'],
-            updated_text
-        )
+def start_schedules():
+    """Arrêts restaurés au démarrage et pauses programmées des locataires de ce processus."""
+    windows = parse_pause_windows(PAUSE_WINDOWS)
+    for tenant in tenants.values():
+        if tenant.state['is_stopped']:
+            # Arrêt temporaire en cours avant le redémarrage: blagues et fin reprogrammées
+            schedule_stop(tenant)
+        for index, window in enumerate(windows):
+            if window['tenants'] is None or tenant.name in window['tenants']:
+                schedule_pause_window(tenant, index, window)
 
-        if status in WIN_LABELS:
-            stats_bilan['total'] += 1
-            stats_bilan['wins'] += 1
-            stats_bilan['win_details'][status] = stats_bilan['win_details'].get(status, 0) + 1
-            logger.info(f"🎉 #{predicted_num} GAGNÉ ({status})")
-        elif status == '❌':
-            stats_bilan['total'] += 1
-            stats_bilan['losses'] += 1
-            logger.info(f"💔 #{predicted_num} PERDU")
-        elif status == '⏹️':
-            logger.info(f"⏹️ #{predicted_num} EXPIRÉ")
-
-        logger.info("🔓 SYSTÈME LIBÉRÉ")
-        reset_verification_state()
-        return True
 
-    except Exception as e:
-        logger.error(f"❌ Erreur mise à jour statut: {e}")
-        return False
+# ============================================================
+# SYSTÈME DE PRÉDICTION
+# ============================================================
 
+async def send_prediction(tenant, target_game, predicted_suit, base_game, source_date=None):
+    bot_state = tenant.state
+    verification = tenant.verification
 
-async def process_verification_step(game_number, message_text):
-    if verification_state['predicted_number'] is None:
-        return
+    if bot_state['is_stopped']:
+        tenant.log.info("🛑 Prédiction bloquée: arrêt temporaire en cours")
+        return False
 
-    predicted_num = verification_state['predicted_number']
-    predicted_suit = verification_state['predicted_suit']
-    current_check = verification_state['current_check']
+    if verification.busy(target_game):
+        tenant.log.info(f"ℹ️ Prédiction #{target_game} déjà en cours")
+        return False
 
-    expected_number = predicted_num + current_check
-    if game_number != expected_number:
-        logger.warning(f"⚠️ Reçu #{game_number} != attendu #{expected_number}")
-        return
+    if verification.is_full():
+        bot_state['blocked_targets'].add(target_game)
+        pending = ', '.join(f"#{n}" for n in verification.numbers())
+        tenant.log.warning(
+            f"⛔ BLOQUÉ: {len(verification)}/{verification.max_slots} "
+            f"prédictions en cours de vérification ({pending})"
+        )
+        return False
 
-    suits = extract_suits_from_first_group(message_text)
-    logger.info(
-        f"🔍 Vérification #{game_number}: groupes={suits}, attendu={predicted_suit}"
+    # Le slot est pris tout de suite et le message part en file: le handler
+    # source n'attend ni les limites de débit, ni les FloodWait, ni les reprises
+    prediction_text = format_prediction(target_game, predicted_suit, "pending")
+    posted = outbound.send(
+        tenant.prediction_channel_id, prediction_text, priority=PRIORITY_PREDICTION
+    )
+    slot = verification.open(
+        target_game, predicted_suit, None, tenant.prediction_channel_id, base_game
     )
+    slot['post'] = posted
+    bot_state['blocked_targets'].discard(target_game)
+    bot_state['last_prediction_number'] = target_game
+    tenant.history.add(target_game, predicted_suit, base_game, now().timestamp())
+
+    on_posted = functools.partial(prediction_posted, tenant, slot, source_date)
+    if posted.done():
+        on_posted(posted)
+    else:
+        posted.add_done_callback(on_posted)
 
-    predicted_normalized = predicted_suit.replace('❤️', '♥️').replace('❤', '♥️')
+    tenant.log.info(
+        f"🚀 PRÉDICTION #{target_game} ({predicted_suit}) lancée "
+        f"[déclencheur #{base_game}]"
+    )
+    # Le jeu prédit est peut-être déjà arrivé
+    await verify_from_outcomes(tenant, slot)
+    return True
 
-    if predicted_normalized in suits:
-        win_label = WIN_LABELS[current_check]
-        logger.info(f"🎉 GAGNÉ! {predicted_suit} trouvé au check {current_check} → {win_label}")
-        await update_prediction_status(win_label)
+
+def prediction_posted(tenant, slot, source_date, future):
+    """Fin de l'envoi d'une prédiction: note l'id du message, ou libère le slot."""
+    if slot.pop('post', None) is None:
+        return
+    predicted_num = slot['predicted_number']
+    error = 'annulé' if future.cancelled() else future.exception()
+    if error is not None:
+        tenant.log.error(f"❌ Erreur envoi prédiction #{predicted_num}: {error}")
+        if tenant.verification.slots.get(predicted_num) is slot:
+            tenant.verification.close(predicted_num)
+            tenant.history.resolve(predicted_num, EXPIRED, slot['current_check'], now().timestamp())
         return
 
-    if current_check < 3:
-        verification_state['current_check'] += 1
-        next_num = predicted_num + verification_state['current_check']
-        logger.info(f"❌ Check {current_check} échoué sur #{game_number}, prochain: #{next_num}")
-    else:
-        logger.info(f"💔 PERDU après 4 vérifications")
-        await update_prediction_status("❌")
+    slot['message_id'] = future.result().id
+    if source_date is not None:
+        PREDICTION_POST_SECONDS.observe(
+            max(0.0, time.time() - source_date.timestamp()), tenant=tenant.name
+        )
+
+
+def edit_prediction(tenant, slot, text, status):
+    """Met en file l'édition du message de slot, après son envoi s'il est encore en file."""
+    def edit(future=None):
+        if future is not None and (future.cancelled() or future.exception() is not None):
+            return
+        observe_edit_latency(
+            tenant, outbound.edit(slot['channel_id'], slot['message_id'], text), status
+        )
+
+    posted = slot.get('post')
+    if posted is not None:
+        # Appelé après prediction_posted, qui a noté l'id du message
+        posted.add_done_callback(edit)
+    elif slot['message_id'] is not None:
+        edit()
+
 
+def record_outcome(tenant, slot, outcome):
+    at = now().timestamp()
+    check = slot['current_check']
+    tenant.history.resolve(slot['predicted_number'], outcome, check, at)
+    tenant.rolling.record(outcome, check, suit_code(slot['predicted_suit']), at)
 
-async def check_prediction_timeout(current_game):
-    if verification_state['predicted_number'] is None:
+
+async def update_prediction_status(tenant, slot, status):
+    verification = tenant.verification
+    stats_bilan = tenant.stats
+
+    predicted_num = slot['predicted_number']
+    if predicted_num not in verification:
         return False
 
-    predicted_num = verification_state['predicted_number']
+    predicted_suit = slot['predicted_suit']
+    slot['status'] = status
 
-    if current_game > predicted_num + PREDICTION_TIMEOUT:
-        logger.warning(f"⏰ PRÉDICTION #{predicted_num} EXPIRÉE (actuel: #{current_game})")
+    # L'édition est mise en file (réessayée en cas de FloodWait): le slot
+    # peut être libéré tout de suite sans perdre le résultat.
+    updated_text = format_prediction(predicted_num, predicted_suit, status)
+    edit_prediction(tenant, slot, updated_text, status)
 
-        try:
-            updated_text = format_prediction(
-                predicted_num, verification_state['predicted_suit'], "⏹️"
-            )
-            await bot_client.edit_message(
-                verification_state['channel_id'],
-                verification_state['message_id'],
-                updated_text
-            )
-            await bot_client.send_message(
-                ADMIN_ID,
-                f"⚠️ Prédiction #{predicted_num} expirée. Système libéré."
-            )
-        except Exception as e:
-            logger.error(f"Erreur mise à jour expiration: {e}")
+    outcome = WIN if status in WIN_LABELS else LOSS if status == '❌' else EXPIRED
+    record_outcome(tenant, slot, outcome)
 
-        reset_verification_state()
-        return True
+    if status in WIN_LABELS:
+        stats_bilan['total'] += 1
+        stats_bilan['wins'] += 1
+        stats_bilan['win_details'][status] = stats_bilan['win_details'].get(status, 0) + 1
+        tenant.log.info(f"🎉 #{predicted_num} GAGNÉ ({status})")
+    elif status == '❌':
+        stats_bilan['total'] += 1
+        stats_bilan['losses'] += 1
+        tenant.log.info(f"💔 #{predicted_num} PERDU")
+    elif status == '⏹️':
+        tenant.log.info(f"⏹️ #{predicted_num} EXPIRÉ")
 
-    return False
+    verification.close(predicted_num)
+    tenant.log.info(
+        f"🔓 SLOT #{predicted_num} LIBÉRÉ ({len(verification)}/{verification.max_slots})"
+    )
+    return True
 
 
-async def check_and_launch_prediction(game_number):
-    if bot_state['is_stopped']:
+async def process_verification_step(tenant, slot, game_number, suits):
+    if slot['status'] != 'pending':
         return
 
-    await check_prediction_timeout(game_number)
+    predicted_num = slot['predicted_number']
+    predicted_suit = slot['predicted_suit']
+    current_check = slot['current_check']
+
+    expected_number = predicted_num + current_check
+    if game_number != expected_number:
+        tenant.log.warning(f"⚠️ Reçu #{game_number} != attendu #{expected_number}")
+        return
+
+    tenant.log.info(
+        f"🔍 Vérification #{game_number}: groupes={suits}, attendu={predicted_suit}"
+    )
+
+    if SOURCE_SUITS[suit_code(predicted_suit)] in suits:
+        win_label = WIN_LABELS[current_check]
+        tenant.log.info(f"🎉 GAGNÉ! {predicted_suit} trouvé au check {current_check} → {win_label}")
+        await update_prediction_status(tenant, slot, win_label)
+        return
+
+    if current_check < 3:
+        next_num = tenant.verification.advance(slot)
+        tenant.log.info(f"❌ Check {current_check} échoué sur #{game_number}, prochain: #{next_num}")
+        await verify_from_outcomes(tenant, slot)
+    else:
+        tenant.log.info(f"💔 PERDU après 4 vérifications")
+        await update_prediction_status(tenant, slot, "❌")
+
+
+async def verify_from_outcomes(tenant, slot):
+    """Continue la vérification si le jeu attendu par slot est déjà connu."""
+    expected = slot['predicted_number'] + slot['current_check']
+    suits = tenant.outcomes.get(expected)
+    if suits is None or slot['predicted_number'] not in tenant.verification:
+        return
+    tenant.log.info(f"🗂️ #{expected} déjà reçu, vérification immédiate")
+    await process_verification_step(tenant, slot, expected, suits)
+
+
+async def check_prediction_timeout(tenant, current_game):
+    verification = tenant.verification
+    expired = verification.expired(current_game, tenant.timeout)
 
-    if verification_state['predicted_number'] is not None:
+    for slot in expired:
+        expire_slot(tenant, slot, current_game)
+
+    return bool(expired)
+
+
+def expire_slot(tenant, slot, current_game):
+    predicted_num = slot['predicted_number']
+    tenant.log.warning(f"⏰ PRÉDICTION #{predicted_num} EXPIRÉE (actuel: #{current_game})")
+    tenant.verification.close(predicted_num)
+    tenant.stats['expired'] += 1
+    record_outcome(tenant, slot, EXPIRED)
+
+    updated_text = format_prediction(predicted_num, slot['predicted_suit'], "⏹️")
+    edit_prediction(tenant, slot, updated_text, '⏹️')
+    outbound.send(
+        ADMIN_ID, f"{tenant.label()}⚠️ Prédiction #{predicted_num} expirée. Slot libéré."
+    )
+
+
+def is_new_series(tenant, game_number):
+    """
+    Le canal source renumérote ses jeux depuis #1 chaque jour: un nouveau
+    message nettement en dessous du dernier numéro ouvre une nouvelle série.
+    """
+    return game_number + tenant.timeout < tenant.state['last_source_number']
+
+
+def start_new_series(tenant, game_number):
+    """Oublie tout ce qui dépend des numéros de la série précédente."""
+    bot_state = tenant.state
+    verification = tenant.verification
+    tenant.log.info(
+        f"🔄 Nouvelle série: #{bot_state['last_source_number']} → #{game_number}"
+    )
+    # Les jeux attendus par ces prédictions ne viendront plus
+    for n in verification.numbers():
+        expire_slot(tenant, verification.slots[n], game_number)
+    tenant.stats['skipped'] += len(bot_state['blocked_targets'])
+    bot_state['blocked_targets'].clear()
+    bot_state['last_prediction_number'] = None
+    tenant.outcomes.clear()
+
+
+def count_skipped_targets(tenant, game_number):
+    # Une cible bloquée que la source a atteinte ne sera plus jamais prédite
+    blocked = tenant.state['blocked_targets']
+    for target in [t for t in blocked if t <= game_number]:
+        blocked.discard(target)
+        tenant.stats['skipped'] += 1
+
+
+async def check_and_launch_prediction(tenant, game_number, source_date=None):
+    bot_state = tenant.state
+    if bot_state['is_stopped']:
         return
 
-    if not prediction_db:
-        logger.debug("📭 Base de prédiction vide")
+    count_skipped_targets(tenant, game_number)
+    await check_prediction_timeout(tenant, game_number)
+
+    if not tenant.db:
+        tenant.log.debug("📭 Base de prédiction vide")
         return
 
-    target_num, suit = find_next_prediction(game_number)
+    target_num, suit = find_next_prediction(
+        tenant, game_number, after=bot_state['last_prediction_number']
+    )
 
     if target_num is None:
         return
 
-    logger.info(
+    tenant.log.info(
         f"🎯 Cible DB: #{target_num} ({suit}) [source #{game_number}]"
     )
-    await send_prediction(target_num, suit, game_number)
+    await send_prediction(tenant, target_num, suit, game_number, source_date)
 
 
 # ============================================================
 # TRAITEMENT DES MESSAGES SOURCE
 # ============================================================
 
-async def process_source_message(event, is_edit=False):
+async def process_source_message(tenant, event, is_edit=False, replay=False):
+    bot_state = tenant.state
+    verification = tenant.verification
     try:
-        message_text = event.message.message
-        game_number = extract_game_number(message_text)
-
-        if game_number is None:
+        if not is_edit and event.message.id > bot_state['last_message_id']:
+            bot_state['last_message_id'] = event.message.id
+        parsed = tenant.ingest.accept(event.message.id, event.message.message or '')
+        if parsed is None:
             return
 
-        is_editing = is_message_editing(message_text)
-        is_finalized = is_message_finalized(message_text)
+        game_number = parsed.game_number
+
+        is_editing = parsed.is_editing
+        is_finalized = parsed.is_finalized
 
         log_type = "ÉDITÉ" if is_edit else "NOUVEAU"
         log_status = "⏰" if is_editing else ("✅" if is_finalized else "📝")
-        logger.info(f"📩 {log_status} {log_type}: #{game_number}")
+        tenant.log.info(f"📩 {log_status} {log_type}: #{game_number}")
 
+        if not is_edit and is_new_series(tenant, game_number):
+            start_new_series(tenant, game_number)
         bot_state['last_source_number'] = game_number
+        if not is_editing or is_finalized:
+            tenant.outcomes.put(game_number, parsed.suits)
 
-        if verification_state['predicted_number'] is not None:
-            predicted_num = verification_state['predicted_number']
-            current_check = verification_state['current_check']
-            expected_number = predicted_num + current_check
+        if len(verification):
+            await check_prediction_timeout(tenant, game_number)
 
-            if game_number > predicted_num + PREDICTION_TIMEOUT:
-                await check_prediction_timeout(game_number)
-                if verification_state['predicted_number'] is None:
-                    await check_and_launch_prediction(game_number)
+            slots = verification.expecting(game_number)
+            if not slots and len(verification):
+                waiting = ', '.join(
+                    f"#{n + verification.slots[n]['current_check']}" for n in verification.numbers()
+                )
+                tenant.log.info(f"⏭️ Attente {waiting}, reçu #{game_number}")
 
-            elif game_number == expected_number:
+            resolved = False
+            for slot in slots:
                 if is_editing and not is_finalized:
-                    logger.info(f"⏳ #{game_number} en édition, attente...")
-                    return
-
-                if is_finalized or not is_editing:
-                    logger.info(f"✅ Vérification #{game_number}...")
-                    await process_verification_step(game_number, message_text)
-
-                    if verification_state['predicted_number'] is None:
-                        await asyncio.sleep(1)
-                        await check_and_launch_prediction(bot_state['last_source_number'])
-                    return
-                else:
-                    logger.info(f"⏳ Attente finalisation #{game_number}")
-                    return
-            else:
-                logger.info(f"⏭️ Attente #{expected_number}, reçu #{game_number}")
+                    tenant.log.info(f"⏳ #{game_number} en édition, attente...")
+                    break
 
+                tenant.log.info(
+                    f"✅ Vérification #{game_number} (prédiction #{slot['predicted_number']})..."
+                )
+                await process_verification_step(tenant, slot, game_number, parsed.suits)
+                if slot['predicted_number'] not in verification:
+                    resolved = True
+
+            if resolved:
+                await pause(1)
+                game_number = bot_state['last_source_number']
+
+        if replay:
+            # Message rattrapé: ses cibles sont déjà jouées, rien n'est lancé
+            count_skipped_targets(tenant, game_number)
+            await check_prediction_timeout(tenant, game_number)
             return
-
-        await check_and_launch_prediction(game_number)
+        await check_and_launch_prediction(tenant, game_number, event.message.date)
 
     except Exception as e:
-        logger.error(f"❌ Erreur traitement message: {e}")
+        tenant.log.error(f"❌ Erreur traitement message: {e}")
         import traceback
-        logger.error(traceback.format_exc())
+        tenant.log.error(traceback.format_exc())
+
+
+async def route_source_message(event, is_edit=False):
+    """Aiguille un événement source vers son locataire (une recherche dans un dict)."""
+    tenant = tenants_by_source.get(event.chat_id)
+    if tenant is None:
+        return
+    if tenant.catch_up is not None:
+        tenant.catch_up.append((event, is_edit))
+        return
+    if is_edit or not has_source_gap(tenant, event.message.id):
+        await deliver_source_message(tenant, event, is_edit)
+        return
+    tenant.catch_up = [(event, is_edit)]
+    await catch_up_source(tenant)
+
+
+async def deliver_source_message(tenant, event, is_edit, replay=False):
+    if shards is not None:
+        message = event.message
+        if not is_edit:
+            tenant.state['last_message_id'] = max(tenant.state['last_message_id'], message.id)
+        shards.post(tenant.name, (
+            'event', tenant.name, message.id, message.message or '', message.date, is_edit, replay
+        ))
+        return
+    await process_source_message(tenant, event, is_edit, replay)
+
+
+# ============================================================
+# RATTRAPAGE DES MESSAGES MANQUÉS
+# ============================================================
+
+# Identifiants demandés par appel (channels.getMessages)
+CATCHUP_BATCH_SIZE = 100
+
+
+class ReplayedEvent(NamedTuple):
+    """Message relu par identifiant, présenté comme un événement NewMessage."""
+    chat_id: int
+    message: object
+
+
+def has_source_gap(tenant, message_id):
+    last_id = tenant.state['last_message_id']
+    return CATCHUP_MAX_MESSAGES > 0 and last_id > 0 and message_id > last_id + 1
+
+
+async def fetch_source_messages(tenant, ids):
+    """Messages du canal source pour ids (ordre croissant), sans les supprimés."""
+    messages = []
+    for i in range(0, len(ids), CATCHUP_BATCH_SIZE):
+        batch = await bot_client.get_messages(
+            tenant.source_channel_id, ids=ids[i:i + CATCHUP_BATCH_SIZE]
+        )
+        messages.extend(m for m in batch if m is not None and m.message is not None)
+    return messages
+
+
+async def replay_source_gap(tenant, upto):
+    """
+    Rejoue les messages entre last_message_id et upto (exclu), au plus les
+    CATCHUP_MAX_MESSAGES plus récents. Les jeux rejoués concluent les
+    vérifications en cours mais ne lancent aucune prédiction: leurs cibles
+    sont déjà jouées quand le message live upto arrive.
+    """
+    last_id = tenant.state['last_message_id']
+    if CATCHUP_MAX_MESSAGES <= 0 or not last_id:
+        return 0
+
+    first = max(last_id + 1, upto - CATCHUP_MAX_MESSAGES)
+    if first > last_id + 1:
+        tenant.log.warning(
+            f"⚠️ Rattrapage limité aux {CATCHUP_MAX_MESSAGES} derniers messages "
+            f"({first - last_id - 1} ignorés)"
+        )
+    messages = await fetch_source_messages(tenant, list(range(first, upto)))
+
+    for message in messages:
+        await deliver_source_message(
+            tenant, ReplayedEvent(tenant.source_channel_id, message), False, replay=True
+        )
+    if messages:
+        tenant.ingest.counters['replayed'] = tenant.ingest.counters.get('replayed', 0) + len(messages)
+        tenant.log.info(
+            f"🔁 Rattrapage: {len(messages)} message(s) rejoué(s) "
+            f"(id {messages[0].id} → {messages[-1].id})"
+        )
+    return len(messages)
+
+
+async def catch_up_source(tenant):
+    """
+    Comble les trous avant de reprendre le direct: les événements live reçus
+    entre-temps attendent dans tenant.catch_up et passent ensuite, dans
+    l'ordre, chacun précédé des messages manqués juste avant lui.
+    """
+    if tenant.catch_up is None:
+        tenant.catch_up = []
+    pending = tenant.catch_up
+    try:
+        while pending:
+            event, is_edit = pending.pop(0)
+            if not is_edit and has_source_gap(tenant, event.message.id):
+                await replay_source_gap_safely(tenant, event.message.id)
+            await deliver_source_message(tenant, event, is_edit)
+    finally:
+        tenant.catch_up = None
+
+
+async def replay_source_gap_safely(tenant, upto):
+    # Un échec de lecture ne doit pas bloquer le direct: le trou est abandonné
+    try:
+        await replay_source_gap(tenant, upto)
+    except Exception as e:
+        tenant.log.error(f"❌ Erreur rattrapage: {e}")
+
+
+# ============================================================
+# PROFILAGE À LA DEMANDE (/profile)
+# ============================================================
+
+active_profiler = None
+
+
+async def run_profile(seconds):
+    """Échantillonne le thread de la boucle pendant seconds puis envoie le rapport."""
+    global active_profiler
+
+    profiler = SamplingProfiler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+    active_profiler = profiler
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        active_profiler = None
+
+    report = profiler.report()
+    report_file = io.BytesIO(report.encode('utf-8'))
+    report_file.name = f"profile_{now().strftime('%Y%m%d_%H%M%S')}.txt"
+    summary = "\n".join(report.splitlines()[:2])
+    outbound.send_file(ADMIN_ID, report_file, caption=f"🔬 **Profil terminé**\n{summary}")
+    logger.info(f"🔬 Profil envoyé ({profiler.samples} échantillons)")
 
 
 # ============================================================
 # COMMANDES ADMIN
 # ============================================================
 
-async def handle_admin_commands(event):
-    global JOKES_LIST, prediction_db
+ADMIN_COMMAND_SECONDS = metrics.histogram(
+    'bot_admin_command_duration_seconds',
+    "Durée d'exécution des commandes admin (tâches de fond comprises)",
+    labelnames=('command',)
+)
+
+# Commandes traitées par le coordinateur en mode réparti (les autres vont au worker)
+COORDINATOR_COMMANDS = {'/start', '/tenants', '/use', '/profile'}
+
+# Commande → (fonction, lourde). Une commande lourde tourne en tâche de fond
+# (annulable avec /cancel) au lieu d'occuper le handler.
+admin_commands = {}
+
+# Commandes lourdes en cours: id → (commande, tâche, début)
+admin_tasks = {}
+_admin_task_ids = itertools.count(1)
+
+
+def admin_command(name, heavy=False):
+    def register(func):
+        admin_commands[name] = (func, heavy)
+        return func
+    return register
+
+
+class CommandContext:
+    """Commande reçue: arguments, locataire visé (/use) et réponse à l'admin."""
+
+    __slots__ = ('event', 'args', 'tenant', 'quiet', 'task_id', 'edit_message_id')
+
+    def __init__(self, event, args, tenant, quiet=False, edit_message_id=None):
+        self.event = event
+        self.args = args
+        self.tenant = tenant
+        self.quiet = quiet
+        self.task_id = None
+        # Réponse par édition de ce message (boutons inline) au lieu d'un envoi
+        self.edit_message_id = edit_message_id
+
+    async def reply(self, text, **kwargs):
+        # Par la file d'envoi: les prédictions passent avant les réponses admin
+        if self.quiet:
+            return
+        if self.edit_message_id is not None:
+            await outbound.edit(
+                self.event.chat_id, self.edit_message_id, text, priority=PRIORITY_ADMIN, **kwargs
+            )
+        else:
+            await outbound.send(self.event.chat_id, text, priority=PRIORITY_ADMIN, **kwargs)
+
+
+async def run_admin_command(cmd, func, ctx):
+    started = time.perf_counter()
+    try:
+        await func(ctx)
+    except Exception as e:
+        logger.error(f"Erreur commande {cmd}: {e}")
+        await ctx.reply(f"❌ Erreur: {str(e)}")
+    finally:
+        ADMIN_COMMAND_SECONDS.observe(time.perf_counter() - started, command=cmd)
+
+
+def start_admin_task(cmd, func, ctx):
+    task_id = next(_admin_task_ids)
+    ctx.task_id = task_id
+    task = asyncio.create_task(run_admin_command(cmd, func, ctx))
+    admin_tasks[task_id] = (cmd, task, time.monotonic())
+    task.add_done_callback(lambda _: admin_tasks.pop(task_id, None))
+    return task_id
+
 
+def cancel_admin_tasks(args):
+    """Liste ou annule les commandes lourdes ; None si rien ne correspond."""
+    if not admin_tasks:
+        return None
+
+    if not args:
+        lines = [
+            f"#{task_id} {cmd} ({time.monotonic() - started:.0f}s)"
+            for task_id, (cmd, _, started) in sorted(admin_tasks.items())
+        ]
+        return "🧵 **Commandes en cours**\n" + "\n".join(lines) + "\n\n/cancel <id> ou /cancel all"
+
+    if args[0].lower() == 'all':
+        targets = list(admin_tasks)
+    else:
+        try:
+            task_id = int(args[0].lstrip('#'))
+        except ValueError:
+            return None
+        if task_id not in admin_tasks:
+            return None
+        targets = [task_id]
+
+    for task_id in targets:
+        admin_tasks[task_id][1].cancel()
+    return "⏹️ Annulée(s): " + ", ".join(f"#{t} {admin_tasks[t][0]}" for t in targets)
+
+
+async def handle_admin_commands(event, quiet=False, edit_message_id=None):
     if event.sender_id != ADMIN_ID:
         return
 
-    text = (event.message.text or '').strip()
-    parts = text.split()
+    parts = (event.message.text or '').strip().split()
     if not parts:
         return
 
     cmd = parts[0].lower()
+    # Les commandes de base et de contrôle visent le locataire sélectionné (/use)
+    tenant = admin_tenant()
+    ctx = CommandContext(event, parts, tenant, quiet, edit_message_id)
+
+    if shards is not None and cmd not in COORDINATOR_COMMANDS:
+        # Mode réparti: l'état du locataire est dans son worker, qui répond lui-même
+        if cmd == '/pre':
+            mode, inline = parse_pre_args(parts)
+            for t in tenants.values():
+                t.state['waiting_for_predictions'] = False
+            tenant.state['waiting_for_predictions'] = mode if inline is None else False
+        elif cmd == '/reset':
+            tenant.state['waiting_for_predictions'] = False
+        elif cmd == '/cancel':
+            # Les tâches du coordinateur (/profile) sont annulées ici
+            cancelled = cancel_admin_tasks(parts[1:])
+            if cancelled:
+                await ctx.reply(cancelled)
+        shards.forward_admin(
+            tenant.name, ' '.join(parts), broadcast=(cmd == '/jokes'), message_id=edit_message_id
+        )
+        return
+
+    entry = admin_commands.get(cmd)
+    if entry is None:
+        await ctx.reply("❓ Commande inconnue. /start pour la liste.")
+        return
+
+    func, heavy = entry
+    if heavy:
+        start_admin_task(cmd, func, ctx)
+    else:
+        await run_admin_command(cmd, func, ctx)
+
+
+@admin_command('/cancel')
+async def cmd_cancel(ctx):
+    result = cancel_admin_tasks(ctx.args[1:])
+    if result is None:
+        result = (
+            f"ℹ️ Aucune commande {ctx.args[1]} en cours." if len(ctx.args) > 1
+            else "ℹ️ Aucune commande longue en cours."
+        )
+    await ctx.reply(result)
+
+
+@admin_command('/start')
+async def cmd_start(ctx):
+    await ctx.reply(
+        "🤖 **Bot Prédiction v10.0**\n\n"
+        "**Base de prédiction:**\n"
+        "/pre [add|merge|del] — Remplacer, compléter ou corriger la base\n"
+        "/confirm — Appliquer la modification simulée par /pre\n"
+        "/pre cancel — Abandonner la modification simulée\n"
+        "/showdb [page|#num] — Afficher la base (par pages)\n"
+        "/cleardb — Vider la base\n\n"
+        "**Contrôle:**\n"
+        "/stop [min] — Arrêt temporaire + blagues (0 = indéfini)\n"
+        "/resume — Reprendre les prédictions\n"
+        "/status — État du système\n"
+        "/bilan [50|1h|…] — Statistiques (totales ou glissantes)\n"
+        "/history [n] — Dernières prédictions\n"
+        "/reset — Réinitialiser\n"
+        "/forceunlock [num] — Débloquer une ou toutes les prédictions\n"
+        "/profile [sec] — Profiler le bot (rapport CPU)\n"
+        "/cancel [id|all] — Commandes longues en cours / les annuler\n\n"
+        "**Paires de canaux:**\n"
+        "/tenants — Lister les paires\n"
+        "/use <nom> — Choisir la paire visée par les commandes\n\n"
+        "**Blagues:**\n"
+        "/jokes — Gérer les blagues"
+    )
+
+
+PRE_MODES = ('replace', 'add', 'merge', 'del')
+
+
+def parse_pre_args(parts):
+    """(mode, numéros donnés sur la ligne pour /pre del, sinon None); mode None si invalide."""
+    mode = parts[1].lower() if len(parts) >= 2 else 'replace'
+    if mode not in PRE_MODES:
+        return None, None
+    if mode == 'del' and len(parts) >= 3:
+        return mode, parse_number_list(' '.join(parts[2:]))
+    return mode, None
+
+
+@admin_command('/pre')
+async def cmd_pre(ctx):
+    tenant = ctx.tenant
+
+    if len(ctx.args) >= 2 and ctx.args[1].lower() == 'cancel':
+        # Abandonne la simulation sans toucher aux vérifications (/reset les annule)
+        discarded = tenant.state['pending_change'] is not None
+        tenant.state['pending_change'] = None
+        tenant.state['waiting_for_predictions'] = False
+        await ctx.reply(
+            f"{tenant.label()}🗑️ Modification simulée abandonnée." if discarded
+            else "ℹ️ Aucune modification en attente."
+        )
+        return
+
+    mode, inline = parse_pre_args(ctx.args)
+    if mode is None:
+        await ctx.reply("❌ Usage: /pre [add|merge|del|cancel]")
+        return
+
+    for t in tenants.values():
+        t.state['waiting_for_predictions'] = False
+    if inline is not None:
+        await apply_prediction_upload(tenant, inline, [], ctx.reply, mode)
+        return
+    tenant.state['waiting_for_predictions'] = mode
+
+    if mode == 'del':
+        await ctx.reply(
+            f"{tenant.label()}➖ **Retirer des numéros de la base**\n\n"
+            "Envoyez les numéros (ex: `6 12 18`, un par ligne accepté) "
+            "ou directement `/pre del 6 12 18`.\n\n"
+            "Un résumé est affiché avant application (/confirm)."
+        )
+        return
+
+    notes = {
+        'replace': "⚠️ L'ancienne base sera entièrement remplacée.",
+        'add': "➕ Seuls les numéros absents seront ajoutés (les autres ne changent pas).\n"
+               "Un résumé est affiché avant application (/confirm).",
+        'merge': "🔀 Numéros ajoutés, costumes différents remplacés.\n"
+                 "Un résumé est affiché avant application (/confirm).",
+    }
+    await ctx.reply(
+        f"{tenant.label()}📋 **Charger la base de prédiction**\n\n"
+        "Envoyez le texte ou un fichier .txt avec le format :\n"
+        "`6 [❤️]`\n"
+        "`12 [♣️]`\n"
+        "`18 [❤️]`\n"
+        "...\n\n"
+        + notes[mode]
+    )
+
+
+@admin_command('/confirm')
+async def cmd_confirm(ctx):
+    tenant = ctx.tenant
+    change = tenant.state['pending_change']
+    tenant.state['pending_change'] = None
+
+    if change is None:
+        await ctx.reply("ℹ️ Aucune modification en attente (/pre add|merge|del).")
+        return
+    if not change['ops']:
+        await ctx.reply("ℹ️ Rien à appliquer: la base contient déjà ces données.")
+        return
 
+    stale = "⚠️ La base a changé depuis la simulation: renvoyez les données avec /pre."
+    if change['version'] != tenant.db_version:
+        await ctx.reply(stale)
+        return
+    loop = asyncio.get_running_loop()
+    new_db = await loop.run_in_executor(None, build_db_version, tenant.db, change['ops'])
+    if change['version'] != tenant.db_version:
+        await ctx.reply(stale)
+        return
+
+    install_db_version(tenant, new_db)
+    await record_db_changes(tenant, change['ops'])
+
+    summary = change['summary']
+    await ctx.reply(
+        f"{tenant.label()}✅ **Base mise à jour** ({PRE_MODE_LABELS[change['mode']]})\n\n"
+        f"➕ {summary['added']} | ✏️ {summary['changed']} | ➖ {summary['removed']}\n"
+        f"📋 Total: {len(new_db)} numéros"
+    )
+    tenant.log.info(
+        f"✅ Base modifiée ({change['mode']}): +{summary['added']} ~{summary['changed']} "
+        f"-{summary['removed']} → {len(new_db)} numéros"
+    )
+
+
+@admin_command('/showdb', heavy=True)
+async def cmd_showdb(ctx):
+    tenant = ctx.tenant
+    pages = tenant.pages
+
+    if not tenant.db:
+        await ctx.reply(
+            "📭 Base vide. Utilisez /pre pour charger des données."
+        )
+        return
+
+    page = 0
+    if len(ctx.args) >= 2:
+        arg = ctx.args[1]
+        try:
+            page = pages.page_of(int(arg[1:])) if arg.startswith('#') else int(arg) - 1
+        except ValueError:
+            await ctx.reply("❌ Usage: /showdb [page] ou /showdb #<numéro>")
+            return
+    page = max(0, min(page, pages.count() - 1))
+
+    await ctx.reply(
+        tenant.label() + pages.render(page),
+        buttons=showdb_buttons(tenant, page, pages.count())
+    )
+
+
+def showdb_buttons(tenant, page, count):
+    if count <= 1:
+        return None
+
+    def button(label, target):
+        return Button.inline(label, f"showdb:{tenant.name}:{target}".encode())
+
+    row = []
+    if page > 0:
+        row.append(button("⏮️", 0))
+        row.append(button("◀️", page - 1))
+    if page < count - 1:
+        row.append(button("▶️", page + 1))
+        row.append(button("⏭️", count - 1))
+    return [row]
+
+
+async def handle_showdb_callback(event):
+    """Boutons de /showdb: la page demandée remplace le message affiché."""
+    await event.answer()
+    if event.sender_id != ADMIN_ID:
+        return
     try:
-        # ---- AIDE ----
-        if cmd == '/start':
-            await event.respond(
-                "🤖 **Bot Prédiction v10.0**\n\n"
-                "**Base de prédiction:**\n"
-                "/pre — Charger/remplacer la base\n"
-                "/showdb — Afficher la base\n"
-                "/cleardb — Vider la base\n\n"
-                "**Contrôle:**\n"
-                "/stop [min] — Arrêt temporaire + blagues (0 = indéfini)\n"
-                "/resume — Reprendre les prédictions\n"
-                "/status — État du système\n"
-                "/bilan — Statistiques\n"
-                "/reset — Réinitialiser\n"
-                "/forceunlock — Débloquer prédiction bloquée\n\n"
-                "**Blagues:**\n"
-                "/jokes — Gérer les blagues"
-            )
+        _, name, page = event.data.decode().split(':')
+        page = int(page)
+    except ValueError:
+        return
+    tenant = tenants.get(name)
+    if tenant is None:
+        return
 
-        # ---- BASE DE PRÉDICTION ----
-        elif cmd == '/pre':
-            bot_state['waiting_for_predictions'] = True
-            await event.respond(
-                "📋 **Charger la base de prédiction**\n\n"
-                "Envoyez le texte ou un fichier .txt avec le format :\n"
-                "`6 [❤️]`\n"
-                "`12 [♣️]`\n"
-                "`18 [❤️]`\n"
-                "...\n\n"
-                "⚠️ L'ancienne base sera entièrement remplacée."
-            )
+    args = ['/showdb', str(page + 1)]
+    if shards is not None:
+        shards.forward_admin(name, ' '.join(args), message_id=event.message_id)
+        return
+    ctx = CommandContext(event, args, tenant, edit_message_id=event.message_id)
+    await run_admin_command('/showdb', cmd_showdb, ctx)
 
-        elif cmd == '/showdb':
-            if not prediction_db:
-                await event.respond(
-                    "📭 Base vide. Utilisez /pre pour charger des données."
-                )
-                return
 
-            sorted_nums = sorted(prediction_db.keys())
-            lines = [f"{n} [{prediction_db[n]}]" for n in sorted_nums]
-
-            chunks = [f"📊 **Base ({len(prediction_db)} numéros)**\n\n"]
-            for line in lines:
-                if len(chunks[-1]) + len(line) + 1 > 3800:
-                    chunks.append("")
-                chunks[-1] += line + "\n"
-
-            for c in chunks:
-                if c.strip():
-                    await event.respond(c)
-
-        elif cmd == '/cleardb':
-            count = len(prediction_db)
-            prediction_db.clear()
-            save_prediction_db()
-            await event.respond(f"🗑️ Base vidée ({count} numéros supprimés).")
-
-        # ---- CONTRÔLE ----
-        elif cmd == '/stop':
-            minutes = 0
-            if len(parts) >= 2:
-                try:
-                    minutes = int(parts[1])
-                    if minutes < 0:
-                        minutes = 0
-                except ValueError:
-                    await event.respond("❌ Usage: /stop [minutes] (ex: /stop 30 ou /stop 0)")
-                    return
-
-            success = await start_temporary_stop(minutes)
-            if success:
-                duree = f"{minutes} min" if minutes > 0 else "indéfinie"
-                await event.respond(f"✅ Arrêt démarré — durée: {duree}")
-
-        elif cmd == '/resume':
-            if not bot_state['is_stopped']:
-                await event.respond("ℹ️ Le bot n'est pas en arrêt.")
-                return
-            await stop_temporary_stop()
-            await event.respond("▶️ Prédictions reprises!")
+@admin_command('/cleardb')
+async def cmd_cleardb(ctx):
+    tenant = ctx.tenant
 
-        elif cmd == '/status':
-            current_pred = verification_state['predicted_number']
-            last_src = bot_state['last_source_number']
+    count = len(tenant.db)
+    install_db_version(tenant, new_db_version(tenant.db))
+    await record_db_changes(tenant, [('clear',)])
+    await ctx.reply(f"{tenant.label()}🗑️ Base vidée ({count} numéros supprimés).")
 
-            lock = '🔴 OCCUPÉ' if current_pred else '🟢 LIBRE'
-            stopped = '🔴 OUI' if bot_state['is_stopped'] else '🟢 NON'
 
-            msg = (
-                f"📊 **ÉTAT DU SYSTÈME**\n\n"
-                f"🔒 **Verrou:** {lock}\n"
-            )
-            if current_pred:
-                msg += (
-                    f"   └ Prédiction #{current_pred} en cours\n"
-                    f"   └ Check: {verification_state['current_check']}/3\n"
-                    f"   └ Déclencheur: #{verification_state['base_game']}\n"
-                    f"   └ Costume: {verification_state['predicted_suit']}\n"
-                    f"   └ Attend: #{current_pred + verification_state['current_check']}\n"
-                )
+@admin_command('/stop')
+async def cmd_stop(ctx):
+    tenant = ctx.tenant
+    parts = ctx.args
 
-            if bot_state['is_stopped'] and bot_state['stop_end']:
-                remaining = bot_state['stop_end'] - datetime.now()
-                mins = max(0, int(remaining.total_seconds() // 60))
-                stopped += f" (encore {mins} min)"
+    minutes = 0
+    if len(parts) >= 2:
+        try:
+            minutes = int(parts[1])
+            if minutes < 0:
+                minutes = 0
+        except ValueError:
+            await ctx.reply("❌ Usage: /stop [minutes] (ex: /stop 30 ou /stop 0)")
+            return
 
-            msg += (
-                f"🛑 **Arrêt temp.:** {stopped}\n"
-                f"📩 **Dernier source:** #{last_src}\n"
-                f"📋 **Base DB:** {len(prediction_db)} numéros\n"
-                f"📏 **Distance déclenchement:** source + {TRIGGER_DISTANCE}\n"
-            )
+    success = await start_temporary_stop(tenant, minutes)
+    if success:
+        duree = f"{minutes} min" if minutes > 0 else "indéfinie"
+        await ctx.reply(f"✅ Arrêt démarré — durée: {duree}")
 
-            if prediction_db and last_src > 0:
-                upcoming = sorted([n for n in prediction_db if n > last_src])[:5]
-                if upcoming:
-                    lines = [
-                        f"#{n} {prediction_db[n]}  (déclenche à #{n - TRIGGER_DISTANCE})"
-                        for n in upcoming
-                    ]
-                    msg += "\n🎯 **Prochaines prédictions:**\n" + "\n".join(lines)
-                else:
-                    msg += f"\n🎯 **Prochaines:** Aucune dans la DB après #{last_src}"
-            elif prediction_db:
-                upcoming = sorted(prediction_db.keys())[:5]
-                lines = [
-                    f"#{n} {prediction_db[n]}  (déclenche à #{n - TRIGGER_DISTANCE})"
-                    for n in upcoming
-                ]
-                msg += "\n🎯 **Prochaines prédictions (début DB):**\n" + "\n".join(lines)
-            else:
-                msg += "\n🎯 **Prochaines:** Base vide — utilisez /pre"
 
-            await event.respond(msg)
+@admin_command('/resume')
+async def cmd_resume(ctx):
+    tenant = ctx.tenant
 
-        elif cmd == '/bilan':
-            if stats_bilan['total'] == 0:
-                await event.respond("📊 Aucune prédiction effectuée")
-                return
+    if not tenant.state['is_stopped']:
+        await ctx.reply("ℹ️ Le bot n'est pas en arrêt.")
+        return
+    await stop_temporary_stop(tenant)
+    await ctx.reply(f"{tenant.label()}▶️ Prédictions reprises!")
 
-            win_rate = (stats_bilan['wins'] / stats_bilan['total']) * 100
-            wd = stats_bilan['win_details']
-            await event.respond(
-                f"📊 **BILAN**\n\n"
-                f"🎯 Total: {stats_bilan['total']}\n"
-                f"✅ Victoires: {stats_bilan['wins']} ({win_rate:.1f}%)\n"
-                f"❌ Défaites: {stats_bilan['losses']}\n\n"
-                f"**Détails victoires:**\n"
-                f"• ✅0️⃣ (N)   : {wd.get('✅0️⃣', 0)}\n"
-                f"• ✅1️⃣ (N+1) : {wd.get('✅1️⃣', 0)}\n"
-                f"• ✅2️⃣ (N+2) : {wd.get('✅2️⃣', 0)}\n"
-                f"• ✅3️⃣ (N+3) : {wd.get('✅3️⃣', 0)}"
-            )
 
-        elif cmd == '/reset':
-            old_pred = verification_state['predicted_number']
-            bot_state['waiting_for_predictions'] = False
-            reset_verification_state()
-
-            msg = "🔄 RESET! Système libéré."
-            if old_pred:
-                msg += f" (prédiction #{old_pred} annulée)"
-            await event.respond(msg)
-
-        elif cmd == '/forceunlock':
-            old_pred = verification_state['predicted_number']
-            reset_verification_state()
-            await event.respond(
-                f"🔓 Débloqué! #{old_pred} annulée. Système libre."
-                if old_pred else "ℹ️ Aucune prédiction en cours."
-            )
+@admin_command('/status')
+async def cmd_status(ctx):
+    tenant = ctx.tenant
+    bot_state = tenant.state
+    verification = tenant.verification
+    prediction_db = tenant.db
+    prediction_index = tenant.index
 
-        # ---- BLAGUES ----
-        elif cmd == '/jokes':
-            if len(parts) < 2:
-                preview = "\n".join([f"{i+1}. {j[:60]}..." for i, j in enumerate(JOKES_LIST[:5])])
-                if len(JOKES_LIST) > 5:
-                    preview += f"\n... et {len(JOKES_LIST)-5} autres"
-                await event.respond(
-                    f"😄 **Blagues** ({len(JOKES_LIST)} enregistrées)\n\n"
-                    f"Sous-commandes:\n"
-                    f"`/jokes list` — Voir toutes\n"
-                    f"`/jokes add <texte>` — Ajouter\n"
-                    f"`/jokes del <numéro>` — Supprimer\n"
-                    f"`/jokes edit <num> <texte>` — Modifier\n"
-                    f"`/jokes reset` — Réinitialiser par défaut\n\n"
-                    f"**Aperçu:**\n{preview}"
-                )
-                return
+    last_src = bot_state['last_source_number']
 
-            subcmd = parts[1].lower()
+    lock = (
+        f"🔴 {len(verification)}/{verification.max_slots} OCCUPÉ(S)"
+        if len(verification) else f"🟢 LIBRE (0/{verification.max_slots})"
+    )
+    stopped = '🔴 OUI' if bot_state['is_stopped'] else '🟢 NON'
 
-            if subcmd == 'list':
-                if not JOKES_LIST:
-                    await event.respond("📭 Aucune blague")
-                    return
-                chunk = ""
-                for i, joke in enumerate(JOKES_LIST, 1):
-                    line = f"**{i}.** {joke}\n\n"
-                    if len(chunk) + len(line) > 3800:
-                        await event.respond(chunk)
-                        chunk = ""
-                    chunk += line
-                if chunk:
-                    await event.respond(chunk)
-
-            elif subcmd == 'add':
-                if len(parts) < 3:
-                    await event.respond("📋 Usage: `/jokes add <texte>`")
-                    return
-                new_joke = ' '.join(parts[2:])
-                JOKES_LIST.append(new_joke)
-                await event.respond(
-                    f"✅ Blague ajoutée! (Total: {len(JOKES_LIST)})\n\n{new_joke}"
-                )
+    msg = (
+        f"📊 **ÉTAT DU SYSTÈME** {tenant.label()}\n\n"
+        f"🔒 **Verrou:** {lock}\n"
+    )
+    for current_pred in verification.numbers():
+        slot = verification.slots[current_pred]
+        msg += (
+            f"   └ Prédiction #{current_pred} en cours\n"
+            f"      └ Check: {slot['current_check']}/3\n"
+            f"      └ Déclencheur: #{slot['base_game']}\n"
+            f"      └ Costume: {slot['predicted_suit']}\n"
+            f"      └ Attend: #{current_pred + slot['current_check']}\n"
+        )
 
-            elif subcmd == 'del':
-                if len(parts) < 3:
-                    await event.respond("📋 Usage: `/jokes del <numéro>`")
-                    return
-                try:
-                    idx = int(parts[2]) - 1
-                    if idx < 0 or idx >= len(JOKES_LIST):
-                        await event.respond(f"❌ Numéro invalide (1-{len(JOKES_LIST)})")
-                        return
-                    deleted = JOKES_LIST.pop(idx)
-                    await event.respond(f"🗑️ Blague #{idx+1} supprimée!\n\n{deleted[:100]}")
-                except ValueError:
-                    await event.respond("❌ Entrez un numéro valide")
-
-            elif subcmd == 'edit':
-                if len(parts) < 4:
-                    await event.respond("📋 Usage: `/jokes edit <numéro> <texte>`")
-                    return
-                try:
-                    idx = int(parts[2]) - 1
-                    if idx < 0 or idx >= len(JOKES_LIST):
-                        await event.respond(f"❌ Numéro invalide (1-{len(JOKES_LIST)})")
-                        return
-                    old = JOKES_LIST[idx]
-                    JOKES_LIST[idx] = ' '.join(parts[3:])
-                    await event.respond(
-                        f"✏️ Blague #{idx+1} modifiée!\n\n"
-                        f"**Avant:** {old[:80]}\n\n"
-                        f"**Après:** {JOKES_LIST[idx]}"
-                    )
-                except ValueError:
-                    await event.respond("❌ Entrez un numéro valide")
-
-            elif subcmd == 'reset':
-                JOKES_LIST.clear()
-                JOKES_LIST.extend(DEFAULT_JOKES)
-                await event.respond(f"🔄 Blagues réinitialisées ({len(JOKES_LIST)} par défaut)")
+    if bot_state['is_stopped'] and bot_state['stop_end']:
+        remaining = bot_state['stop_end'] - now()
+        mins = max(0, int(remaining.total_seconds() // 60))
+        stopped += f" (encore {mins} min)"
+
+    msg += (
+        f"🛑 **Arrêt temp.:** {stopped}\n"
+        f"📩 **Dernier source:** #{last_src}\n"
+        f"📥 **Flux source:** {tenant.ingest.summary()}\n"
+        f"📋 **Base DB:** {len(prediction_db)} numéros\n"
+        f"📏 **Distance déclenchement:** source + {tenant.trigger_distance}\n"
+    )
+
+    if BILAN_LAST_HOURS:
+        name = f"{BILAN_LAST_HOURS[0]}h"
+        totals = tenant.rolling.window(name, now().timestamp())
+        rate = f" ({totals.wins * 100 / totals.total:.0f}%)" if totals.total else ""
+        msg += f"📈 **Bilan {name}:** {totals.wins}/{totals.total}{rate}\n"
+
+    if prediction_db and last_src > 0:
+        upcoming = prediction_index.next_after(last_src, 5)
+        if upcoming:
+            lines = [
+                f"#{n} {prediction_db[n]}  (déclenche à #{n - tenant.trigger_distance})"
+                for n in upcoming
+            ]
+            msg += "\n🎯 **Prochaines prédictions:**\n" + "\n".join(lines)
+        else:
+            msg += f"\n🎯 **Prochaines:** Aucune dans la DB après #{last_src}"
+    elif prediction_db:
+        upcoming = prediction_index.first(5)
+        lines = [
+            f"#{n} {prediction_db[n]}  (déclenche à #{n - tenant.trigger_distance})"
+            for n in upcoming
+        ]
+        msg += "\n🎯 **Prochaines prédictions (début DB):**\n" + "\n".join(lines)
+    else:
+        msg += "\n🎯 **Prochaines:** Base vide — utilisez /pre"
+
+    await ctx.reply(msg)
+
+
+@admin_command('/bilan')
+async def cmd_bilan(ctx):
+    tenant = ctx.tenant
+    parts = ctx.args
+    windows = ' | '.join(tenant.rolling.windows)
+
+    if len(parts) >= 2:
+        totals = tenant.rolling.window(parts[1].lower(), now().timestamp())
+        if totals is None:
+            await ctx.reply(f"❌ Usage: /bilan [fenêtre] — fenêtres: {windows}")
+            return
+        await ctx.reply(tenant.label() + format_window(parts[1].lower(), totals))
+        return
+
+    if tenant.stats['total'] == 0:
+        await ctx.reply(f"{tenant.label()}📊 Aucune prédiction effectuée")
+        return
+
+    await ctx.reply(
+        tenant.label() + format_bilan(tenant.stats) + "\n\n"
+        + format_streaks(tenant.rolling) + f"\n\n🔎 Fenêtres: /bilan {windows}"
+    )
+
+
+HISTORY_LINES_PER_MESSAGE = 60
 
-            else:
-                await event.respond("❓ Sous-commande inconnue. Tapez /jokes pour la liste")
 
+@admin_command('/history')
+async def cmd_history(ctx):
+    tenant = ctx.tenant
+    parts = ctx.args
+
+    count = 10
+    if len(parts) >= 2:
+        try:
+            count = max(1, int(parts[1]))
+        except ValueError:
+            await ctx.reply("❌ Usage: /history [nombre]")
+            return
+
+    records = tenant.history.newest(count)
+    if not records:
+        await ctx.reply(f"{tenant.label()}📜 Aucune prédiction dans l'historique")
+        return
+
+    lines = [f"📜 **Historique** {tenant.label()}({len(records)} dernière(s))\n"]
+    for record in records:
+        sent = datetime.fromtimestamp(record.sent_at).strftime('%d/%m %H:%M:%S')
+        if record.outcome == WIN:
+            result = WIN_LABELS[record.check]
+        elif record.outcome == LOSS:
+            result = '❌'
+        elif record.outcome == EXPIRED:
+            result = '⏹️'
         else:
-            await event.respond("❓ Commande inconnue. /start pour la liste.")
+            result = '⏳'
+        lines.append(f"{result} #{record.number} {record.suit_text} ← #{record.trigger} · {sent}")
+    # Plusieurs messages au-delà de HISTORY_LINES_PER_MESSAGE (limite Telegram)
+    for start in range(0, len(lines), HISTORY_LINES_PER_MESSAGE):
+        await ctx.reply("\n".join(lines[start:start + HISTORY_LINES_PER_MESSAGE]))
 
-    except Exception as e:
-        logger.error(f"Erreur commande: {e}")
-        await event.respond(f"❌ Erreur: {str(e)}")
+
+@admin_command('/reset')
+async def cmd_reset(ctx):
+    verification = ctx.tenant.verification
+
+    old_preds = verification.numbers()
+    ctx.tenant.state['waiting_for_predictions'] = False
+    ctx.tenant.state['pending_change'] = None
+    ctx.tenant.state['last_prediction_number'] = None
+    verification.clear()
+
+    msg = "🔄 RESET! Système libéré."
+    if old_preds:
+        msg += f" (prédiction(s) {', '.join(f'#{n}' for n in old_preds)} annulée(s))"
+    await ctx.reply(msg)
+
+
+@admin_command('/forceunlock')
+async def cmd_forceunlock(ctx):
+    parts = ctx.args
+    verification = ctx.tenant.verification
+
+    if len(parts) >= 2:
+        try:
+            target = int(parts[1].lstrip('#'))
+        except ValueError:
+            await ctx.reply("❌ Usage: /forceunlock [numéro]")
+            return
+        if verification.close(target) is None:
+            await ctx.reply(f"ℹ️ Aucune prédiction #{target} en cours.")
+            return
+        await ctx.reply(f"🔓 Débloqué! #{target} annulée.")
+        return
+
+    old_preds = verification.numbers()
+    verification.clear()
+    await ctx.reply(
+        f"🔓 Débloqué! {', '.join(f'#{n}' for n in old_preds)} annulée(s). Système libre."
+        if old_preds else "ℹ️ Aucune prédiction en cours."
+    )
+
+
+@admin_command('/tenants')
+async def cmd_tenants(ctx):
+    lines = []
+    for t in tenants.values():
+        marker = '👉' if t is ctx.tenant else '•'
+        state = '🛑' if t.state['is_stopped'] else '🟢'
+        lines.append(
+            f"{marker} **{t.name}** {state} {t.source_channel_id} → {t.prediction_channel_id}\n"
+            f"   DB: {t.db_size()} | Source: #{t.state['last_source_number']} | "
+            f"Slots: {len(t.verification)}/{t.verification.max_slots} | "
+            f"Distance: {t.trigger_distance} | Expiration: {t.timeout}"
+        )
+    await ctx.reply(f"🗂️ **Paires de canaux ({len(tenants)})**\n\n" + "\n".join(lines))
+
+
+@admin_command('/use')
+async def cmd_use(ctx):
+    parts = ctx.args
+
+    if len(parts) < 2 or parts[1] not in tenants:
+        names = ', '.join(tenants)
+        await ctx.reply(f"❌ Usage: /use <nom> (disponibles: {names})")
+        return
+    admin_context['tenant'] = parts[1]
+    await ctx.reply(f"👉 Commandes dirigées vers **{parts[1]}**")
+
+
+@admin_command('/profile', heavy=True)
+async def cmd_profile(ctx):
+    parts = ctx.args
+
+    if active_profiler is not None:
+        await ctx.reply("⚠️ Un profilage est déjà en cours.")
+        return
+    seconds = 30
+    if len(parts) >= 2:
+        try:
+            seconds = int(parts[1])
+        except ValueError:
+            await ctx.reply("❌ Usage: /profile [secondes] (ex: /profile 60)")
+            return
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    await ctx.reply(
+        f"🔬 Profilage démarré pour {seconds}s — rapport envoyé à la fin "
+        f"(/cancel {ctx.task_id} pour annuler)."
+    )
+    await run_profile(seconds)
+
+
+@admin_command('/jokes', heavy=True)
+async def cmd_jokes(ctx):
+    parts = ctx.args
+
+    if len(parts) < 2:
+        preview = "\n".join([f"{i+1}. {j[:60]}..." for i, j in enumerate(JOKES_LIST[:5])])
+        if len(JOKES_LIST) > 5:
+            preview += f"\n... et {len(JOKES_LIST)-5} autres"
+        await ctx.reply(
+            f"😄 **Blagues** ({len(JOKES_LIST)} enregistrées)\n\n"
+            f"Sous-commandes:\n"
+            f"`/jokes list` — Voir toutes\n"
+            f"`/jokes add <texte>` — Ajouter\n"
+            f"`/jokes del <numéro>` — Supprimer\n"
+            f"`/jokes edit <num> <texte>` — Modifier\n"
+            f"`/jokes reset` — Réinitialiser par défaut\n\n"
+            f"**Aperçu:**\n{preview}"
+        )
+        return
+
+    subcmd = parts[1].lower()
+
+    if subcmd == 'list':
+        if not JOKES_LIST:
+            await ctx.reply("📭 Aucune blague")
+            return
+        chunk = ""
+        for i, joke in enumerate(JOKES_LIST, 1):
+            line = f"**{i}.** {joke}\n\n"
+            if len(chunk) + len(line) > 3800:
+                await ctx.reply(chunk)
+                chunk = ""
+            chunk += line
+        if chunk:
+            await ctx.reply(chunk)
+
+    elif subcmd == 'add':
+        if len(parts) < 3:
+            await ctx.reply("📋 Usage: `/jokes add <texte>`")
+            return
+        new_joke = ' '.join(parts[2:])
+        JOKES_LIST.append(new_joke)
+        await ctx.reply(
+            f"✅ Blague ajoutée! (Total: {len(JOKES_LIST)})\n\n{new_joke}"
+        )
+
+    elif subcmd == 'del':
+        if len(parts) < 3:
+            await ctx.reply("📋 Usage: `/jokes del <numéro>`")
+            return
+        try:
+            idx = int(parts[2]) - 1
+            if idx < 0 or idx >= len(JOKES_LIST):
+                await ctx.reply(f"❌ Numéro invalide (1-{len(JOKES_LIST)})")
+                return
+            deleted = JOKES_LIST.pop(idx)
+            await ctx.reply(f"🗑️ Blague #{idx+1} supprimée!\n\n{deleted[:100]}")
+        except ValueError:
+            await ctx.reply("❌ Entrez un numéro valide")
+
+    elif subcmd == 'edit':
+        if len(parts) < 4:
+            await ctx.reply("📋 Usage: `/jokes edit <numéro> <texte>`")
+            return
+        try:
+            idx = int(parts[2]) - 1
+            if idx < 0 or idx >= len(JOKES_LIST):
+                await ctx.reply(f"❌ Numéro invalide (1-{len(JOKES_LIST)})")
+                return
+            old = JOKES_LIST[idx]
+            JOKES_LIST[idx] = ' '.join(parts[3:])
+            await ctx.reply(
+                f"✏️ Blague #{idx+1} modifiée!\n\n"
+                f"**Avant:** {old[:80]}\n\n"
+                f"**Après:** {JOKES_LIST[idx]}"
+            )
+        except ValueError:
+            await ctx.reply("❌ Entrez un numéro valide")
+
+    elif subcmd == 'reset':
+        JOKES_LIST.clear()
+        JOKES_LIST.extend(DEFAULT_JOKES)
+        await ctx.reply(f"🔄 Blagues réinitialisées ({len(JOKES_LIST)} par défaut)")
+
+    else:
+        await ctx.reply("❓ Sous-commande inconnue. Tapez /jokes pour la liste")
 
 
 # ============================================================
 # RÉCEPTION DES DONNÉES DE PRÉDICTION DE L'ADMIN
 # ============================================================
 
-async def handle_prediction_data_message(event):
-    global prediction_db
+async def ingest_prediction_file(event, mode='replace'):
+    """
+    Téléchargement par blocs + décodage UTF-8 incrémental. Le parsing tourne
+    dans un thread au fil de l'eau, ou dans un processus séparé pour les
+    très gros fichiers, sans jamais bloquer le traitement du canal source.
+    """
+    loop = asyncio.get_running_loop()
+    size = event.message.file.size or 0
+    received = 0
+    last_report = loop.time()
+
+    progress = await outbound.send(
+        ADMIN_ID, f"📥 Réception du fichier ({size // 1024} Ko)... 0%", priority=PRIORITY_ADMIN
+    )
+
+    def report(step):
+        nonlocal last_report
+        if loop.time() - last_report < PRE_PROGRESS_INTERVAL_SECONDS:
+            return
+        last_report = loop.time()
+        percent = int(received * 100 / size) if size else 0
+        outbound.edit(ADMIN_ID, progress.id, f"📥 {step}... {percent}%", priority=PRIORITY_ADMIN)
 
+    chunks = bot_client.iter_download(event.message.media, chunk_size=PRE_CHUNK_SIZE)
+
+    if size >= PRE_PROCESS_POOL_THRESHOLD:
+        fd, path = tempfile.mkstemp(prefix='pre_', suffix='.txt')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in chunks:
+                    await loop.run_in_executor(None, f.write, chunk)
+                    received += len(chunk)
+                    report("Réception")
+            outbound.edit(ADMIN_ID, progress.id, "⚙️ Analyse du fichier (processus dédié)...",
+                          priority=PRIORITY_ADMIN)
+            # spawn: un fork du processus (threads du pool, client) n'est pas sûr
+            pool = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn')
+            )
+            try:
+                new_db, errors = await loop.run_in_executor(pool, parse_prediction_file, path, mode)
+            finally:
+                # shutdown attend le processus: hors de la boucle
+                await loop.run_in_executor(None, pool.shutdown)
+        finally:
+            os.unlink(path)
+    else:
+        parser = new_pre_parser(mode)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        async for chunk in chunks:
+            received += len(chunk)
+            await loop.run_in_executor(None, parser.feed, decoder.decode(chunk))
+            report("Réception et analyse")
+        parser.feed(decoder.decode(b'', final=True))
+        new_db, errors = parser.close()
+
+    logger.info(f"📂 Fichier reçu ({received} octets) → {len(new_db)} numéros")
+    outbound.edit(
+        ADMIN_ID, progress.id,
+        f"✅ Fichier analysé: {received // 1024} Ko, {len(new_db)} numéros",
+        priority=PRIORITY_ADMIN
+    )
+    return new_db, errors
+
+
+async def handle_prediction_data_message(event):
     if event.sender_id != ADMIN_ID:
         return
-    if not bot_state['waiting_for_predictions']:
+    # Le locataire qui a reçu /pre, même si /use a changé de cible depuis
+    tenant = next((t for t in tenants.values() if t.state['waiting_for_predictions']), None)
+    if tenant is None:
         return
+    bot_state = tenant.state
+    # Réponses par la file d'envoi, comme les commandes admin
+    ctx = CommandContext(event, [], tenant)
 
-    text_content = None
+    mode = bot_state['waiting_for_predictions']
 
     if event.message.file:
+        bot_state['waiting_for_predictions'] = False
         try:
-            file_bytes = await event.message.download_media(bytes)
-            text_content = file_bytes.decode('utf-8', errors='replace')
-            logger.info(f"📂 Fichier reçu ({len(file_bytes)} octets)")
+            new_db, errors = await ingest_prediction_file(event, mode)
         except Exception as e:
-            await event.respond(f"❌ Erreur lecture fichier: {e}")
+            logger.error(f"❌ Erreur lecture fichier: {e}")
+            await ctx.reply(f"❌ Erreur lecture fichier: {e}")
             return
     elif event.message.text:
-        text_content = event.message.text
-
-    if not text_content:
-        await event.respond("❌ Aucun contenu détecté. Envoyez un texte ou un fichier .txt")
+        bot_state['waiting_for_predictions'] = False
+        if mode == 'del':
+            new_db, errors = parse_number_list(event.message.text), []
+        else:
+            new_db, errors = parse_prediction_text(event.message.text)
+    else:
+        await ctx.reply("❌ Aucun contenu détecté. Envoyez un texte ou un fichier .txt")
         return
 
-    bot_state['waiting_for_predictions'] = False
+    if shards is not None:
+        shards.post(tenant.name, ('upload', tenant.name, new_db, errors, mode))
+        return
+    await apply_prediction_upload(tenant, new_db, errors, ctx.reply, mode)
+
+
+PRE_MODE_LABELS = {'replace': "remplacement", 'add': "ajout", 'merge': "fusion", 'del': "suppression"}
+
+
+def diff_prediction_db(db, entries, mode):
+    """
+    Opérations du journal qui appliquent entries à db: 'add' ajoute les numéros
+    absents, 'merge' ajoute et remplace les costumes différents, 'del' retire.
+    Renvoie aussi le résumé et quelques lignes d'exemple.
+    """
+    ops = []
+    summary = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0, 'ignored': 0}
+    samples = []
+    for number in sorted(entries):
+        suit = entries[number]
+        current = db.get(number)
+        if mode == 'del':
+            if current is None:
+                summary['ignored'] += 1
+                continue
+            ops.append(('del', number))
+            summary['removed'] += 1
+            line = f"➖ #{number} {current}"
+        elif current is None:
+            ops.append(('set', number, suit))
+            summary['added'] += 1
+            line = f"➕ #{number} {suit}"
+        elif suit_code(current) == suit_code(suit):
+            summary['unchanged'] += 1
+            continue
+        elif mode == 'merge':
+            ops.append(('set', number, suit))
+            summary['changed'] += 1
+            line = f"✏️ #{number} {current} → {suit}"
+        else:
+            # /pre add ne touche pas aux numéros déjà présents
+            summary['ignored'] += 1
+            continue
+        if len(samples) < 8:
+            samples.append(line)
+    return ops, summary, samples
 
-    new_db, errors = parse_prediction_text(text_content)
 
+async def apply_prediction_upload(tenant, new_db, errors, respond, mode='replace'):
     if not new_db:
-        await event.respond(
-            "❌ Aucune prédiction valide trouvée.\n\n"
-            "Format attendu:\n`6 [❤️]`\n`12 [♣️]`\n..."
+        await respond(
+            ("❌ Aucun numéro trouvé." if mode == 'del' else
+             "❌ Aucune prédiction valide trouvée.\n\n"
+             "Format attendu:\n`6 [❤️]`\n`12 [♣️]`\n...")
             + (f"\n\n⚠️ Erreurs:\n" + "\n".join(errors[:10]) if errors else "")
         )
         return
 
-    prediction_db.clear()
-    prediction_db.update(new_db)
-    save_prediction_db()
+    loop = asyncio.get_running_loop()
+    if mode != 'replace':
+        version = tenant.db_version
+        ops, summary, samples = await loop.run_in_executor(
+            None, diff_prediction_db, tenant.db, new_db, mode
+        )
+        tenant.state['pending_change'] = {
+            'mode': mode, 'ops': ops, 'version': version, 'summary': summary,
+        }
+        reply = (
+            f"{tenant.label()}🧪 **Simulation ({PRE_MODE_LABELS[mode]})** — rien n'est encore appliqué\n\n"
+            f"➕ Ajoutés: {summary['added']}\n"
+            f"✏️ Modifiés: {summary['changed']}\n"
+            f"➖ Supprimés: {summary['removed']}\n"
+            f"⏸️ Inchangés: {summary['unchanged']} | Ignorés: {summary['ignored']}\n"
+        )
+        if samples:
+            reply += "\n" + "\n".join(samples) + "\n"
+        if errors:
+            reply += f"\n⚠️ {len(errors)} ligne(s) ignorée(s)\n"
+        reply += "\n✅ /confirm pour appliquer — /pre cancel pour abandonner"
+        await respond(reply)
+        return
+
+    install_db_version(tenant, await loop.run_in_executor(None, new_db_version, tenant.db, new_db))
+    tenant.state['pending_change'] = None
+    await save_prediction_db(tenant)
+    prediction_db = tenant.db
 
-    sorted_nums = sorted(prediction_db.keys())
-    sample = ", ".join([f"#{n} {prediction_db[n]}" for n in sorted_nums[:8]])
-    if len(sorted_nums) > 8:
-        sample += f" ... +{len(sorted_nums)-8} autres"
+    first_num, last_num = tenant.index.bounds()
+    sample = ", ".join([f"#{n} {prediction_db[n]}" for n in tenant.index.first(8)])
+    if len(prediction_db) > 8:
+        sample += f" ... +{len(prediction_db)-8} autres"
 
     reply = (
-        f"✅ **Base remplacée et sauvegardée!**\n\n"
+        f"{tenant.label()}✅ **Base remplacée et sauvegardée!**\n\n"
         f"📋 Numéros chargés: {len(prediction_db)}\n"
-        f"📝 Plage: #{sorted_nums[0]} → #{sorted_nums[-1]}\n"
+        f"📝 Plage: #{first_num} → #{last_num}\n"
         f"💾 Persistante (survit aux redémarrages)\n\n"
         f"**Aperçu:** {sample}"
     )
     if errors:
         reply += f"\n\n⚠️ {len(errors)} ligne(s) ignorée(s)"
 
-    await event.respond(reply)
-    logger.info(f"✅ Base remplacée: {len(prediction_db)} numéros")
+    await respond(reply)
+    tenant.log.info(f"✅ Base remplacée: {len(prediction_db)} numéros")
 
 
 # ============================================================
 # DÉMARRAGE
 # ============================================================
 
+def open_session():
+    """Session en chaîne (TELEGRAM_SESSION) si définie, sinon le fichier SESSION_FILE."""
+    session = os.getenv('TELEGRAM_SESSION', '')
+    if session:
+        return StringSession(session)
+    return SESSION_FILE
+
+
+async def prime_entities(client):
+    """
+    Résout les canaux et l'admin avant le premier message. Avec une session
+    fichier ils viennent du cache local ; sinon ils sont demandés à Telegram
+    une fois puis enregistrés dans la session.
+    """
+    peers = {ADMIN_ID}
+    for tenant in tenants.values():
+        peers.update((tenant.source_channel_id, tenant.prediction_channel_id))
+    resolved = 0
+    for peer in sorted(peers):
+        try:
+            await client.get_input_entity(peer)
+            resolved += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Entité {peer} non résolue: {e}")
+    client.session.save()
+    return resolved, len(peers)
+
+
 async def start_bot():
     global bot_client
 
-    session = os.getenv('TELEGRAM_SESSION', '')
-    bot_client = TelegramClient(StringSession(session), API_ID, API_HASH)
+    bot_client = TelegramClient(open_session(), API_ID, API_HASH)
 
     try:
+        started = time.perf_counter()
         await bot_client.start(bot_token=BOT_TOKEN)
+        record_startup_phase('telegram_connect', started)
         logger.info("✅ Bot connecté")
 
-        @bot_client.on(events.NewMessage(chats=SOURCE_CHANNEL_ID))
+        started = time.perf_counter()
+        resolved, total = await prime_entities(bot_client)
+        record_startup_phase('entities', started)
+        logger.info(f"👥 Entités résolues: {resolved}/{total}")
+        outbound.start(bot_client)
+
+        source_chats = list(tenants_by_source)
+
+        @bot_client.on(events.NewMessage(chats=source_chats))
         async def source_handler(event):
-            await process_source_message(event, is_edit=False)
+            await run_timed('source', route_source_message(event, is_edit=False))
 
-        @bot_client.on(events.MessageEdited(chats=SOURCE_CHANNEL_ID))
+        @bot_client.on(events.MessageEdited(chats=source_chats))
         async def edit_handler(event):
-            await process_source_message(event, is_edit=True)
+            await run_timed('edit', route_source_message(event, is_edit=True))
 
-        @bot_client.on(events.NewMessage(pattern=r'^/', from_users=ADMIN_ID))
-        async def admin_cmd_handler(event):
-            await handle_admin_commands(event)
+        @bot_client.on(events.CallbackQuery(data=re.compile(rb'^showdb:')))
+        async def showdb_callback_handler(event):
+            await run_timed('callback', handle_showdb_callback(event))
 
         @bot_client.on(events.NewMessage(from_users=ADMIN_ID))
-        async def admin_data_handler(event):
-            msg_text = event.message.text or ''
-            if msg_text.strip().startswith('/'):
-                return
-            await handle_prediction_data_message(event)
-
-        db_info = f"{len(prediction_db)} numéros chargés" if prediction_db else "vide (utilisez /pre)"
+        async def admin_handler(event):
+            # Un seul handler admin: commande ou données /pre, jamais les deux
+            if (event.message.text or '').lstrip().startswith('/'):
+                await run_timed('admin', handle_admin_commands(event))
+            else:
+                await run_timed('admin_data', handle_prediction_data_message(event))
+
+        pairs = []
+        for tenant in tenants.values():
+            db_info = f"{len(tenant.db)} numéros chargés" if tenant.db else "vide (utilisez /pre)"
+            pairs.append(
+                f"{tenant.label()}📋 Base de prédiction: {db_info}\n"
+                f"📏 Distance déclenchement: source + {tenant.trigger_distance}\n"
+                f"Canal source: {tenant.source_channel_id}\n"
+                f"Canal prédictions: {tenant.prediction_channel_id}\n"
+            )
 
         startup = (
             f"🤖 **BOT PRÉDICTION DÉMARRÉ (v10.0)**\n\n"
-            f"📋 Base de prédiction: {db_info}\n"
-            f"📏 Distance déclenchement: source + {TRIGGER_DISTANCE}\n"
-            f"😄 Blagues: {len(JOKES_LIST)} disponibles\n\n"
-            f"Canal source: {SOURCE_CHANNEL_ID}\n"
-            f"Canal prédictions: {PREDICTION_CHANNEL_ID}\n\n"
+            + "\n".join(pairs) +
+            f"\n😄 Blagues: {len(JOKES_LIST)} disponibles\n"
+            f"⏱️ Démarrage: {format_startup_phases()}\n\n"
             f"/start pour les commandes"
         )
-        await bot_client.send_message(ADMIN_ID, startup)
+        outbound.send(ADMIN_ID, startup)
         return bot_client
 
     except Exception as e:
@@ -1000,30 +2819,80 @@ async def start_bot():
 
 
 async def main():
+    global shards
     logger.info("🚀 Démarrage...")
 
-    load_prediction_db()
+    setup_tenants()
+    shutdown = asyncio.Event()
+    background = []
+
+    started = time.perf_counter()
+    if SHARD_WORKERS > 0:
+        # Les workers chargent bases et états ; on attend leur premier état
+        shards = ShardCoordinator(
+            outbound,
+            on_status=lambda name, status: apply_shard_status(tenants[name], status),
+            on_lost=shutdown.set,
+        )
+        await shards.start(tenant_specs(), SHARD_WORKERS)
+    else:
+        for tenant in tenants.values():
+            load_prediction_db(tenant)
+            restore_runtime_state(tenant)
+    record_startup_phase('shards' if shards is not None else 'db_load', started)
 
+    started = time.perf_counter()
     web_runner = await start_web_server()
+    record_startup_phase('web_server', started)
+
+    # Les événements live attendent la fin du rattrapage de démarrage
+    for tenant in tenants.values():
+        tenant.catch_up = []
     client = await start_bot()
 
     if not client:
+        if shards is not None:
+            await shards.stop(OUTBOUND_DRAIN_SECONDS)
         return
 
+    started = time.perf_counter()
+    for tenant in tenants.values():
+        await catch_up_source(tenant)
+    record_startup_phase('catch_up', started)
+
+    if shards is None:
+        start_schedules()
+        background.append(asyncio.create_task(compact_prediction_db_periodically()))
+        background.append(asyncio.create_task(flush_runtime_state_periodically()))
+
+    record_startup_phase('ready', PROCESS_STARTED)
     logger.info("✅ Bot opérationnel")
 
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, shutdown.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
     try:
-        while True:
-            if bot_state['is_stopped'] and bot_state['stop_end']:
-                if datetime.now() >= bot_state['stop_end']:
-                    logger.info("⏰ Fin programmée de l'arrêt temporaire")
-                    await stop_temporary_stop()
-            await asyncio.sleep(30)
+        await shutdown.wait()
+        logger.info("👋 Signal d'arrêt reçu")
     except KeyboardInterrupt:
         logger.info("👋 Arrêt")
     finally:
-        if bot_state['joke_task']:
-            bot_state['joke_task'].cancel()
+        for task in background:
+            task.cancel()
+        scheduler.stop()
+        if shards is not None:
+            await shards.stop(OUTBOUND_DRAIN_SECONDS)
+        else:
+            for tenant in tenants.values():
+                await flush_runtime_state(tenant, force=True)
+                await tenant.store.compact(tenant.db)
+                tenant.history.archive_all()
+        await outbound.drain(OUTBOUND_DRAIN_SECONDS)
+        await outbound.stop()
         await client.disconnect()
 
 
@@ -0,0 +1,313 @@
+"""
+File d'envoi centralisée vers Telegram.
+- seaux à jetons par chat (+ un seau global)
+- FloodWait respecté puis nouvelle tentative, erreurs réseau réessayées
+- voies de priorité : prédictions/résultats avant admin, admin avant blagues
+- éditions successives d'un même message fusionnées (seul le dernier texte part)
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telethon import errors
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_PREDICTION = 0
+PRIORITY_ADMIN = 1
+PRIORITY_JOKE = 2
+
+_LANES = 3
+_MAX_BACKOFF_SECONDS = 30
+# Attente maximale de la requête en cours à l'arrêt de la file
+_STOP_WAIT_SECONDS = 10
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        """Secondes avant qu'un jeton soit disponible (0 = prêt)."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class _Job:
+    __slots__ = ('kind', 'chat_id', 'message_id', 'payload', 'kwargs',
+                 'priority', 'future', 'attempts', 'not_before', 'enqueued_at')
+
+    def __init__(self, kind, chat_id, message_id, payload, kwargs, priority, future):
+        self.kind = kind
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.payload = payload
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+        self.not_before = 0.0
+        self.enqueued_at = time.monotonic()
+
+
+def _consume_exception(future):
+    # Évite "Future exception was never retrieved" pour les envois non attendus
+    if not future.cancelled():
+        future.exception()
+
+
+class OutboundDispatcher:
+    def __init__(self, rate_per_chat=1.0, burst_per_chat=3, global_rate=25.0,
+                 max_retries=5):
+        self.client = None
+        self.rate_per_chat = rate_per_chat
+        self.burst_per_chat = burst_per_chat
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.max_retries = max_retries
+        self.lanes = [deque() for _ in range(_LANES)]
+        self.buckets = {}
+        self.pending_edits = {}
+        self.stats = {
+            'sent': 0, 'edited': 0, 'files': 0, 'coalesced': 0,
+            'flood_waits': 0, 'retries': 0, 'errors': 0,
+        }
+        self._wakeup = None
+        self._task = None
+        # Travail retiré de la file et en cours d'envoi, et son achèvement
+        self.in_flight = None
+        self._idle = None
+
+    # ---- API ----
+
+    def start(self, client):
+        self.client = client
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, chat_id, text, priority=PRIORITY_ADMIN, **kwargs):
+        """Programme un envoi ; la future donne le Message envoyé."""
+        return self._enqueue(_Job('send', chat_id, None, text, kwargs, priority, self._future()))
+
+    def send_file(self, chat_id, file, priority=PRIORITY_ADMIN, **kwargs):
+        return self._enqueue(_Job('file', chat_id, None, file, kwargs, priority, self._future()))
+
+    def edit(self, chat_id, message_id, text, priority=PRIORITY_PREDICTION, **kwargs):
+        """Programme une édition ; fusionnée avec une édition en attente du même message."""
+        key = (chat_id, message_id)
+        job = self.pending_edits.get(key)
+        if job is not None:
+            job.payload = text
+            job.kwargs = kwargs
+            self.stats['coalesced'] += 1
+            return job.future
+
+        job = _Job('edit', chat_id, message_id, text, kwargs, priority, self._future())
+        self.pending_edits[key] = job
+        return self._enqueue(job)
+
+    def queued(self):
+        """Travaux en file, plus celui en cours d'envoi."""
+        return sum(len(lane) for lane in self.lanes) + (self.in_flight is not None)
+
+    async def drain(self, timeout):
+        """Attend que la file se vide (arrêt propre), au plus timeout secondes."""
+        deadline = time.monotonic() + timeout
+        while self.queued() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    async def stop(self):
+        if self._task:
+            # La requête en cours va jusqu'au bout: annulée, l'édition d'un
+            # résultat (slot déjà fermé) serait perdue
+            if self.in_flight is not None:
+                try:
+                    await asyncio.wait_for(self._idle.wait(), _STOP_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    logger.warning(f"⚠️ Envoi en cours abandonné à l'arrêt ({self.in_flight.kind})")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---- Interne ----
+
+    def _future(self):
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        return future
+
+    def _enqueue(self, job, front=False):
+        lane = self.lanes[job.priority]
+        if front:
+            lane.appendleft(job)
+        else:
+            lane.append(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job.future
+
+    def _bucket(self, chat_id):
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_chat, self.burst_per_chat)
+            self.buckets[chat_id] = bucket
+        return bucket
+
+    def _next_job(self):
+        """Premier travail prêt, par priorité puis ordre d'arrivée."""
+        now = time.monotonic()
+        global_delay = self.global_bucket.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+
+        wait = None
+        for lane in self.lanes:
+            blocked_chats = set()
+            for index, job in enumerate(lane):
+                if job.chat_id in blocked_chats:
+                    continue
+                delay = max(self._bucket(job.chat_id).delay(now), job.not_before - now)
+                if delay <= 0:
+                    del lane[index]
+                    return job, 0.0
+                # L'ordre est conservé par chat : les suivants attendent aussi
+                blocked_chats.add(job.chat_id)
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _run(self):
+        while True:
+            job, wait = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.in_flight = job
+            self._idle.clear()
+            try:
+                await self._execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Erreur file d'envoi: {e}")
+            finally:
+                self.in_flight = None
+                self._idle.set()
+
+    async def _execute(self, job):
+        if job.kind == 'edit' and self.pending_edits.get((job.chat_id, job.message_id)) is job:
+            # Une nouvelle édition créera un nouveau travail
+            del self.pending_edits[(job.chat_id, job.message_id)]
+
+        now = time.monotonic()
+        self._bucket(job.chat_id).take(now)
+        self.global_bucket.take(now)
+
+        try:
+            if job.kind == 'send':
+                result = await self.client.send_message(job.chat_id, job.payload, **job.kwargs)
+                self.stats['sent'] += 1
+            elif job.kind == 'file':
+                result = await self.client.send_file(job.chat_id, job.payload, **job.kwargs)
+                self.stats['files'] += 1
+            else:
+                result = await self.client.edit_message(
+                    job.chat_id, job.message_id, job.payload, **job.kwargs
+                )
+                self.stats['edited'] += 1
+            self._resolve(job, result)
+
+        except errors.MessageNotModifiedError:
+            self._resolve(job, None)
+
+        except errors.FloodWaitError as e:
+            self.stats['flood_waits'] += 1
+            logger.warning(f"⏳ FloodWait {e.seconds}s sur {job.chat_id}, nouvelle tentative")
+            self._bucket(job.chat_id).block(e.seconds, time.monotonic())
+            self._requeue(job)
+
+        except errors.RPCError as e:
+            if e.code in (400, 403):
+                # Requête refusée définitivement: inutile de réessayer
+                self._fail(job, e)
+            else:
+                self._retry(job, e)
+
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self._retry(job, e)
+
+    def _resolve(self, job, result):
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _fail(self, job, error):
+        self.stats['errors'] += 1
+        logger.error(f"❌ Envoi abandonné ({job.kind} → {job.chat_id}): {error}")
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    def _retry(self, job, error):
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self._fail(job, error)
+            return
+        self.stats['retries'] += 1
+        backoff = min(2 ** job.attempts, _MAX_BACKOFF_SECONDS)
+        logger.warning(
+            f"⚠️ Envoi échoué ({job.kind} → {job.chat_id}): {error} — "
+            f"tentative {job.attempts}/{self.max_retries} dans {backoff}s"
+        )
+        job.not_before = time.monotonic() + backoff
+        self._requeue(job)
+
+    def _requeue(self, job):
+        if job.kind == 'edit':
+            key = (job.chat_id, job.message_id)
+            newer = self.pending_edits.get(key)
+            if newer is not None:
+                # Une édition plus récente est déjà en file: elle remplace celle-ci
+                newer.future.add_done_callback(lambda f, old=job.future: _chain(f, old))
+                return
+            self.pending_edits[key] = job
+        self._enqueue(job, front=True)
+
+
+def _chain(source, target):
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
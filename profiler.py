@@ -0,0 +1,103 @@
+"""
+Profileur par échantillonnage du thread de la boucle asyncio.
+Un thread séparé relève la pile du thread cible à intervalle fixe : aucun
+coût quand il ne tourne pas, coût faible et borné quand il tourne.
+"""
+import sys
+import time
+import threading
+
+# Fonctions où la boucle attend des événements (temps d'inactivité)
+_IDLE_FUNCTIONS = {'select', 'poll', 'epoll', 'kqueue'}
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id, interval=0.005, max_depth=128):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.idle_samples = 0
+        self.self_counts = {}
+        self.cumulative_counts = {}
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._switch_interval = None
+
+    def start(self):
+        # Sans cela, le thread d'échantillonnage n'obtient le GIL que lorsque
+        # la boucle le relâche (dans select) et ne verrait jamais le code actif.
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 10))
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            sys.setswitchinterval(self._switch_interval)
+        self.duration = time.monotonic() - self.started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        self.samples += 1
+
+        code = frame.f_code
+        if code.co_name in _IDLE_FUNCTIONS:
+            self.idle_samples += 1
+            return
+
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        self.self_counts[key] = self.self_counts.get(key, 0) + 1
+
+        seen = set()
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            code = frame.f_code
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            if key not in seen:
+                seen.add(key)
+                self.cumulative_counts[key] = self.cumulative_counts.get(key, 0) + 1
+            frame = frame.f_back
+            depth += 1
+
+    def report(self, top=30):
+        busy = self.samples - self.idle_samples
+        lines = [
+            f"Profil du thread de la boucle: {self.duration:.1f}s, "
+            f"{self.samples} échantillons ({self.interval * 1000:.0f} ms)",
+            f"Occupé: {busy} ({_percent(busy, self.samples)}) — "
+            f"en attente: {self.idle_samples} ({_percent(self.idle_samples, self.samples)})",
+            "",
+            f"{'cumul':>7} {'%':>6} {'propre':>7} {'%':>6}  fonction",
+        ]
+        ranked = sorted(self.cumulative_counts.items(), key=lambda item: item[1], reverse=True)
+        for key, cumulative in ranked[:top]:
+            own = self.self_counts.get(key, 0)
+            lines.append(
+                f"{cumulative:>7} {_percent(cumulative, busy):>6} {own:>7} {_percent(own, busy):>6}  "
+                f"{_describe(key)}"
+            )
+        return "\n".join(lines)
+
+
+def _percent(part, total):
+    return f"{part * 100 / total:.1f}%" if total else "0.0%"
+
+
+def _describe(key):
+    filename, lineno, name = key
+    parts = filename.replace('\\', '/').split('/')
+    short = '/'.join(parts[-2:]) if len(parts) > 1 else filename
+    return f"{name} ({short}:{lineno})"
@@ -0,0 +1,139 @@
+"""
+Statistiques glissantes des prédictions: fenêtres des N derniers résultats et
+des dernières heures, tenues à jour en O(1) à chaque résultat. /bilan lit des
+compteurs déjà calculés, sans parcourir l'historique.
+"""
+from collections import deque
+
+from history import WIN, LOSS, EXPIRED
+from storage import SUITS
+
+
+class Aggregate:
+    __slots__ = ('wins', 'losses', 'expired', 'by_check', 'suit_wins', 'suit_total')
+
+    def __init__(self):
+        self.wins = 0
+        self.losses = 0
+        self.expired = 0
+        # Victoires par vérification (N, N+1, N+2, N+3)
+        self.by_check = [0] * 4
+        # Par costume prédit: victoires et prédictions conclues (gagnées ou perdues)
+        self.suit_wins = [0] * len(SUITS)
+        self.suit_total = [0] * len(SUITS)
+
+    @property
+    def total(self):
+        return self.wins + self.losses
+
+    def apply(self, event, sign):
+        _, outcome, check, suit = event
+        if outcome == WIN:
+            self.wins += sign
+            self.by_check[check] += sign
+            self.suit_wins[suit] += sign
+            self.suit_total[suit] += sign
+        elif outcome == LOSS:
+            self.losses += sign
+            self.suit_total[suit] += sign
+        elif outcome == EXPIRED:
+            self.expired += sign
+
+
+class CountWindow:
+    """Les size derniers résultats."""
+
+    def __init__(self, size):
+        self.size = size
+        self.events = deque()
+        self.totals = Aggregate()
+
+    def add(self, event):
+        if len(self.events) == self.size:
+            self.totals.apply(self.events.popleft(), -1)
+        self.events.append(event)
+        self.totals.apply(event, 1)
+
+    def expire(self, at):
+        pass
+
+
+class TimeWindow:
+    """Les résultats des seconds dernières secondes."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.events = deque()
+        self.totals = Aggregate()
+
+    def add(self, event):
+        self.events.append(event)
+        self.totals.apply(event, 1)
+
+    def expire(self, at):
+        events = self.events
+        limit = at - self.seconds
+        while events and events[0][0] <= limit:
+            self.totals.apply(events.popleft(), -1)
+
+
+class RollingStats:
+    def __init__(self, counts, hours):
+        self.counts = counts
+        self.hours = hours
+        self.reset()
+
+    def reset(self):
+        # Nom de fenêtre (argument de /bilan) → fenêtre
+        self.windows = {}
+        for count in self.counts:
+            self.windows[str(count)] = CountWindow(count)
+        for hours in self.hours:
+            self.windows[f"{hours}h"] = TimeWindow(hours * 3600)
+        # > 0: victoires d'affilée, < 0: défaites d'affilée (les expirations ne comptent pas)
+        self.streak = 0
+        self.best_win_streak = 0
+        self.worst_loss_streak = 0
+
+    def record(self, outcome, check, suit, at):
+        event = (at, outcome, check, suit)
+        for window in self.windows.values():
+            window.expire(at)
+            window.add(event)
+
+        if outcome == WIN:
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.best_win_streak = max(self.best_win_streak, self.streak)
+        elif outcome == LOSS:
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            self.worst_loss_streak = max(self.worst_loss_streak, -self.streak)
+
+    def window(self, name, at):
+        window = self.windows.get(name)
+        if window is None:
+            return None
+        window.expire(at)
+        return window.totals
+
+    def snapshot(self):
+        # Chaque fenêtre est une fin de la suite des résultats: la plus longue
+        # contient toutes les autres
+        longest = max((w.events for w in self.windows.values()), key=len, default=())
+        return {
+            'events': [list(event) for event in longest],
+            'streak': self.streak,
+            'best_win_streak': self.best_win_streak,
+            'worst_loss_streak': self.worst_loss_streak,
+        }
+
+    def restore(self, saved, at):
+        self.reset()
+        for event in saved.get('events', []):
+            event = tuple(event)
+            for window in self.windows.values():
+                window.add(event)
+        for window in self.windows.values():
+            window.expire(at)
+        self.streak = saved.get('streak', 0)
+        self.best_win_streak = saved.get('best_win_streak', 0)
+        self.worst_loss_streak = saved.get('worst_loss_streak', 0)
@@ -0,0 +1,91 @@
+"""
+Planificateur à échéances exactes sur les minuteurs de la boucle asyncio
+(loop.call_at) : rien ne se réveille pour vérifier une heure, chaque tâche
+part à son échéance.
+
+Les tâches sont nommées par une clé: reprogrammer une clé remplace
+l'échéance précédente, l'annuler la retire.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Marge sous laquelle une échéance murale est considérée atteinte (en secondes)
+_EPSILON_SECONDS = 0.001
+
+
+class Scheduler:
+    def __init__(self, clock=datetime.now):
+        # Horloge murale des échéances (datetime naïf, heure locale)
+        self.clock = clock
+        self.jobs = {}
+        self.tasks = set()
+
+    def at(self, key, when, callback, *args):
+        """Lance callback(*args) (coroutine) à l'heure murale when."""
+        def fire():
+            # La boucle suit une horloge monotone: si l'heure murale a reculé
+            # entre-temps, on réarme pour le reste
+            remaining = (when - self.clock()).total_seconds()
+            if remaining > _EPSILON_SECONDS:
+                self._arm(key, remaining, fire)
+                return
+            self.jobs.pop(key, None)
+            self._spawn(key, callback(*args))
+
+        self._arm(key, (when - self.clock()).total_seconds(), fire)
+
+    def every(self, key, seconds, callback, *args, delay=0.0):
+        """Lance callback(*args) toutes les seconds, la première fois après delay."""
+        loop = asyncio.get_running_loop()
+        deadline = [loop.time() + delay]
+
+        def fire():
+            # Échéances calculées depuis la précédente: pas de dérive
+            deadline[0] += seconds
+            self.jobs[key] = loop.call_at(deadline[0], fire)
+            self._spawn(key, callback(*args))
+
+        self.cancel(key)
+        self.jobs[key] = loop.call_at(deadline[0], fire)
+
+    def cancel(self, key):
+        handle = self.jobs.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+            return True
+        return False
+
+    def deadline(self, key):
+        """Temps restant avant l'échéance de key (secondes), None si absente."""
+        handle = self.jobs.get(key)
+        if handle is None:
+            return None
+        return max(0.0, handle.when() - asyncio.get_running_loop().time())
+
+    def stop(self):
+        for handle in self.jobs.values():
+            handle.cancel()
+        self.jobs.clear()
+        for task in list(self.tasks):
+            task.cancel()
+
+    # ---- Interne ----
+
+    def _arm(self, key, delay, fire):
+        loop = asyncio.get_running_loop()
+        self.cancel(key)
+        self.jobs[key] = loop.call_at(loop.time() + max(0.0, delay), fire)
+
+    def _spawn(self, key, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+
+        def done(task):
+            self.tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"❌ Tâche planifiée {key} en erreur: {task.exception()}")
+
+        task.add_done_callback(done)
@@ -0,0 +1,377 @@
+"""
+Répartition des paires de canaux sur plusieurs processus (mode optionnel).
+
+Le coordinateur garde la connexion Telegram et la file d'envoi ; chaque
+worker possède la base, l'état et les vérifications de ses paires. Un Pipe
+par worker, surveillé par loop.add_reader des deux côtés :
+- coordinateur → worker : événements source, commandes admin, bases /pre
+- worker → coordinateur : envois/éditions à exécuter, état pour /health
+"""
+import signal
+import asyncio
+import logging
+import itertools
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Méthodes de la file d'envoi qu'un worker peut appeler
+_OUTBOUND_METHODS = {'send', 'send_file', 'edit'}
+
+_READY_TIMEOUT_SECONDS = 120
+_STOP_TIMEOUT_SECONDS = 30
+
+
+class Link:
+    """Extrémité d'un Pipe intégrée à la boucle asyncio."""
+
+    def __init__(self, conn, handler=None, on_closed=None):
+        self.conn = conn
+        self.handler = handler
+        self.on_closed = on_closed
+        self.closed = False
+        self._loop = None
+        # Un thread d'envoi par lien: l'ordre est conservé et un gros message
+        # (base /pre) ne bloque jamais la boucle
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ipc-send')
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.conn.fileno(), self._on_readable)
+
+    def post(self, message):
+        if not self.closed:
+            self._sender.submit(self._send, message)
+
+    def _send(self, message):
+        try:
+            self.conn.send(message)
+        except (OSError, EOFError) as e:
+            logger.error(f"❌ Envoi IPC impossible ({message[0]}): {e}")
+
+    def _on_readable(self):
+        try:
+            while not self.closed and self.conn.poll():
+                message = self.conn.recv()
+                try:
+                    self.handler(message)
+                except Exception as e:
+                    logger.error(f"❌ Erreur message IPC ({message[0]}): {e}")
+        except (EOFError, OSError):
+            self.close()
+            if self.on_closed:
+                self.on_closed()
+
+    def close(self, wait=False):
+        if self.closed:
+            return
+        self.closed = True
+        if self._loop is not None:
+            self._loop.remove_reader(self.conn.fileno())
+        self._sender.shutdown(wait=wait)
+        self.conn.close()
+
+
+def _outcome(future):
+    if future.cancelled():
+        return False, "annulé"
+    if future.exception() is not None:
+        return False, str(future.exception())
+    return True, getattr(future.result(), 'id', None)
+
+
+class ShardCoordinator:
+    """Côté processus principal: lance les workers et exécute leurs envois."""
+
+    def __init__(self, outbound, on_status, on_lost):
+        self.outbound = outbound
+        self.on_status = on_status
+        self.on_lost = on_lost
+        self.links = []
+        self.processes = []
+        # Nom du locataire → index du worker qui le possède
+        self.owner = {}
+        self.stopping = False
+        self._ready = []
+        self._stopped = []
+
+    async def start(self, specs, workers):
+        count = max(1, min(workers, len(specs)))
+        ctx = multiprocessing.get_context('spawn')
+        for index in range(count):
+            group = specs[index::count]
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=run_worker, args=(child, group), name=f'shard-{index}', daemon=True
+            )
+            process.start()
+            child.close()
+
+            link = Link(
+                parent,
+                functools.partial(self._on_message, index),
+                functools.partial(self._on_closed, index),
+            )
+            link.start()
+            self.links.append(link)
+            self.processes.append(process)
+            self._ready.append(asyncio.Event())
+            self._stopped.append(asyncio.Event())
+            for spec in group:
+                self.owner[spec['name']] = index
+            names = ', '.join(spec['name'] for spec in group)
+            logger.info(f"🧩 Worker {index} (pid {process.pid}): {names}")
+
+        await asyncio.wait_for(
+            asyncio.gather(*(event.wait() for event in self._ready)), _READY_TIMEOUT_SECONDS
+        )
+        logger.info(f"🧩 {count} worker(s) prêts")
+
+    def post(self, tenant_name, message):
+        self.links[self.owner[tenant_name]].post(message)
+
+    def forward_admin(self, tenant_name, text, broadcast=False, message_id=None):
+        """Commande admin exécutée par le worker du locataire (qui répond)."""
+        owner = self.owner[tenant_name]
+        for index, link in enumerate(self.links):
+            if index == owner:
+                link.post(('admin', tenant_name, text, True, message_id))
+            elif broadcast:
+                # Réglage global (ex: /jokes): appliqué partout, une seule réponse
+                link.post(('admin', None, text, False, None))
+
+    async def stop(self, drain_seconds):
+        self.stopping = True
+        for link in self.links:
+            link.post(('stop', drain_seconds))
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(event.wait() for event in self._stopped)), _STOP_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Workers non arrêtés à temps")
+
+        loop = asyncio.get_running_loop()
+        for link, process in zip(self.links, self.processes):
+            link.close()
+            await loop.run_in_executor(None, process.join, 5)
+            if process.is_alive():
+                process.kill()
+
+    # ---- Interne ----
+
+    def _on_message(self, index, message):
+        kind = message[0]
+        if kind == 'call':
+            self._call(index, *message[1:])
+        elif kind == 'status':
+            self.on_status(message[1], message[2])
+        elif kind == 'ready':
+            self._ready[index].set()
+        elif kind == 'stopped':
+            self._stopped[index].set()
+
+    def _call(self, index, call_id, method, args, kwargs):
+        link = self.links[index]
+        if method not in _OUTBOUND_METHODS:
+            link.post(('result', call_id, False, f"méthode inconnue: {method}"))
+            return
+        try:
+            future = getattr(self.outbound, method)(*args, **kwargs)
+        except Exception as e:
+            link.post(('result', call_id, False, str(e)))
+            return
+        future.add_done_callback(lambda f: link.post(('result', call_id, *_outcome(f))))
+
+    def _on_closed(self, index):
+        self._stopped[index].set()
+        if not self.stopping:
+            logger.error(f"❌ Worker {index} perdu (pid {self.processes[index].pid})")
+            self.on_lost()
+
+
+# ============================================================
+# CÔTÉ WORKER
+# ============================================================
+
+class ShardCallError(Exception):
+    pass
+
+
+class _SentMessage:
+    __slots__ = ('id',)
+
+    def __init__(self, message_id):
+        self.id = message_id
+
+
+def _consume_exception(future):
+    if not future.cancelled():
+        future.exception()
+
+
+class IpcOutbound:
+    """Remplace la file d'envoi dans un worker: le coordinateur exécute chaque appel."""
+
+    def __init__(self, link):
+        self.link = link
+        self.calls = {}
+        self.stats = {'sent': 0, 'edited': 0, 'files': 0}
+        self._ids = itertools.count(1)
+
+    def _call(self, method, *args, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        call_id = next(self._ids)
+        self.calls[call_id] = future
+        self.link.post(('call', call_id, method, args, kwargs))
+        return future
+
+    def send(self, chat_id, text, **kwargs):
+        self.stats['sent'] += 1
+        return self._call('send', chat_id, text, **kwargs)
+
+    def send_file(self, chat_id, file, **kwargs):
+        self.stats['files'] += 1
+        return self._call('send_file', chat_id, file, **kwargs)
+
+    def edit(self, chat_id, message_id, text, **kwargs):
+        self.stats['edited'] += 1
+        return self._call('edit', chat_id, message_id, text, **kwargs)
+
+    def queued(self):
+        return len(self.calls)
+
+    def resolve(self, call_id, ok, value):
+        future = self.calls.pop(call_id, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(_SentMessage(value) if value is not None else None)
+        else:
+            future.set_exception(ShardCallError(value))
+
+    async def drain(self, timeout):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.calls and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.1)
+
+
+class _Message:
+    __slots__ = ('id', 'message', 'text', 'date', 'file')
+
+    def __init__(self, message_id, text, date):
+        self.id = message_id
+        self.message = text
+        self.text = text
+        self.date = date
+        self.file = None
+
+
+class _Event:
+    """Ce que les handlers de main lisent d'un événement Telethon."""
+
+    __slots__ = ('chat_id', 'sender_id', 'message')
+
+    def __init__(self, chat_id, sender_id, message):
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.message = message
+
+
+def run_worker(conn, specs):
+    # Ctrl-C vise tout le groupe de processus: c'est le coordinateur qui
+    # arrête les workers, par ('stop',) ou en fermant leur Pipe
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(conn, specs))
+
+
+async def _serve(conn, specs):
+    import main
+    from config import ADMIN_ID, STATE_FLUSH_INTERVAL_SECONDS
+
+    stop = asyncio.Event()
+    drain_seconds = [0]
+    link = Link(conn, on_closed=stop.set)
+    outbound = IpcOutbound(link)
+    main.outbound = outbound
+
+    main.setup_tenants(specs)
+    for tenant in main.tenants.values():
+        main.load_prediction_db(tenant)
+        main.restore_runtime_state(tenant)
+
+    tasks = set()
+
+    def spawn(coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def reply_to_admin(text):
+        await outbound.send(ADMIN_ID, text)
+
+    async def run_admin(name, text, reply, message_id):
+        if name in main.tenants:
+            main.admin_context['tenant'] = name
+        event = _Event(ADMIN_ID, ADMIN_ID, _Message(0, text, None))
+        await main.handle_admin_commands(event, quiet=not reply, edit_message_id=message_id)
+
+    def push_status():
+        for tenant in main.tenants.values():
+            link.post(('status', tenant.name, main.shard_status(tenant)))
+
+    async def push_status_periodically():
+        while True:
+            await asyncio.sleep(STATE_FLUSH_INTERVAL_SECONDS)
+            push_status()
+
+    def on_message(message):
+        kind = message[0]
+        if kind == 'result':
+            outbound.resolve(*message[1:])
+        elif kind == 'event':
+            _, name, message_id, text, date, is_edit, replay = message
+            tenant = main.tenants[name]
+            event = _Event(tenant.source_channel_id, None, _Message(message_id, text, date))
+            spawn(main.process_source_message(tenant, event, is_edit, replay))
+        elif kind == 'admin':
+            spawn(run_admin(*message[1:]))
+        elif kind == 'upload':
+            _, name, new_db, errors, mode = message
+            spawn(main.apply_prediction_upload(
+                main.tenants[name], new_db, errors, reply_to_admin, mode
+            ))
+        elif kind == 'stop':
+            drain_seconds[0] = message[1]
+            stop.set()
+
+    link.handler = on_message
+    link.start()
+    push_status()
+    link.post(('ready',))
+
+    main.start_schedules()
+    background = [
+        asyncio.create_task(main.compact_prediction_db_periodically()),
+        asyncio.create_task(main.flush_runtime_state_periodically()),
+        asyncio.create_task(push_status_periodically()),
+    ]
+
+    try:
+        await stop.wait()
+    finally:
+        for task in background:
+            task.cancel()
+        main.scheduler.stop()
+        for tenant in main.tenants.values():
+            await main.flush_runtime_state(tenant, force=True)
+            await tenant.store.compact(tenant.db)
+            tenant.history.archive_all()
+        if not link.closed:
+            push_status()
+            await outbound.drain(drain_seconds[0])
+            link.post(('stopped',))
+            link.close(wait=True)
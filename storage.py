@@ -0,0 +1,377 @@
+"""
+Persistance de la base de prédiction.
+Snapshot (JSON, ou binaire ouvert par mmap) écrit de façon atomique + journal
+de modifications en ajout seul, toutes les écritures passent par un thread
+dédié (jamais sur la boucle asyncio).
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Un seul thread d'écriture : les opérations restent dans l'ordre de soumission
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
+
+def atomic_write(path, data):
+    """Écrit data (bytes) dans path via fichier temporaire + fsync + rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+async def run_in_writer(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_writer, func, *args)
+
+
+def submit_to_writer(func, *args):
+    """Comme run_in_writer, sans attendre le résultat (l'ordre reste garanti)."""
+    future = _writer.submit(func, *args)
+    future.add_done_callback(_log_write_error)
+    return future
+
+
+def _log_write_error(future):
+    if future.exception() is not None:
+        logger.error(f"❌ Erreur d'écriture: {future.exception()}")
+
+
+def append_lines(path, lines):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def apply_ops(db, ops):
+    """Applique des opérations du journal: ('set', n, suit), ('del', n), ('clear',)."""
+    for op in ops:
+        kind = op[0]
+        if kind == 'set':
+            db[op[1]] = op[2]
+        elif kind == 'del':
+            db.pop(op[1], None)
+        elif kind == 'clear':
+            db.clear()
+    return db
+
+
+def _encode_op(op):
+    if op[0] == 'set':
+        return {'op': 'set', 'n': op[1], 's': op[2]}
+    if op[0] == 'del':
+        return {'op': 'del', 'n': op[1]}
+    return {'op': 'clear'}
+
+
+def _decode_op(record):
+    kind = record['op']
+    if kind == 'set':
+        return ('set', int(record['n']), record['s'])
+    if kind == 'del':
+        return ('del', int(record['n']))
+    if kind == 'clear':
+        return ('clear',)
+    raise ValueError(f"opération inconnue: {kind}")
+
+
+# ============================================================
+# COSTUMES ET BASE BINAIRE
+# ============================================================
+
+SUITS = ('♠️', '❤️', '♦️', '♣️', '?')
+# Le même costume tel que l'écrit le canal source (cœur en ♥️)
+SOURCE_SUITS = ('♠️', '♥️', '♦️', '♣️', None)
+UNKNOWN_SUIT = len(SUITS) - 1
+# Par premier caractère: ❤️, ❤ et ♥️ donnent le même code
+_SUIT_CODES = {'♠': 0, '❤': 1, '♥': 1, '♦': 2, '♣': 3}
+
+
+def suit_code(suit):
+    return _SUIT_CODES.get(suit[:1], UNKNOWN_SUIT)
+
+
+_MAGIC = b'PDB1'
+# Magic + nombre d'entrées, puis numéros int32 triés, puis codes costume uint8
+# (petit-boutiste)
+_HEADER = struct.Struct('<4sI')
+_MISSING = object()
+
+
+class CompactDb:
+    """
+    Base {numéro: costume} en deux tableaux triés: numéros int32 et codes
+    costume uint8, soit 5 octets par numéro. Ouverte par mmap, elle est lue
+    sans conversion au démarrage. En lecture elle a l'API d'un dict. Une
+    modification recopie d'abord les tableaux en mémoire.
+    """
+
+    def __init__(self, numbers=None, codes=None):
+        self.numbers = numbers if numbers is not None else array('i')
+        self.codes = codes if codes is not None else array('B')
+        # Position de la dernière recherche: le canal source avance numéro par
+        # numéro, la suivante tombe presque toujours au même endroit ou juste après
+        self._cursor = 0
+
+    @classmethod
+    def from_dict(cls, db):
+        items = sorted(db.items())
+        return cls(
+            array('i', [n for n, _ in items]),
+            array('B', [suit_code(suit) for _, suit in items]),
+        )
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"{path}: fichier tronqué")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(mapped)
+        if magic != _MAGIC or size != _HEADER.size + 5 * count:
+            raise ValueError(f"{path}: format invalide")
+
+        view = memoryview(mapped)
+        middle = _HEADER.size + 4 * count
+        numbers = view[_HEADER.size:middle].cast('i')
+        codes = view[middle:middle + count]
+        db = cls(numbers, codes)
+        if sys.byteorder != 'little':
+            db._detach()
+            db.numbers.byteswap()
+        return db
+
+    def to_bytes(self):
+        numbers = self.numbers
+        if sys.byteorder != 'little':
+            numbers = array('i', bytes(numbers))
+            numbers.byteswap()
+        return _HEADER.pack(_MAGIC, len(numbers)) + bytes(numbers) + bytes(self.codes)
+
+    def copy(self):
+        return CompactDb(array('i', bytes(self.numbers)), array('B', bytes(self.codes)))
+
+    # ---- Lecture ----
+
+    def _find(self, number):
+        numbers = self.numbers
+        count = len(numbers)
+        i = self._cursor
+        # i convient s'il vérifie numbers[i-1] < number <= numbers[i] (= bisect_left)
+        if i <= count and (i == 0 or numbers[i - 1] < number):
+            if i < count and numbers[i] < number:
+                i += 1
+                if i < count and numbers[i] < number:
+                    i = bisect_left(numbers, number, i)
+        else:
+            i = bisect_left(numbers, number)
+        self._cursor = i
+        if i < count and numbers[i] == number:
+            return i
+        return -1
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, number):
+        return self._find(number) >= 0
+
+    def __getitem__(self, number):
+        i = self._find(number)
+        if i < 0:
+            raise KeyError(number)
+        return SUITS[self.codes[i]]
+
+    def get(self, number, default=None):
+        i = self._find(number)
+        return SUITS[self.codes[i]] if i >= 0 else default
+
+    def __iter__(self):
+        return iter(self.numbers)
+
+    def keys(self):
+        return self.numbers
+
+    def items(self):
+        return zip(self.numbers, (SUITS[code] for code in self.codes))
+
+    # ---- Modification ----
+
+    def _detach(self):
+        """Remplace les vues sur le fichier par des tableaux modifiables."""
+        if not isinstance(self.numbers, array):
+            self.numbers = array('i', bytes(self.numbers))
+            self.codes = array('B', bytes(self.codes))
+
+    def __setitem__(self, number, suit):
+        self._detach()
+        i = bisect_left(self.numbers, number)
+        if i < len(self.numbers) and self.numbers[i] == number:
+            self.codes[i] = suit_code(suit)
+        else:
+            self.numbers.insert(i, number)
+            self.codes.insert(i, suit_code(suit))
+
+    def pop(self, number, default=_MISSING):
+        i = self._find(number)
+        if i < 0:
+            if default is _MISSING:
+                raise KeyError(number)
+            return default
+        suit = SUITS[self.codes[i]]
+        self._detach()
+        del self.numbers[i]
+        del self.codes[i]
+        return suit
+
+    def __delitem__(self, number):
+        self.pop(number)
+
+    def clear(self):
+        self.numbers = array('i')
+        self.codes = array('B')
+
+    def update(self, other):
+        merged = dict(self.items())
+        merged.update(other)
+        rebuilt = CompactDb.from_dict(merged)
+        self.numbers, self.codes = rebuilt.numbers, rebuilt.codes
+
+
+class PredictionStore:
+    """Snapshot + journal pour prediction_db (snapshot JSON ou CompactDb binaire)."""
+
+    def __init__(self, path, log_path, compact_threshold=1000, binary=False, migrate_from=None):
+        self.path = path
+        self.log_path = log_path
+        self.compact_threshold = compact_threshold
+        self.binary = binary
+        # Snapshot JSON repris si le fichier binaire n'existe pas encore
+        self.migrate_from = migrate_from
+        self.log_entries = 0
+
+    # ---- Lecture (démarrage) ----
+
+    def _load_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        return {int(k): v for k, v in raw.items()}
+
+    def load(self):
+        migrated = False
+        if not self.binary:
+            db = self._load_json(self.path) if os.path.exists(self.path) else {}
+        elif os.path.exists(self.path):
+            db = CompactDb.open(self.path)
+        elif self.migrate_from and os.path.exists(self.migrate_from):
+            db = CompactDb.from_dict(self._load_json(self.migrate_from))
+            migrated = True
+            logger.info(f"🔁 {self.migrate_from} converti, écrit dans {self.path} à la prochaine compaction")
+        else:
+            db = CompactDb()
+
+        self.log_entries = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        op = _decode_op(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        logger.warning(f"⚠️ Journal {self.log_path} ligne {line_no} ignorée: {e}")
+                        continue
+                    apply_ops(db, [op])
+                    self.log_entries += 1
+            if self.log_entries:
+                logger.info(f"📜 Journal rejoué: {self.log_entries} opération(s)")
+        if migrated:
+            # Force l'écriture du snapshot binaire à la prochaine compaction
+            self.log_entries = max(self.log_entries, 1)
+        return db
+
+    def exists(self):
+        return any(
+            path and os.path.exists(path) for path in (self.path, self.log_path, self.migrate_from)
+        )
+
+    # ---- Écriture (thread dédié) ----
+
+    def _write_snapshot(self, db):
+        if self.binary:
+            data = db.to_bytes()
+        else:
+            data = json.dumps(
+                {str(k): v for k, v in sorted(db.items())},
+                ensure_ascii=False, separators=(',', ':')
+            ).encode('utf-8')
+        atomic_write(self.path, data)
+        # Le snapshot contient tout le journal : on peut le vider
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+        _fsync_dir(self.log_path)
+
+    def _append(self, ops):
+        lines = ''.join(
+            json.dumps(_encode_op(op), ensure_ascii=False) + '\n' for op in ops
+        )
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def write_snapshot(self, db):
+        """Réécrit tout le fichier. db est copié immédiatement (boucle asyncio)."""
+        if self.binary:
+            snapshot = db.copy() if isinstance(db, CompactDb) else CompactDb.from_dict(db)
+        else:
+            snapshot = dict(db)
+        await run_in_writer(self._write_snapshot, snapshot)
+        self.log_entries = 0
+
+    async def append(self, ops, db=None):
+        """Ajoute des opérations au journal ; compacte si le seuil est atteint."""
+        ops = list(ops)
+        if not ops:
+            return
+        await run_in_writer(self._append, ops)
+        self.log_entries += len(ops)
+        if db is not None and self.log_entries >= self.compact_threshold:
+            await self.compact(db)
+
+    async def compact(self, db):
+        if self.log_entries == 0:
+            return False
+        entries = self.log_entries
+        await self.write_snapshot(db)
+        logger.info(f"🗜️ Base compactée ({entries} opération(s) du journal intégrées)")
+        return True
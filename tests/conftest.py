@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_bot(tmp_path, monkeypatch):
+    """Fichiers du bot dans un dossier temporaire; globals de main restaurés."""
+    monkeypatch.chdir(tmp_path)
+    for name in ('now', 'pause', 'outbound'):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    yield
+    main.tenants.clear()
+    main.tenants_by_source.clear()
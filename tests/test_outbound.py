@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+from telethon import errors
+
+import main
+import backtest
+import outbound
+from outbound import OutboundDispatcher, PRIORITY_PREDICTION
+
+
+class Message:
+    def __init__(self, message_id):
+        self.id = message_id
+
+
+class ScriptedClient:
+    """Client qui répond aux requêtes dans l'ordre de script (exception ou None = succès)."""
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.calls = []
+        self.release = None
+
+    async def _answer(self, call):
+        self.calls.append(call)
+        if self.release is not None:
+            await self.release.wait()
+        if self.script:
+            outcome = self.script.pop(0)
+            if outcome is not None:
+                raise outcome
+        return Message(len(self.calls))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self._answer(('send', chat_id, text))
+
+    async def send_file(self, chat_id, file, **kwargs):
+        return await self._answer(('file', chat_id, file))
+
+    async def edit_message(self, chat_id, message_id, text, **kwargs):
+        return await self._answer(('edit', chat_id, message_id, text))
+
+
+def dispatcher(client, **kwargs):
+    kwargs.setdefault('rate_per_chat', 1000)
+    kwargs.setdefault('burst_per_chat', 1000)
+    kwargs.setdefault('global_rate', 1000)
+    queue = OutboundDispatcher(**kwargs)
+    queue.start(client)
+    return queue
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(outbound, '_MAX_BACKOFF_SECONDS', 0)
+
+
+def test_repeated_edits_are_merged():
+    async def run():
+        client = ScriptedClient()
+        queue = OutboundDispatcher()
+        first = queue.edit(1, 10, "a")
+        second = queue.edit(1, 10, "b")
+        third = queue.edit(1, 10, "c")
+        queue.start(client)
+        await asyncio.gather(first, second, third)
+        await queue.stop()
+        return client, queue, first, third
+
+    client, queue, first, third = asyncio.run(run())
+    assert client.calls == [('edit', 1, 10, "c")]
+    assert first is third
+    assert queue.stats['coalesced'] == 2
+    assert queue.stats['edited'] == 1
+
+
+def test_flood_wait_requeues_the_job():
+    async def run():
+        client = ScriptedClient([errors.FloodWaitError(request=None, capture=0)])
+        queue = dispatcher(client)
+        message = await queue.send(1, "prédiction", priority=PRIORITY_PREDICTION)
+        await queue.stop()
+        return client, queue, message
+
+    client, queue, message = asyncio.run(run())
+    assert [call[0] for call in client.calls] == ['send', 'send']
+    assert message.id == 2
+    assert queue.stats['flood_waits'] == 1
+    assert queue.stats['retries'] == 0
+    assert queue.stats['sent'] == 1
+
+
+def test_network_errors_are_retried():
+    async def run():
+        client = ScriptedClient([ConnectionError("coupure"), OSError("reset")])
+        queue = dispatcher(client, max_retries=2)
+        message = await queue.send(1, "texte")
+        await queue.stop()
+        return client, queue, message
+
+    client, queue, message = asyncio.run(run())
+    assert len(client.calls) == 3
+    assert message.id == 3
+    assert queue.stats['retries'] == 2
+    assert queue.stats['errors'] == 0
+
+
+def test_retries_exhausted_fail_the_future():
+    async def run():
+        client = ScriptedClient([ConnectionError("coupure")] * 3)
+        queue = dispatcher(client, max_retries=2)
+        future = queue.send(1, "texte")
+        with pytest.raises(ConnectionError):
+            await future
+        later = await queue.send(1, "suivant")
+        await queue.stop()
+        return client, queue, later
+
+    client, queue, later = asyncio.run(run())
+    assert len(client.calls) == 4
+    assert later.id == 4
+    assert queue.stats['retries'] == 2
+    assert queue.stats['errors'] == 1
+
+
+def test_drain_and_stop_wait_for_the_request_in_flight():
+    async def run():
+        client = ScriptedClient()
+        client.release = asyncio.Event()
+        queue = dispatcher(client)
+        future = queue.send(1, "résultat")
+        await asyncio.sleep(0.05)
+        assert queue.in_flight is not None
+        assert queue.queued() == 1
+
+        await queue.drain(0.2)
+        assert queue.queued() == 1
+        assert not future.done()
+
+        asyncio.get_running_loop().call_later(0.1, client.release.set)
+        await queue.stop()
+        return queue, future
+
+    queue, future = asyncio.run(run())
+    assert future.done() and future.result().id == 1
+    assert queue.queued() == 0
+    assert queue.stats['sent'] == 1
+
+
+def test_stop_gives_up_on_a_stuck_request(monkeypatch):
+    monkeypatch.setattr(outbound, '_STOP_WAIT_SECONDS', 0.1)
+
+    async def run():
+        client = ScriptedClient()
+        client.release = asyncio.Event()
+        queue = dispatcher(client)
+        future = queue.send(1, "bloqué")
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return queue, future
+
+    queue, future = asyncio.run(run())
+    assert not future.done()
+    assert queue.stats['sent'] == 0
+
+
+def test_prediction_does_not_wait_for_its_post():
+    async def run():
+        client = ScriptedClient()
+        client.release = asyncio.Event()
+        main.outbound = dispatcher(client)
+        tenant = backtest.reset_bot({}, 3, 2, 10)
+
+        launched = await asyncio.wait_for(main.send_prediction(tenant, 12, '♠️', 10), 1)
+        slot = tenant.verification.slots[12]
+        assert launched and slot['message_id'] is None
+
+        # Résultat connu avant la fin de l'envoi: l'édition part après lui
+        await main.update_prediction_status(tenant, slot, '✅0️⃣')
+        assert 12 not in tenant.verification
+        client.release.set()
+        await main.outbound.drain(1)
+        await main.outbound.stop()
+        return client, slot
+
+    client, slot = asyncio.run(run())
+    assert [call[0] for call in client.calls] == ['send', 'edit']
+    assert client.calls[1][2] == slot['message_id'] == 1
+    assert client.calls[1][3] == main.format_prediction(12, '♠️', '✅0️⃣')
+
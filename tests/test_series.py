@@ -0,0 +1,65 @@
+import asyncio
+
+import main
+import backtest
+from benchmarks import corpus
+
+
+def _messages(stream):
+    return [(message_id, text, None) for message_id, text in stream]
+
+
+def test_second_day_predicts_like_a_fresh_day():
+    games = 300
+    db = corpus.prediction_db(games)
+    two_days = _messages(corpus.source_days(2, games))
+    first_day = two_days[:len(two_days) // 2]
+    second_day = two_days[len(two_days) // 2:]
+
+    expected = backtest.run_backtest(db, first_day)['predictions'] + \
+        backtest.run_backtest(db, second_day)['predictions']
+
+    assert expected > 0
+    assert backtest.run_backtest(db, two_days)['predictions'] == expected
+
+
+def test_is_new_series():
+    tenant = backtest.reset_bot({}, 3, 2, 10)
+    tenant.state['last_source_number'] = 500
+    assert not main.is_new_series(tenant, 495)
+    assert not main.is_new_series(tenant, 490)
+    assert main.is_new_series(tenant, 489)
+    assert main.is_new_series(tenant, 1)
+
+
+def test_start_new_series_resets_series_state():
+    clock = backtest.FakeClock()
+    main.now = clock.now
+    main.pause = clock.pause
+    main.outbound = backtest.NullOutbound()
+    tenant = backtest.reset_bot({n: '♠️' for n in range(10, 200, 10)}, 3, 2, 10)
+
+    async def feed(message_id, game):
+        text = f"#N{game}. ✅3(K♦️A♦️) - 2(J♣️8♥️)"
+        await main.process_source_message(
+            tenant, backtest._FakeEvent(backtest._FakeMessage(message_id, text, None))
+        )
+
+    async def run():
+        for game in range(1, 20):
+            await feed(game, game)
+        assert tenant.verification.numbers()
+        assert tenant.state['last_prediction_number'] is not None
+        assert len(tenant.outcomes)
+
+        expired = tenant.stats['expired']
+        pending = len(tenant.verification.numbers())
+        await feed(20, 1)
+        return expired, pending
+
+    expired, pending = asyncio.run(run())
+    assert tenant.verification.numbers() == []
+    assert tenant.stats['expired'] == expired + pending
+    assert tenant.state['last_prediction_number'] is None
+    assert len(tenant.outcomes) == 1
+    assert tenant.state['last_source_number'] == 1
@@ -0,0 +1,133 @@
+import json
+import random
+import asyncio
+
+import pytest
+
+from storage import CompactDb, PredictionStore, SUITS, suit_code
+
+DB_SUITS = ['♠️', '❤️', '♦️', '♣️']
+
+
+def random_db(size, seed=1):
+    rng = random.Random(seed)
+    numbers = rng.sample(range(1, size * 4), size)
+    return {n: rng.choice(DB_SUITS) for n in numbers}
+
+
+def assert_same_answers(compact, db, queries):
+    for n in queries:
+        assert (n in compact) == (n in db), n
+        assert compact.get(n) == db.get(n), n
+
+
+def test_lookups_match_a_dict():
+    db = random_db(2000)
+    compact = CompactDb.from_dict(db)
+    top = max(db)
+    rng = random.Random(2)
+
+    assert len(compact) == len(db)
+    # Séquentiel (comme le canal source), aléatoire, à rebours, hors bornes
+    assert_same_answers(compact, db, range(-5, top + 10))
+    assert_same_answers(compact, db, [rng.randint(-100, top + 100) for _ in range(5000)])
+    assert_same_answers(compact, db, range(top + 10, -5, -1))
+    assert_same_answers(compact, db, [0, -1, top, top + 1, 2 ** 31 - 1, -2 ** 31])
+    assert sorted(compact.items()) == sorted(db.items())
+
+
+def test_lookups_on_empty_and_single_entry():
+    empty = CompactDb()
+    assert 5 not in empty and empty.get(5) is None
+    single = CompactDb.from_dict({7: '♦️'})
+    assert_same_answers(single, {7: '♦️'}, [8, 7, 6, 7, 100, -1])
+
+
+def test_lookups_after_changes():
+    db = random_db(500, seed=3)
+    compact = CompactDb.from_dict(db)
+    rng = random.Random(4)
+    for _ in range(300):
+        n = rng.randint(1, 2000)
+        if rng.random() < 0.5:
+            suit = rng.choice(DB_SUITS)
+            db[n] = suit
+            compact[n] = suit
+        else:
+            assert compact.pop(n, None) == db.pop(n, None)
+        assert_same_answers(compact, db, [n, n - 1, n + 1])
+    assert_same_answers(compact, db, range(0, 2002))
+
+
+def test_heart_spellings_share_a_code():
+    compact = CompactDb.from_dict({1: '❤️', 2: '♥️', 3: '❤'})
+    assert [compact[n] for n in (1, 2, 3)] == ['❤️'] * 3
+    assert suit_code('xyz') == len(SUITS) - 1
+
+
+def test_binary_snapshot_journal_roundtrip(tmp_path):
+    path = str(tmp_path / 'db.bin')
+    log_path = str(tmp_path / 'db.log')
+    db = random_db(1000, seed=5)
+    ops = [('set', 1, '♣️'), ('del', next(iter(db))), ('set', 999_999, '❤️')]
+    expected = dict(db)
+    expected.pop(ops[1][1])
+    expected.update({1: '♣️', 999_999: '❤️'})
+
+    async def run():
+        store = PredictionStore(path, log_path, binary=True)
+        await store.write_snapshot(db)
+        await store.append(ops)
+
+        reopened = PredictionStore(path, log_path, binary=True)
+        loaded = reopened.load()
+        assert reopened.log_entries == len(ops)
+        assert dict(loaded.items()) == expected
+
+        assert await reopened.compact(loaded)
+        assert reopened.log_entries == 0
+        assert open(log_path, 'rb').read() == b''
+
+        final = PredictionStore(path, log_path, binary=True)
+        return final, final.load()
+
+    final, compacted = asyncio.run(run())
+    assert isinstance(compacted, CompactDb)
+    assert final.log_entries == 0
+    assert dict(compacted.items()) == expected
+    assert_same_answers(compacted, expected, range(0, 4010))
+
+
+def test_binary_open_rejects_a_truncated_file(tmp_path):
+    path = tmp_path / 'db.bin'
+    path.write_bytes(CompactDb.from_dict({1: '♠️', 2: '♦️'}).to_bytes()[:-1])
+    with pytest.raises(ValueError):
+        CompactDb.open(str(path))
+
+
+def test_first_binary_start_migrates_the_json_snapshot(tmp_path):
+    json_path = tmp_path / 'db.json'
+    path = str(tmp_path / 'db.bin')
+    log_path = str(tmp_path / 'db.log')
+    db = random_db(300, seed=6)
+    json_path.write_text(json.dumps({str(k): v for k, v in db.items()}), encoding='utf-8')
+    # Journal écrit par la version JSON, rejoué sur la base reprise
+    with open(log_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'set', 'n': 5000, 's': '♠️'}) + '\n')
+    db[5000] = '♠️'
+
+    async def run():
+        store = PredictionStore(path, log_path, binary=True, migrate_from=str(json_path))
+        assert store.exists()
+        loaded = store.load()
+        assert isinstance(loaded, CompactDb)
+        assert dict(loaded.items()) == db
+        # La compaction suivante écrit le fichier binaire
+        assert store.log_entries >= 1
+        assert await store.compact(loaded)
+
+    asyncio.run(run())
+    json_path.unlink()
+    reopened = PredictionStore(path, log_path, binary=True, migrate_from=str(json_path)).load()
+    assert isinstance(reopened, CompactDb)
+    assert dict(reopened.items()) == db